@@ -42,11 +42,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Only active when PERF_INSTRUMENTATION is True (see below); keep it first
+    'invent.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Only active when READ_REPLICA is True (see below)
+    'invent.replica.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -82,6 +86,84 @@ DATABASES = {
     }
 }
 
+# Production SQLite profile. Set SQLITE_PRODUCTION = True when several clerks work at
+# once: the default rollback journal makes readers and the writer block each other and
+# writes fail straight away with "database is locked". Write views also retry lock
+# errors with backoff (see invent/retry.py). `manage.py bench_concurrency` compares
+# the two profiles.
+
+SQLITE_PRODUCTION = False
+SQLITE_PRODUCTION_OPTIONS = {
+    # Wait up to 20s for another writer's lock instead of failing
+    'timeout': 20,
+    # Take the write lock when the transaction starts. A deferred transaction that reads
+    # first and writes later fails at once if another writer got in between, whatever the timeout
+    'transaction_mode': 'IMMEDIATE',
+    # Run on every new connection
+    'init_command': ';'.join([
+        # Readers no longer block the writer, or the writer the readers
+        'PRAGMA journal_mode=WAL',
+        # Safe with WAL: a power cut can lose the last commits but can't corrupt the file
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA mmap_size=268435456',  # 256 MiB
+        'PRAGMA cache_size=-32000',  # about 32 MB of page cache per connection
+        'PRAGMA temp_store=MEMORY',
+    ]),
+}
+
+if SQLITE_PRODUCTION:
+    DATABASES['default']['OPTIONS'] = SQLITE_PRODUCTION_OPTIONS
+    # Keep connections open between requests, so the pragmas run once per connection
+    DATABASES['default']['CONN_MAX_AGE'] = 600
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Read replica. When True, the reports, total requests and request summary pages and
+# the exports read from the `replica` database instead (see invent/replica.py), except
+# for sessions that changed something the replica hasn't caught up with yet. Locally
+# the replica is a copy of db.sqlite3 refreshed with `manage.py refresh_replica`. For a
+# replica kept up to date by the database itself, point the alias at it and set
+# READ_REPLICA_MAX_LAG to its worst-case lag in seconds.
+
+READ_REPLICA = False
+READ_REPLICA_MAX_LAG = 5
+
+if READ_REPLICA:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        # Readers wait while refresh_replica writes a new copy
+        'OPTIONS': {'timeout': 20},
+        'CONN_MAX_AGE': DATABASES['default'].get('CONN_MAX_AGE', 0),
+        # Tests use the primary's test database for both
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['invent.replica.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Used for the sidebar pending-requests badge and the shared report cache (see
+# invent/reportcache.py). The local-memory cache is per process; when running several
+# workers, switch to a shared backend (e.g. Redis or Memcached) so invalidations reach
+# every worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+# Performance instrumentation
+# When True, every response carries a Server-Timing header (total, SQL, template and
+# mail time) and requests slower than PERF_SLOW_REQUEST_MS are logged as JSON on the
+# 'invent.perf' logger, with EXPLAIN output for the PERF_EXPLAIN_SLOWEST slowest queries.
+# When False the middleware removes itself at startup.
+
+PERF_INSTRUMENTATION = False
+PERF_SLOW_REQUEST_MS = 1000
+PERF_EXPLAIN_SLOWEST = 3
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -1,9 +1,12 @@
 from django.contrib import admin
 # Import all your models
-from .models import InventoryItem, ItemRequest, StockTransaction
-from django.utils import timezone
+from .models import InventoryItem, ItemRequest, StockTransaction, OutboxEmail
 from django.db import transaction
 from django.db.models import F
+from .changelog import record_changes
+from .counters import record_request_status_update
+from .search import search_inventory
+from .stock import StockError, issue_request
 
 # Register your models here so they appear in the Django admin.
 
@@ -40,6 +43,12 @@ class InventoryItemAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of LIKE '%term%' over search_fields
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        return search_inventory(queryset, search_term), False
+
 
 @admin.register(ItemRequest)
 class ItemRequestAdmin(admin.ModelAdmin):
@@ -57,52 +66,49 @@ class ItemRequestAdmin(admin.ModelAdmin):
     search_fields = ('item__name', 'requestor__username', 'reason')
     # Use raw_id_fields for FKs for better performance with many items/users
     raw_id_fields = ('item', 'requestor')
+    # item and requestor are shown in every row
+    list_select_related = ('item', 'requestor')
     actions = ['mark_approved', 'mark_issued', 'mark_rejected',
                'mark_cancelled', 'mark_fully_returned']  # Custom actions
 
     def mark_approved(self, request, queryset):
-        queryset.update(status='Approved')
+        with transaction.atomic():
+            # queryset.update() skips save(), so keep the dashboard counters and change log in step by hand
+            record_request_status_update(queryset, 'Approved')
+            record_changes(ItemRequest, queryset.values_list('pk', flat=True), 'update')
+            queryset.update(status='Approved')
         self.message_user(request, "Selected requests marked as Approved.")
     mark_approved.short_description = "Mark selected requests as Approved"
 
     def mark_issued(self, request, queryset):
-        # This action should ideally trigger the same logic as your issue_item view
-        # For simplicity in admin, we'll just change status and update quantity_issued
-        # A more robust solution might involve a custom admin form or a signal.
-        for item_request in queryset:
-            if item_request.status == 'Approved':
-                with transaction.atomic():
-                    item = item_request.item
-                    item.quantity_issued = F(
-                        'quantity_issued') + item_request.quantity
-                    item.save(update_fields=['quantity_issued'])
-
-                    StockTransaction.objects.create(
-                        item=item,
-                        transaction_type='Issue',
-                        quantity=item_request.quantity,
-                        item_request=item_request,
-                        issued_to=item_request.requestor.username,
-                        reason=f"Issued via admin for request ID: {item_request.id}",
-                        recorded_by=request.user
-                    )
-                    item_request.status = 'Issued'
-                    item_request.date_issued = timezone.now()
-                    item_request.save()  # This save will send email
-                self.message_user(
-                    request, f"Request {item_request.id} marked as Issued and stock updated.")
+        # Same conditional-update issue path as the issue_item view: each request is
+        # claimed and its stock issued atomically, so nothing is oversold
+        for item_request in queryset.select_related('requestor'):
+            try:
+                issue_request(item_request, request.user,
+                              reason=f"Issued via admin for request ID: {item_request.id}")
+            except StockError as e:
+                self.message_user(request, str(e), level='warning')
             else:
                 self.message_user(
-                    request, f"Request {item_request.id} is not Approved and cannot be issued.", level='warning')
+                    request, f"Request {item_request.id} marked as Issued and stock updated.")
     mark_issued.short_description = "Mark selected requests as Issued and update stock"
 
     def mark_rejected(self, request, queryset):
-        queryset.update(status='Rejected')
+        with transaction.atomic():
+            # queryset.update() skips save(), so keep the dashboard counters and change log in step by hand
+            record_request_status_update(queryset, 'Rejected')
+            record_changes(ItemRequest, queryset.values_list('pk', flat=True), 'update')
+            queryset.update(status='Rejected')
         self.message_user(request, "Selected requests marked as Rejected.")
     mark_rejected.short_description = "Mark selected requests as Rejected"
 
     def mark_cancelled(self, request, queryset):
-        queryset.update(status='Cancelled')
+        with transaction.atomic():
+            # queryset.update() skips save(), so keep the dashboard counters and change log in step by hand
+            record_request_status_update(queryset, 'Cancelled')
+            record_changes(ItemRequest, queryset.values_list('pk', flat=True), 'update')
+            queryset.update(status='Cancelled')
         self.message_user(request, "Selected requests marked as Cancelled.")
     mark_cancelled.short_description = "Mark selected requests as Cancelled"
 
@@ -167,3 +173,14 @@ class StockTransactionAdmin(admin.ModelAdmin):
     readonly_fields = ('transaction_date',)
     # Use raw_id_fields for FKs
     raw_id_fields = ('item', 'item_request', 'recorded_by')
+    # Every column below renders a related object (item_request's __str__ needs its item and requestor)
+    list_select_related = ('item', 'item_request__item', 'item_request__requestor', 'recorded_by')
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'status', 'attempts',
+                    'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('created_at', 'sent_at', 'last_error', 'claim_token')
@@ -0,0 +1,377 @@
+"""
+Read-only JSON API, version 1, for kiosks and integrations.
+
+    /api/v1/items/          inventory items, by name
+    /api/v1/requests/       item requests, newest first (archived ones included)
+    /api/v1/transactions/   stock ledger rows, newest first (archived ones included)
+    /api/v1/changes/        the change feed: inserts, updates and deletes since a cursor
+
+Query parameters of the listings:
+    fields   comma-separated fields to return (default: all of them, see *_FIELDS)
+    limit    rows per page (default DEFAULT_LIMIT, at most MAX_LIMIT)
+    cursor   the opaque cursor from a previous page's `next` or `previous` URL
+
+Pages are keyset-paginated (see pagination.py), so every page costs the same. Users
+log in with the normal session. Requests are listed for everyone, but users without
+the view_itemrequest permission only see their own.
+
+The change feed (see changelog.py) takes `cursor`, the sequence number a mirror has
+seen up to (0 for everything, `latest` to skip to now), `resource` (comma-separated,
+default all three) and `limit`. Each change carries the row's own fields, not names
+from related rows, so a rename only shows up in the renamed row.
+
+Responses are gzipped when the client accepts it. Listings carry a strong ETag, which is
+derived from the inventory generation (see reportcache.py) and the request itself, so
+answering `If-None-Match` with 304 Not Modified costs no data queries at all. It also
+changes every ETAG_MAX_AGE seconds, which bounds how long a client could miss a change
+that didn't bump the generation (e.g. a renamed user), or one made by another worker
+process when the cache is not shared.
+"""
+import hashlib
+import json
+import re
+import time
+from functools import wraps
+
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.utils.text import compress_string
+
+from .archive import archived_requests
+from .changelog import RESOURCES as FEED_RESOURCES, latest_sequence, read_changes
+from .models import ArchivedStockTransaction, InventoryItem, ItemRequest, StockTransaction
+from .pagination import InvalidCursor, decode_cursor, keyset_paginate
+from .replica import read_source, reads_from_replica
+from .reportcache import REPORT_CACHE_TIMEOUT, current_generation
+
+API_VERSION = 1
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+# Smaller bodies aren't worth compressing
+GZIP_MIN_LENGTH = 200
+ETAG_MAX_AGE = REPORT_CACHE_TIMEOUT
+
+_accepts_gzip = re.compile(r'\bgzip\b')
+
+# API field name -> model field path; paths through a relation are joined in only when asked for
+ITEM_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'serial_number': 'serial_number',
+    'category': 'category',
+    'condition': 'condition',
+    'status': 'status',
+    'expiration_date': 'expiration_date',
+    'quantity_total': 'quantity_total',
+    'quantity_issued': 'quantity_issued',
+    'quantity_returned': 'quantity_returned',
+    'quantity_available': 'quantity_available',
+    'created_by': 'created_by_id',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+REQUEST_FIELDS = {
+    'id': 'id',
+    'item': 'item_id',
+    'item_name': 'item__name',
+    'name': 'name',
+    'quantity': 'quantity',
+    'reason': 'reason',
+    'application_date': 'application_date',
+    'requestor': 'requestor_id',
+    'requestor_username': 'requestor__username',
+    'status': 'status',
+    'date_requested': 'date_requested',
+    'date_issued': 'date_issued',
+    'returned_quantity': 'returned_quantity',
+}
+TRANSACTION_FIELDS = {
+    'id': 'id',
+    'item': 'item_id',
+    'item_name': 'item__name',
+    'transaction_type': 'transaction_type',
+    'quantity': 'quantity',
+    'item_request': 'item_request_id',
+    'issued_to': 'issued_to',
+    'reason': 'reason',
+    'transaction_date': 'transaction_date',
+    'recorded_by': 'recorded_by_id',
+    'recorded_by_username': 'recorded_by__username',
+}
+
+# The feed sends each row's own columns only; names from related rows could go stale
+FEED_FIELDS = {
+    resource: {name: path for name, path in fields.items() if '__' not in path}
+    for resource, fields in (('items', ITEM_FIELDS), ('requests', REQUEST_FIELDS),
+                             ('transactions', TRANSACTION_FIELDS))
+}
+FEED_PERMISSIONS = {
+    'items': 'invent.view_inventoryitem',
+    'requests': 'invent.view_itemrequest',
+    'transactions': 'invent.view_stocktransaction',
+}
+DEFAULT_FEED_LIMIT = 500
+
+# Each ordering is backed by an index and ends in a unique column, as keyset pagination needs
+ITEM_ORDERING = ['name', 'id']
+REQUEST_ORDERING = ['-date_requested', '-id']
+# Ledger ids grow with every row, and the archive holds the lowest ones
+TRANSACTION_ORDERING = ['-id']
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def error_response(message, status):
+    return JsonResponse({'version': API_VERSION, 'error': message}, status=status)
+
+
+def api_view(permission=None):
+    """
+    GET/HEAD only, for logged-in users with `permission` (if given). Failures are
+    answered in JSON instead of with a redirect to the login page.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                response = error_response("Only GET and HEAD are supported.", 405)
+                response['Allow'] = 'GET, HEAD'
+                return response
+            if not request.user.is_authenticated:
+                return error_response("Log in to use the API.", 403)
+            if permission and not request.user.has_perm(permission):
+                return error_response("You don't have permission to read this.", 403)
+            try:
+                return view(request, *args, **kwargs)
+            except ApiError as e:
+                return error_response(str(e), e.status)
+        return wrapper
+    return decorator
+
+
+# --- Parameters ---
+
+def selected_fields(request, available):
+    """The API fields asked for with ?fields=, in the order given."""
+    raw = request.GET.get('fields', '')
+    if not raw.strip():
+        return list(available)
+    fields = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(available)}.")
+    return fields
+
+
+def page_limit(request, default=DEFAULT_LIMIT):
+    raw = request.GET.get('limit')
+    if not raw:
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ApiError("limit must be a number.")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(f"limit must be between 1 and {MAX_LIMIT}.")
+    return limit
+
+
+def page_cursor(request):
+    cursor = request.GET.get('cursor') or None
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except InvalidCursor:
+            raise ApiError("Invalid cursor.")
+    return cursor
+
+
+# --- Conditional requests ---
+
+def accepts_gzip(request):
+    return bool(_accepts_gzip.search(request.headers.get('Accept-Encoding', '')))
+
+
+def compute_etag(resource, scope, fields, limit, cursor, gzipped):
+    """
+    A strong ETag for one page: it only changes when the data may have (or every
+    ETAG_MAX_AGE seconds), and differs between gzipped and plain bodies.
+    """
+    parts = [API_VERSION, resource, scope, fields, limit, cursor, current_generation(), read_source(),
+             int(time.time() // ETAG_MAX_AGE)]
+    digest = hashlib.md5(json.dumps(parts, default=str).encode()).hexdigest()
+    return f'"v{API_VERSION}-{digest}{"-gzip" if gzipped else ""}"'
+
+
+def etag_matches(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    # If-None-Match uses the weak comparison: W/"x" matches "x"
+    candidates = [candidate.removeprefix('W/') for candidate in parse_etags(if_none_match)]
+    return '*' in candidates or etag in candidates
+
+
+def _compress(request, response):
+    if accepts_gzip(request) and len(response.content) >= GZIP_MIN_LENGTH:
+        response.content = compress_string(response.content)
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding', 'Cookie'))
+    return response
+
+
+def _finish(response, etag):
+    response['ETag'] = etag
+    # Always revalidate; the ETag keeps that cheap
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ('Accept-Encoding', 'Cookie'))
+    return response
+
+
+# --- Listing ---
+
+def _value(obj, path):
+    for name in path.split('__'):
+        if obj is None:
+            return None
+        obj = getattr(obj, name)
+    return obj
+
+
+def _trimmed(queryset, paths, ordering):
+    """Only the columns the page needs, with the relations they go through joined in."""
+    related = {path.rsplit('__', 1)[0] for path in paths if '__' in path}
+    columns = set(paths) | {order.lstrip('-') for order in ordering}
+    return queryset.select_related(*related).only(*columns)
+
+
+def _page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def list_response(request, resource, queryset, field_map, ordering, merge=None, scope='all'):
+    """
+    One page of `queryset` as a JSON response, or 304 Not Modified if the client
+    already has it. `merge` returns more querysets whose rows are interleaved into the
+    pages (e.g. the archive); it is only called once the page has to be built.
+    `scope` tells apart listings whose queryset depends on the user.
+    """
+    fields = selected_fields(request, field_map)
+    limit = page_limit(request)
+    cursor = page_cursor(request)
+    gzipped = accepts_gzip(request)
+
+    etag = compute_etag(resource, scope, fields, limit, cursor, gzipped)
+    if etag_matches(request, etag):
+        return _finish(HttpResponseNotModified(), etag)
+
+    paths = [field_map[name] for name in fields]
+    page = keyset_paginate(
+        _trimmed(queryset, paths, ordering), ordering, cursor, per_page=limit, count=None,
+        merge=[_trimmed(extra, paths, ordering) for extra in (merge() if merge else ())])
+    response = JsonResponse({
+        'version': API_VERSION,
+        'results': [{name: _value(obj, path) for name, path in zip(fields, paths)} for obj in page],
+        'next': _page_url(request, page.next_cursor),
+        'previous': _page_url(request, page.previous_cursor),
+    }, json_dumps_params={'separators': (',', ':')})
+
+    return _finish(_compress(request, response), etag)
+
+
+# --- Change feed ---
+
+def feed_resources(request):
+    raw = request.GET.get('resource', '')
+    resources = [name.strip() for name in raw.split(',') if name.strip()] or list(FEED_RESOURCES)
+    unknown = [name for name in resources if name not in FEED_RESOURCES]
+    if unknown:
+        raise ApiError(f"Unknown resource(s): {', '.join(unknown)}. Available: {', '.join(FEED_RESOURCES)}.")
+    return list(dict.fromkeys(resources))
+
+
+def feed_cursor(request):
+    raw = request.GET.get('cursor', '0')
+    if raw == 'latest':
+        return latest_sequence()
+    try:
+        cursor = int(raw)
+    except ValueError:
+        raise ApiError("cursor must be a sequence number or 'latest'.")
+    if cursor < 0:
+        raise ApiError("cursor can't be negative.")
+    return cursor
+
+
+def change_feed_page(cursor, resources, limit):
+    """The changes to `resources` after sequence number `cursor`, as a JSON-ready dict."""
+    changes, next_cursor, has_more = read_changes(cursor, resources, limit)
+    return {
+        'version': API_VERSION,
+        'changes': [{
+            'seq': entry.pk,
+            'resource': entry.resource,
+            'id': entry.object_id,
+            'action': entry.action,
+            'changed_at': entry.changed_at,
+            'data': None if row is None else {
+                name: getattr(row, path) for name, path in FEED_FIELDS[entry.resource].items()
+            },
+        } for entry, row in changes],
+        # Pass this back as ?cursor= for the next page (the same number when there is nothing new)
+        'cursor': next_cursor,
+        'has_more': has_more,
+    }
+
+
+# --- Views ---
+
+@api_view('invent.view_inventoryitem')
+@reads_from_replica
+def items(request):
+    return list_response(request, 'items', InventoryItem.objects.all(), ITEM_FIELDS, ITEM_ORDERING)
+
+
+@api_view()
+@reads_from_replica
+def item_requests(request):
+    if request.user.has_perm('invent.view_itemrequest'):
+        mine, scope = {}, 'all'
+    else:
+        mine, scope = {'requestor': request.user}, f'user:{request.user.pk}'
+
+    def archive():
+        archived = archived_requests()
+        return [] if archived is None else [archived.filter(**mine)]
+
+    return list_response(request, 'requests', ItemRequest.objects.filter(**mine), REQUEST_FIELDS,
+                         REQUEST_ORDERING, merge=archive, scope=scope)
+
+
+@api_view('invent.view_stocktransaction')
+@reads_from_replica
+def stock_transactions(request):
+    return list_response(request, 'transactions', StockTransaction.objects.all(), TRANSACTION_FIELDS,
+                         TRANSACTION_ORDERING, merge=lambda: [ArchivedStockTransaction.objects.all()])
+
+
+@api_view()
+@reads_from_replica
+def changes(request):
+    resources = feed_resources(request)
+    missing = [name for name in resources if not request.user.has_perm(FEED_PERMISSIONS[name])]
+    if missing:
+        raise ApiError(f"You don't have permission to read the changes to: {', '.join(missing)}.", 403)
+    page = change_feed_page(feed_cursor(request), resources, page_limit(request, DEFAULT_FEED_LIMIT))
+    response = JsonResponse(page, json_dumps_params={'separators': (',', ':')})
+    response['Cache-Control'] = 'private, no-store'
+    return _compress(request, response)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class InventConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'invent'
+
+    def ready(self):
+        # Connect signal handlers
+        from . import signals  # noqa: F401
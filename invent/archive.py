@@ -0,0 +1,221 @@
+"""
+Moving old history out of the live request and ledger tables.
+
+`manage.py archive_history` moves closed requests (Fully Returned, Rejected,
+Cancelled) made before a cutoff into ArchivedItemRequest, and ledger rows recorded
+before it into ArchivedStockTransaction, in batches. Rows keep their ids.
+
+The ledger is archived as a prefix by id, and only as far as the report rollups have
+already counted it. The effect of an item's archived rows is added to its
+StockOpeningBalance, so the opening balance plus the live ledger still adds up to the
+item's quantities (see ledger.py); reconcile checkpoints that point into the archived
+range are moved past it. A request is only archived once none of its ledger rows are
+left in the live table.
+
+Archived requests still count in the dashboard counters and the trend rollups, and
+per item in StockOpeningBalance.archived_requests for the all-time top items.
+Listings, reports and exports merge the archive back in only when the dates they
+cover reach back to archive_horizon().
+"""
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .ledger import QUANTITY_FIELDS, apply_transactions
+from .models import (ArchivedItemRequest, ArchivedStockTransaction, InventoryItem, ItemRequest,
+                     RollupState, StockCheckpoint, StockOpeningBalance, StockTransaction)
+from .reportcache import bump_generation
+from .rollups import LEDGER_STATE, roll_up
+
+# Requests in these states never change again
+TERMINAL_STATUSES = ['Fully Returned', 'Rejected', 'Cancelled']
+DEFAULT_BATCH_SIZE = 1000
+
+
+# --- Reading ---
+
+def archive_horizon():
+    """date_requested of the newest archived request, or None if nothing is archived."""
+    return ArchivedItemRequest.objects.aggregate(newest=Max('date_requested'))['newest']
+
+
+def archived_requests(status=None, start=None):
+    """
+    Archived requests to merge into a request listing filtered by `status` and
+    requested on or after `start` (a datetime), or None when the archive can't hold
+    any of them, so the caller can skip it.
+    """
+    if status and status not in TERMINAL_STATUSES:
+        return None
+    horizon = archive_horizon()
+    if horizon is None or (start is not None and start > horizon):
+        return None
+    queryset = ArchivedItemRequest.objects.all()
+    if status:
+        queryset = queryset.filter(status=status)
+    return queryset
+
+
+def top_requested_items(limit):
+    """
+    The most requested items of all time, as dicts with 'item__name' and
+    'request_count', counting archived requests too.
+    """
+    live = ItemRequest.objects.values('item__name').annotate(request_count=Count('id'))
+    if archive_horizon() is None:
+        return list(live.order_by('-request_count')[:limit])
+    # Per item: its live requests (an index count) plus the archived ones counted in its
+    # opening balance when they were archived, so the archive table itself is never read
+    live_per_item = (ItemRequest.objects.filter(item=OuterRef('pk')).order_by()
+                     .values('item').annotate(count=Count('id')).values('count'))
+    rows = (InventoryItem.objects.values('name')
+            .annotate(request_count=Sum(Coalesce(Subquery(live_per_item), Value(0))
+                                        + Coalesce(F('opening_balance__archived_requests'), Value(0))))
+            .filter(request_count__gt=0).order_by('-request_count')[:limit])
+    return [{'item__name': row['name'], 'request_count': row['request_count']} for row in rows]
+
+
+def uncount_archived_request(item_id):
+    """For an archived request that was deleted (e.g. along with its requestor)."""
+    StockOpeningBalance.objects.filter(item_id=item_id, archived_requests__gt=0).update(
+        archived_requests=F('archived_requests') - 1)
+
+
+# --- Archiving ---
+
+def _copy(model, row):
+    return model(**{field.attname: getattr(row, field.attname) for field in row._meta.concrete_fields})
+
+
+def _delete_moved(model, ids):
+    # A plain DELETE instead of QuerySet.delete(), so no pre/post_delete signals fire:
+    # the rows live on in the archive, so the dashboard counters, change log and archive
+    # counts must not treat them as deleted. Nothing needs cascading either (requests
+    # are only moved once none of their ledger rows are left).
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)} WHERE id IN ({placeholders})", ids)
+        return cursor.rowcount
+
+
+def ledger_cutoff_id(cutoff):
+    """Highest ledger id that may be archived for `cutoff`: every row up to it is older (0 if none)."""
+    first_kept = StockTransaction.objects.filter(
+        transaction_date__gte=cutoff).aggregate(first=Min('id'))['first']
+    if first_kept is not None:
+        newest = first_kept - 1
+    else:
+        newest = StockTransaction.objects.aggregate(newest=Max('id'))['newest'] or 0
+    # Rows the rollups haven't counted yet must stay, or the trends would never see them
+    rolled_up = RollupState.objects.filter(name=LEDGER_STATE).values_list('last_id', flat=True).first() or 0
+    return min(newest, rolled_up)
+
+
+def _carry_forward(batch):
+    """Folds a batch of ledger rows (ordered by id) into the opening balances and checkpoints."""
+    batch_last = batch[-1].id
+    rows_by_item = {}
+    for row in batch:
+        rows_by_item.setdefault(row.item_id, []).append(row)
+    now = timezone.now()
+
+    balances = {
+        balance.item_id: balance for balance in
+        StockOpeningBalance.objects.select_for_update().filter(item_id__in=rows_by_item)
+    }
+    to_create, to_update = [], []
+    for item_id, rows in rows_by_item.items():
+        balance = balances.get(item_id) or StockOpeningBalance(item_id=item_id)
+        values = [getattr(balance, name) for name in QUANTITY_FIELDS]
+        for row in rows:
+            apply_transactions(values, row.transaction_type, row.quantity)
+        for name, value in zip(QUANTITY_FIELDS, values):
+            setattr(balance, name, value)
+        balance.last_transaction_id = batch_last
+        balance.transactions += len(rows)
+        balance.updated_at = now
+        (to_update if balance.pk else to_create).append(balance)
+    StockOpeningBalance.objects.bulk_create(to_create)
+    StockOpeningBalance.objects.bulk_update(
+        to_update, ['last_transaction_id', *QUANTITY_FIELDS, 'transactions', 'updated_at'])
+
+    # A checkpoint counts the live rows after it; those about to be archived move into it
+    checkpoints = list(StockCheckpoint.objects.select_for_update().filter(
+        item_id__in=rows_by_item, last_transaction_id__lt=batch_last))
+    for checkpoint in checkpoints:
+        values = [getattr(checkpoint, name) for name in QUANTITY_FIELDS]
+        for row in rows_by_item[checkpoint.item_id]:
+            if row.id > checkpoint.last_transaction_id:
+                apply_transactions(values, row.transaction_type, row.quantity)
+        for name, value in zip(QUANTITY_FIELDS, values):
+            setattr(checkpoint, name, value)
+        checkpoint.last_transaction_id = batch_last
+        checkpoint.updated_at = now
+    StockCheckpoint.objects.bulk_update(
+        checkpoints, ['last_transaction_id', *QUANTITY_FIELDS, 'updated_at'])
+
+
+def _count_archived(batch):
+    """Adds a batch of archived requests to their items' archived request counts."""
+    archived = {}
+    for row in batch:
+        archived[row.item_id] = archived.get(row.item_id, 0) + 1
+    balances = {
+        balance.item_id: balance for balance in
+        StockOpeningBalance.objects.select_for_update().filter(item_id__in=archived)
+    }
+    to_create, to_update = [], []
+    for item_id, count in archived.items():
+        balance = balances.get(item_id) or StockOpeningBalance(item_id=item_id)
+        balance.archived_requests += count
+        balance.updated_at = timezone.now()
+        (to_update if balance.pk else to_create).append(balance)
+    StockOpeningBalance.objects.bulk_create(to_create)
+    StockOpeningBalance.objects.bulk_update(to_update, ['archived_requests', 'updated_at'])
+
+
+def archive_ledger(cutoff_id, batch_size=DEFAULT_BATCH_SIZE):
+    """Moves the ledger rows with an id up to `cutoff_id` to the archive. Returns the number moved."""
+    moved = 0
+    while True:
+        with transaction.atomic():
+            batch = list(StockTransaction.objects.filter(id__lte=cutoff_id).order_by('id')[:batch_size])
+            if not batch:
+                return moved
+            ArchivedStockTransaction.objects.bulk_create(
+                [_copy(ArchivedStockTransaction, row) for row in batch])
+            _carry_forward(batch)
+            _delete_moved(StockTransaction, [row.id for row in batch])
+            moved += len(batch)
+
+
+def archive_requests(cutoff, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Moves closed requests made before `cutoff` that have no live ledger rows left to
+    the archive. Returns the number moved.
+    """
+    candidates = ItemRequest.objects.filter(
+        status__in=TERMINAL_STATUSES, date_requested__lt=cutoff, stock_transactions__isnull=True)
+    moved = 0
+    while True:
+        with transaction.atomic():
+            batch = list(candidates.order_by('id')[:batch_size])
+            if not batch:
+                return moved
+            ArchivedItemRequest.objects.bulk_create([_copy(ArchivedItemRequest, row) for row in batch])
+            _count_archived(batch)
+            _delete_moved(ItemRequest, [row.id for row in batch])
+            moved += len(batch)
+
+
+def archive_history(cutoff, batch_size=DEFAULT_BATCH_SIZE):
+    """Archives ledger rows and closed requests from before `cutoff`. Returns (ledger rows, requests) moved."""
+    # Bring the trends up to date first, so they have counted every row that is about to move
+    roll_up()
+    transactions = archive_ledger(ledger_cutoff_id(cutoff), batch_size)
+    requests = archive_requests(cutoff, batch_size)
+    if transactions or requests:
+        bump_generation()
+    return transactions, requests
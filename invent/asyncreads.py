@@ -0,0 +1,48 @@
+"""
+Running a view's independent reads at the same time, for the async views.
+
+Django's async ORM (aget, acount, `async for`, ...) still runs every query of one
+request on that request's single sync thread, one after the other, so gathering
+several async ORM calls does not make them concurrent. read_in_thread() and
+gather_reads() instead run each callable in a thread of its own, from a small shared
+pool, alongside whatever the request's own thread is doing (e.g. a fetch_all()).
+Database connections are per thread, so each read gets its own connection; it is
+closed afterwards the same way a request's connection is (close_old_connections,
+honouring CONN_MAX_AGE).
+
+Only use it for reads that don't depend on each other and don't need to see the
+request's own uncommitted writes. Context variables (the read replica routing, the
+performance timings) are copied into the threads.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+# Shared by all requests; more concurrent reads than this queue up
+READ_WORKERS = 8
+
+_executor = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix='invent-read')
+
+
+def _run_and_release(func, args):
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def fetch_all(queryset):
+    """Evaluates a queryset with the async ORM (on the request's own thread and connection)."""
+    return [obj async for obj in queryset]
+
+
+async def read_in_thread(func, *args):
+    """Awaits func(*args) run in a read worker thread."""
+    return await sync_to_async(_run_and_release, thread_sensitive=False, executor=_executor)(func, args)
+
+
+async def gather_reads(*funcs):
+    """Runs the callables concurrently in read worker threads and returns their results in order."""
+    return await asyncio.gather(*(read_in_thread(func) for func in funcs))
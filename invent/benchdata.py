@@ -0,0 +1,293 @@
+"""
+Synthetic data for performance checks.
+
+seed_dataset() fills the database with users, items, requests and a stock ledger
+using bulk inserts, with realistic status mixes. The ledger is generated first and
+the item quantities are derived from it, so the data is internally consistent.
+VIEW_PROBES lists the pages the performance commands exercise, QUERY_BUDGETS the
+number of queries each may run, and throwaway_database() gives those commands a
+scratch test database to work in.
+"""
+import os
+import random
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Permission, User
+from django.db import connection, connections, transaction
+from django.db.models import Count
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from .changelog import record_changes
+from .counters import rebuild_counters
+from .rollups import rebuild_rollups
+from .models import InventoryItem, ItemRequest, StockTransaction
+
+BENCH_CLERK_USERNAME = 'bench_clerk'
+BENCH_PASSWORD = 'bench-password'
+
+# Roughly what a few years of request history looks like
+REQUEST_STATUS_WEIGHTS = {
+    'Fully Returned': 30,
+    'Issued': 20,
+    'Pending': 12,
+    'Approved': 8,
+    'Partially Returned': 10,
+    'Rejected': 12,
+    'Cancelled': 8,
+}
+
+CATEGORIES = ['CPU', 'Monitor', 'Printer', 'Laptop', 'UPS', 'Switch', 'Projector', 'Scanner']
+MODELS = ['Dell Optiplex', 'HP EliteDesk', 'Lenovo ThinkCentre', 'HP LaserJet',
+          'Epson EcoTank', 'APC Back-UPS', 'Cisco Catalyst', 'Samsung Monitor']
+
+# (url name, url kwargs, role, query string) for the pages the perf commands drive.
+# Exports are left out on purpose: they read every row by design.
+VIEW_PROBES = [
+    ('requestor_dashboard', None, 'requestor', ''),
+    ('request_item', None, 'requestor', ''),
+    ('request_summary', None, 'requestor', ''),
+    ('store_clerk_dashboard', None, 'clerk', ''),
+    ('manage_stock', None, 'clerk', ''),
+    ('manage_stock', None, 'clerk', 'q=dell'),
+    ('inventory_list', None, 'clerk', ''),
+    ('inventory_list', None, 'clerk', 'q=5CG1'),
+    ('reports', None, 'clerk', ''),
+    ('issue_item', None, 'clerk', ''),
+    ('adjust_stock', None, 'clerk', ''),
+    ('upload_inventory', None, 'clerk', ''),
+    ('list_issued_requests_for_return', None, 'clerk', ''),
+    ('total_requests', None, 'clerk', ''),
+    ('total_requests', None, 'clerk', 'status=Pending'),
+    ('admin:invent_itemrequest_changelist', None, 'clerk', ''),
+    ('admin:invent_stocktransaction_changelist', None, 'clerk', ''),
+    ('admin:invent_inventoryitem_changelist', None, 'clerk', ''),
+    ('api_v1_items', None, 'clerk', ''),
+    ('api_v1_requests', None, 'clerk', 'fields=id,item_name,status'),
+    ('api_v1_requests', None, 'requestor', ''),
+    ('api_v1_transactions', None, 'clerk', ''),
+    ('api_v1_changes', None, 'clerk', 'resource=items&limit=50'),
+]
+
+# Exact number of queries each probed page may run, with a cold cache, as (url name, query
+# string). Enforced by check_query_counts and by the tests with assertNumQueries: update
+# a number deliberately when a change needs more (or fewer).
+# Most pages spend 3-4 queries on the session, user, permissions and sidebar badge.
+QUERY_BUDGETS = {
+    ('requestor_dashboard', ''): 6,
+    ('request_item', ''): 6,
+    ('request_summary', ''): 6,
+    ('store_clerk_dashboard', ''): 7,
+    ('manage_stock', ''): 5,
+    ('manage_stock', 'q=dell'): 5,
+    ('inventory_list', ''): 7,
+    ('inventory_list', 'q=5CG1'): 7,
+    ('reports', ''): 11,
+    ('issue_item', ''): 7,
+    ('adjust_stock', ''): 6,
+    ('upload_inventory', ''): 5,
+    ('list_issued_requests_for_return', ''): 6,
+    ('total_requests', ''): 8,
+    ('total_requests', 'status=Pending'): 7,
+    ('admin:invent_itemrequest_changelist', ''): 8,
+    ('admin:invent_stocktransaction_changelist', ''): 9,
+    ('admin:invent_inventoryitem_changelist', ''): 9,
+    ('api_v1_items', ''): 5,
+    ('api_v1_requests', 'fields=id,item_name,status'): 6,
+    ('api_v1_requests', ''): 6,
+    ('api_v1_transactions', ''): 6,
+    ('api_v1_changes', 'resource=items&limit=50'): 6,
+}
+
+
+@contextmanager
+def throwaway_database(on_disk=False):
+    """
+    Runs the block against a freshly migrated test database that is destroyed afterwards.
+    SQLite test databases live in memory by default; `on_disk` puts it in a temporary
+    file instead, which is needed when several threads must share it.
+    """
+    setup_test_environment()
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    tmpdir = None
+    if on_disk and connection.vendor == 'sqlite':
+        tmpdir = tempfile.mkdtemp(prefix='invent-bench-')
+        test_settings['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    # Aliases that mirror this one in tests (e.g. the read replica) must not see the real data
+    mirrors = {
+        alias: connections[alias].settings_dict['NAME'] for alias in connections
+        if connections[alias].settings_dict.get('TEST', {}).get('MIRROR') == connection.alias
+    }
+    for alias in mirrors:
+        connections[alias].close()
+        connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        yield
+    finally:
+        for alias, name in mirrors.items():
+            connections[alias].close()
+            connections[alias].settings_dict['NAME'] = name
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = old_test_name
+        if tmpdir:
+            os.rmdir(tmpdir)
+        teardown_test_environment()
+
+
+def seed_dataset(users=50, items=500, requests=5000, adjustments=1000, days=730,
+                 seed=None, batch_size=1000):
+    """
+    Bulk-inserts a synthetic dataset and returns the number of rows created per model.
+    Also creates the `bench_clerk` user (all invent permissions) if it does not exist.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    password = make_password(BENCH_PASSWORD)
+
+    with transaction.atomic():
+        clerk, created = User.objects.get_or_create(
+            username=BENCH_CLERK_USERNAME,
+            defaults={'is_staff': True, 'email': 'bench_clerk@example.com', 'password': password})
+        if created:
+            clerk.user_permissions.set(Permission.objects.filter(content_type__app_label='invent'))
+
+        # Suffix keeps repeated seeding runs from colliding on usernames / serials
+        run = f"{now:%Y%m%d%H%M%S}{rng.randint(0, 999):03d}"
+
+        requestors = User.objects.bulk_create([
+            User(username=f'bench_{run}_{i}', email=f'bench_{run}_{i}@example.com',
+                 first_name=f'User{i}', password=password)
+            for i in range(users)
+        ], batch_size=batch_size)
+        if not requestors[0].pk:
+            # Backends without RETURNING on bulk insert
+            requestors = list(User.objects.filter(username__startswith=f'bench_{run}_'))
+
+        inventory = InventoryItem.objects.bulk_create([
+            InventoryItem(
+                name=f"{rng.choice(MODELS)} {rng.randint(100, 9999)}",
+                serial_number=f"{rng.choice('ABCDE')}{rng.randint(1, 9)}CG{run[-6:]}{i:06d}",
+                category=rng.choice(CATEGORIES),
+                condition=rng.choice(['Serviceable', 'Good', 'Fair']),
+                created_by=clerk,
+            )
+            for i in range(items)
+        ], batch_size=batch_size)
+        if not inventory[0].pk:
+            inventory = list(InventoryItem.objects.filter(serial_number__contains=f"CG{run[-6:]}"))
+
+        # Every item starts with a received batch of stock
+        quantities = {item.pk: {'total': 0, 'issued': 0, 'returned': 0} for item in inventory}
+        ledger = []
+
+        def record(item, kind, quantity, when, item_request=None, **extra):
+            ledger.append((StockTransaction(
+                item=item, transaction_type=kind, quantity=quantity, item_request=item_request,
+                recorded_by=clerk, **extra), when))
+            counts = quantities[item.pk]
+            if kind in ('Receive', 'Adjustment'):
+                counts['total'] += quantity
+            elif kind == 'Issue':
+                counts['issued'] += quantity
+            elif kind == 'Return':
+                counts['total'] += quantity
+                counts['issued'] -= quantity
+                counts['returned'] += quantity
+
+        for item in inventory:
+            record(item, 'Receive', rng.randint(20, 500), now - timedelta(days=days),
+                   reason='Initial stock')
+
+        statuses = list(REQUEST_STATUS_WEIGHTS)
+        weights = list(REQUEST_STATUS_WEIGHTS.values())
+        request_rows = []
+        for _ in range(requests):
+            item = rng.choice(inventory)
+            requested_at = now - timedelta(days=rng.uniform(0, days))
+            status = rng.choices(statuses, weights)[0]
+            quantity = rng.randint(1, 5)
+            returned = 0
+            if status == 'Fully Returned':
+                returned = quantity
+            elif status == 'Partially Returned' and quantity > 1:
+                returned = rng.randint(1, quantity - 1)
+            elif status == 'Partially Returned':
+                status = 'Issued'
+            issued_at = None
+            if status in ('Issued', 'Partially Returned', 'Fully Returned'):
+                issued_at = requested_at + timedelta(hours=rng.uniform(1, 72))
+            request_rows.append((ItemRequest(
+                item=item, name=item.name, quantity=quantity, requestor=rng.choice(requestors),
+                reason='Synthetic request', status=status, returned_quantity=returned,
+                application_date=requested_at.date(), date_issued=issued_at,
+            ), requested_at))
+
+        ItemRequest.objects.bulk_create([r for r, _ in request_rows], batch_size=batch_size)
+        # auto_now_add overrides the timestamps on insert, so backdate them afterwards
+        for item_request, requested_at in request_rows:
+            item_request.date_requested = requested_at
+        ItemRequest.objects.bulk_update(
+            [r for r, _ in request_rows], ['date_requested'], batch_size=batch_size)
+
+        for item_request, _ in request_rows:
+            if item_request.date_issued:
+                record(item_request.item, 'Issue', item_request.quantity, item_request.date_issued,
+                       item_request=item_request, issued_to=item_request.requestor.username)
+            if item_request.returned_quantity:
+                record(item_request.item, 'Return', item_request.returned_quantity,
+                       item_request.date_issued + timedelta(days=rng.uniform(1, 60)),
+                       item_request=item_request)
+
+        for _ in range(adjustments):
+            record(rng.choice(inventory), 'Adjustment', rng.randint(1, 20),
+                   now - timedelta(days=rng.uniform(0, days)), reason='Synthetic adjustment')
+
+        StockTransaction.objects.bulk_create([tx for tx, _ in ledger], batch_size=batch_size)
+        for tx, when in ledger:
+            tx.transaction_date = when
+        StockTransaction.objects.bulk_update(
+            [tx for tx, _ in ledger], ['transaction_date'], batch_size=batch_size)
+
+        for item in inventory:
+            counts = quantities[item.pk]
+            item.quantity_total = counts['total']
+            item.quantity_issued = counts['issued']
+            item.quantity_returned = counts['returned']
+        InventoryItem.objects.bulk_update(
+            inventory, ['quantity_total', 'quantity_issued', 'quantity_returned'],
+            batch_size=batch_size)
+
+        # Everything above bypassed save(), so recompute the dashboard counters once
+        # and log the new rows for the change feed
+        rebuild_counters()
+        rebuild_rollups()
+        record_changes(InventoryItem, [item.pk for item in inventory], 'insert')
+        record_changes(ItemRequest, [r.pk for r, _ in request_rows], 'insert')
+        record_changes(StockTransaction, [tx.pk for tx, _ in ledger], 'insert')
+
+    if connection.vendor == 'sqlite':
+        # Give the query planner statistics to work with
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    return {
+        'users': len(requestors),
+        'items': len(inventory),
+        'requests': len(request_rows),
+        'transactions': len(ledger),
+    }
+
+
+def bench_users():
+    """The (clerk, requestor) pair the perf commands log in as."""
+    clerk = User.objects.get(username=BENCH_CLERK_USERNAME)
+    # The requestor with the most requests gives the heaviest requestor pages
+    requestor = (User.objects.filter(username__startswith='bench_').exclude(pk=clerk.pk)
+                 .annotate(request_count=Count('itemrequest')).order_by('-request_count', 'pk')
+                 .first())
+    return clerk, requestor
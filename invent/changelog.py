@@ -0,0 +1,114 @@
+"""
+The change log behind the change feed (`/api/v1/changes/` and `manage.py export_changes`).
+
+Every insert, update and delete of an InventoryItem, ItemRequest or StockTransaction
+appends a ChangeLogEntry in the same transaction. Saves and deletes are logged by the
+model signals in signals.py. Like the dashboard counters, code that writes with
+bulk_create(), bulk_update() or queryset.update() must call record_changes() itself.
+Logging a change also bumps the inventory generation, so cached reports and API ETags
+(see reportcache.py) move on with every write path, including bulk ones.
+
+Mirrors ask for the changes after the last sequence number (entry id) they have seen,
+which is one indexed range read: a sync costs O(changes), not O(inventory). SQLite
+lets one transaction write at a time, so entries become visible in sequence order and
+a cursor never skips one that commits later.
+
+Archiving (archive.py) moves rows without logging anything: the API and the feed go
+on serving archived requests and ledger rows as if they were live.
+"""
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import (ArchivedItemRequest, ArchivedStockTransaction, ChangeLogEntry, InventoryItem,
+                     ItemRequest, StockTransaction)
+from .reportcache import bump_generation
+
+RESOURCES = {
+    'items': InventoryItem,
+    'requests': ItemRequest,
+    'transactions': StockTransaction,
+}
+# Where rows of a resource go when they are archived
+ARCHIVES = {
+    'requests': ArchivedItemRequest,
+    'transactions': ArchivedStockTransaction,
+}
+
+_resource_of = {model: name for name, model in [*RESOURCES.items(), *ARCHIVES.items()]}
+
+
+# --- Writing ---
+
+def record_changes(model, ids, action):
+    """
+    Logs `action` ('insert', 'update' or 'delete') of the `model` rows with these ids,
+    and invalidates cached reports if there were any.
+    """
+    resource = _resource_of[model]
+    now = timezone.now()
+    entries = ChangeLogEntry.objects.bulk_create([
+        ChangeLogEntry(resource=resource, object_id=pk, action=action, changed_at=now) for pk in ids
+    ])
+    if entries:
+        bump_generation()
+
+
+def record_change(instance, action):
+    record_changes(type(instance), [instance.pk], action)
+
+
+# --- Reading ---
+
+def latest_sequence():
+    """The newest sequence number, for mirrors that start from a full export."""
+    return ChangeLogEntry.objects.aggregate(newest=Max('id'))['newest'] or 0
+
+
+def read_changes(cursor, resources, limit):
+    """
+    Reads up to `limit` log entries after sequence number `cursor` for `resources`.
+
+    Returns (changes, next_cursor, has_more). `changes` holds one (entry, row) pair
+    per changed object, for its last entry in the range (an insert if the object was
+    inserted in the range and not deleted again); `row` is the object as it is
+    now (live or archived), or None for a delete. Objects whose row is gone by now are
+    left out, since their delete comes later in the log.
+    """
+    entries = ChangeLogEntry.objects.filter(id__gt=cursor).order_by('id')
+    if set(resources) != set(RESOURCES):
+        entries = entries.filter(resource__in=resources)
+    entries = list(entries[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if not entries:
+        return [], cursor, False
+
+    latest = {}
+    for entry in entries:
+        key = (entry.resource, entry.object_id)
+        earlier = latest.pop(key, None)
+        if earlier is not None and earlier.action == 'insert' and entry.action == 'update':
+            # Still new to a reader that hasn't seen this range
+            entry.action = 'insert'
+        # Later entries replace earlier ones; re-adding the key keeps the dict in sequence order
+        latest[key] = entry
+
+    rows = {}
+    for resource in resources:
+        wanted = {object_id for (name, object_id), entry in latest.items()
+                  if name == resource and entry.action != 'delete'}
+        for model in (RESOURCES[resource], ARCHIVES.get(resource)):
+            if model is None or not wanted:
+                continue
+            found = list(model.objects.filter(pk__in=wanted))
+            for row in found:
+                rows[(resource, row.pk)] = row
+            wanted -= {row.pk for row in found}
+
+    changes = []
+    for key, entry in latest.items():
+        if entry.action == 'delete':
+            changes.append((entry, None))
+        elif key in rows:
+            changes.append((entry, rows[key]))
+    return changes, entries[-1].id, has_more
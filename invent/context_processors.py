@@ -1,4 +1,4 @@
-from .models import ItemRequest  # Import your ItemRequest model
+from .counters import cached_pending_count
 
 
 def pending_requests_count(request):
@@ -13,6 +13,7 @@ def pending_requests_count(request):
         # This is a good practice to ensure the count is only relevant for authorized users
         # Adjust 'invent.can_issue_item' if your permission name is different
         if request.user.has_perm('invent.can_issue_item'):
-            count = ItemRequest.objects.filter(status='Pending').count()
+            # Served from the cache; invalidated whenever a request enters or leaves Pending
+            count = cached_pending_count()
 
     return {'pending_requests_count_for_sidebar': count}
@@ -0,0 +1,314 @@
+"""
+Incrementally maintained dashboard counters.
+
+InventoryItem and ItemRequest remember the counted field values they were loaded
+with; when they are saved or deleted the difference is applied to the
+DashboardCounter rows in the same transaction. Code that writes with
+bulk_create() or queryset.update() must call the matching record_* helper itself.
+
+Request status changes seen here are also appended to the RequestStatusChange
+journal that feeds the daily report rollups (see invent/rollups.py).
+"""
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Case, F, Sum, Value, When
+
+from .models import ArchivedItemRequest, DashboardCounter, InventoryItem, ItemRequest
+from .reportcache import bump_generation
+from .rollups import journal_status_changes
+from .stats import STATUS_KEYS, request_status_aggregates
+
+# Counters kept both globally and per requestor (same keys as stats.request_status_summary)
+REQUEST_COUNTERS = ['total', 'returned_total', 'outstanding_issued'] + list(STATUS_KEYS.values())
+# Counters kept only globally
+INVENTORY_COUNTERS = ['quantity_total', 'quantity_issued', 'quantity_returned']
+
+REQUEST_TRACKED_FIELDS = ['requestor', 'status', 'quantity', 'returned_quantity']
+ITEM_TRACKED_FIELDS = ['quantity_total', 'quantity_issued', 'quantity_returned']
+
+# The sidebar badge reads the pending count from the cache on every render
+PENDING_COUNT_CACHE_KEY = 'invent:pending_requests_count'
+# Safety net for caches that are not shared between worker processes
+PENDING_COUNT_CACHE_TIMEOUT = 300
+
+
+# --- Reading ---
+
+def read_counters(requestor=None):
+    """
+    Returns the counters for one scope as a dict, in a single query.
+    The global scope (no requestor) also includes the inventory quantity totals.
+    """
+    names = REQUEST_COUNTERS if requestor is not None else REQUEST_COUNTERS + INVENTORY_COUNTERS
+    values = dict(
+        DashboardCounter.objects.filter(requestor=requestor).values_list('name', 'value'))
+    return {name: values.get(name, 0) for name in names}
+
+
+def cached_pending_count():
+    """Global number of Pending requests, served from the cache when possible."""
+    count = cache.get(PENDING_COUNT_CACHE_KEY)
+    if count is None:
+        # Always from the primary: a stale replica count would stay cached until the next change
+        count = DashboardCounter.objects.using(DEFAULT_DB_ALIAS).filter(
+            requestor=None, name='pending').values_list('value', flat=True).first() or 0
+        cache.set(PENDING_COUNT_CACHE_KEY, count, PENDING_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def invalidate_pending_count():
+    # Wait for the commit so nobody re-caches the value from before this change
+    transaction.on_commit(lambda: cache.delete(PENDING_COUNT_CACHE_KEY))
+
+
+# --- Applying changes ---
+
+def apply_deltas(deltas, requestor_id=None, create_missing=True):
+    """Adds `deltas` ({name: amount}) to one scope's counters with a single UPDATE."""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    if requestor_id is None:
+        if 'pending' in deltas:
+            # A request entered or left Pending
+            invalidate_pending_count()
+        # Counters only move when inventory or requests change, including bulk writes
+        # that send no signals, so cached reports are stale now too
+        bump_generation()
+
+    counters = DashboardCounter.objects.filter(requestor_id=requestor_id, name__in=list(deltas))
+    updated = counters.update(value=F('value') + Case(
+        *[When(name=name, then=Value(delta)) for name, delta in deltas.items()],
+        default=Value(0),
+    ))
+    if updated == len(deltas) or not create_missing:
+        return
+
+    existing = set(counters.values_list('name', flat=True))
+    for name, delta in deltas.items():
+        if name in existing:
+            continue
+        try:
+            with transaction.atomic():
+                DashboardCounter.objects.create(requestor_id=requestor_id, name=name, value=delta)
+        except IntegrityError:
+            # Someone else created the row in the meantime
+            DashboardCounter.objects.filter(
+                requestor_id=requestor_id, name=name).update(value=F('value') + delta)
+
+
+def _subtract(new, old):
+    return {name: new.get(name, 0) - old.get(name, 0) for name in set(new) | set(old)}
+
+
+def _request_contribution(state):
+    """What a single request with these field values adds to its counters."""
+    contribution = {'total': 1, 'returned_total': state['returned_quantity']}
+    key = STATUS_KEYS.get(state['status'])
+    if key:
+        contribution[key] = 1
+    if state['status'] == 'Issued' and state['quantity'] > state['returned_quantity']:
+        contribution['outstanding_issued'] = 1
+    return contribution
+
+
+def _item_contribution(state):
+    return {name: state[name] for name in ITEM_TRACKED_FIELDS}
+
+
+def snapshot(instance, fields):
+    """
+    Captures the tracked field values of a freshly loaded instance.
+    Returns None if any of them were deferred.
+    """
+    values = {}
+    for name in fields:
+        attname = instance._meta.get_field(name).attname
+        if attname not in instance.__dict__:
+            return None
+        values[attname] = instance.__dict__[attname]
+    return values
+
+
+def refresh_snapshot(instance, fields, refreshed=None):
+    """
+    After refresh_from_db(): the reloaded values are what is stored now, so later saves
+    must be diffed against them (the row may have been changed with queryset.update()).
+    """
+    current = snapshot(instance, fields)
+    previous = getattr(instance, '_counter_snapshot', None)
+    if refreshed is None or previous is None or current is None:
+        instance._counter_snapshot = current
+        return
+    # Build a new dict: save() may still be holding the previous one as its "old" state
+    updated = dict(previous)
+    for name in fields:
+        attname = instance._meta.get_field(name).attname
+        if name in refreshed or attname in refreshed:
+            updated[attname] = current[attname]
+    instance._counter_snapshot = updated
+
+
+def state_before_save(instance, fields):
+    """
+    The tracked values currently stored for `instance`, or None when it is being inserted.
+    Only hits the database when the instance was loaded with deferred fields.
+    """
+    if instance._state.adding or instance.pk is None:
+        return None
+    old = getattr(instance, '_counter_snapshot', None)
+    if old is None:
+        attnames = [instance._meta.get_field(name).attname for name in fields]
+        old = type(instance).objects.filter(pk=instance.pk).values(*attnames).first()
+    return old
+
+
+def state_after_save(instance, fields, old, update_fields=None):
+    """
+    The tracked values now stored for `instance`. F() expressions are resolved by
+    re-reading just those fields, and fields left out of update_fields keep their old value.
+    """
+    new = {}
+    to_refresh = []
+    for name in fields:
+        attname = instance._meta.get_field(name).attname
+        if update_fields is not None and old is not None and name not in update_fields:
+            new[attname] = old[attname]
+            continue
+        value = getattr(instance, attname)
+        if hasattr(value, 'resolve_expression'):
+            to_refresh.append(name)
+        else:
+            new[attname] = value
+
+    if to_refresh:
+        instance.refresh_from_db(fields=to_refresh)
+        for name in to_refresh:
+            attname = instance._meta.get_field(name).attname
+            new[attname] = getattr(instance, attname)
+
+    instance._counter_snapshot = new
+    return new
+
+
+def record_request_change(old, new):
+    """Applies the move of one request from state `old` to `new` (either may be None)."""
+    old_contribution = _request_contribution(old) if old else {}
+    new_contribution = _request_contribution(new) if new else {}
+    apply_deltas(_subtract(new_contribution, old_contribution))
+    if new and (not old or old['status'] != new['status']):
+        journal_status_changes([new['status']])
+
+    old_requestor = old['requestor_id'] if old else None
+    new_requestor = new['requestor_id'] if new else None
+    if old_requestor == new_requestor:
+        if new_requestor is not None:
+            apply_deltas(_subtract(new_contribution, old_contribution), requestor_id=new_requestor)
+        return
+    if old_requestor is not None:
+        # The requestor (and their counters) may be mid-delete, so never create rows here
+        apply_deltas(_subtract({}, old_contribution), requestor_id=old_requestor,
+                     create_missing=False)
+    if new_requestor is not None:
+        apply_deltas(new_contribution, requestor_id=new_requestor)
+
+
+def record_item_change(old, new):
+    old_contribution = _item_contribution(old) if old else {}
+    new_contribution = _item_contribution(new) if new else {}
+    apply_deltas(_subtract(new_contribution, old_contribution))
+
+
+def record_items_created(items):
+    """For InventoryItem rows inserted with bulk_create()."""
+    apply_deltas({
+        name: sum(getattr(item, name) for item in items) for name in ITEM_TRACKED_FIELDS
+    })
+
+
+def record_stock_issued(quantity):
+    """For quantity_issued increments written with queryset.update() (see stock.issue_stock)."""
+    apply_deltas({'quantity_issued': quantity})
+
+
+def record_request_changes(changes):
+    """
+    For requests written with bulk_update(): applies every (old, new) state pair,
+    summed into one UPDATE for the global counters and one per requestor.
+    """
+    global_deltas = {}
+    requestor_deltas = {}
+    entered = []
+    for old, new in changes:
+        if old['requestor_id'] != new['requestor_id']:
+            # Not a status-only change; take the slow, exact path
+            record_request_change(old, new)
+            continue
+        if old['status'] != new['status']:
+            entered.append(new['status'])
+        delta = _subtract(_request_contribution(new), _request_contribution(old))
+        for bucket in (global_deltas, requestor_deltas.setdefault(new['requestor_id'], {})):
+            for name, amount in delta.items():
+                bucket[name] = bucket.get(name, 0) + amount
+
+    apply_deltas(global_deltas)
+    for requestor_id, deltas in requestor_deltas.items():
+        apply_deltas(deltas, requestor_id=requestor_id)
+    journal_status_changes(entered)
+
+
+def record_request_status_update(queryset, status):
+    """
+    Call just before `queryset.update(status=...)`, inside the same transaction,
+    so the counters follow requests whose status is changed in bulk.
+    """
+    rows = queryset.exclude(status=status).values(
+        'requestor_id', 'status', 'quantity', 'returned_quantity')
+    record_request_changes((old, dict(old, status=status)) for old in rows)
+
+
+# --- Rebuilding ---
+
+def compute_counters(item_model=InventoryItem, request_model=ItemRequest, archived_request_model=None):
+    """
+    Recomputes every counter from source data: one query for the inventory sums,
+    and per request table one for the global request counters and one grouped by
+    requestor. Archived requests (archived_request_model) count as well.
+    Returns a list of unsaved (requestor_id, name, value) tuples.
+    """
+    rows = []
+
+    totals = item_model.objects.aggregate(
+        **{name: Sum(name) for name in INVENTORY_COUNTERS})
+    rows += [(None, name, value or 0) for name, value in totals.items()]
+
+    aggregates = request_status_aggregates()
+    overall = dict.fromkeys(REQUEST_COUNTERS, 0)
+    per_requestor = {}
+    for model in filter(None, [request_model, archived_request_model]):
+        summary = model.objects.aggregate(**aggregates)
+        for name in REQUEST_COUNTERS:
+            overall[name] += summary[name] or 0
+        for summary in model.objects.order_by().values('requestor_id').annotate(**aggregates):
+            counts = per_requestor.setdefault(summary['requestor_id'], dict.fromkeys(REQUEST_COUNTERS, 0))
+            for name in REQUEST_COUNTERS:
+                counts[name] += summary[name] or 0
+
+    rows += [(None, name, value) for name, value in overall.items()]
+    for requestor_id, counts in per_requestor.items():
+        rows += [(requestor_id, name, value) for name, value in counts.items()]
+    return rows
+
+
+def rebuild_counters():
+    """Replaces the whole counters table with freshly computed values. Returns the row count."""
+    with transaction.atomic():
+        rows = compute_counters(archived_request_model=ArchivedItemRequest)
+        DashboardCounter.objects.all().delete()
+        DashboardCounter.objects.bulk_create([
+            DashboardCounter(requestor_id=requestor_id, name=name, value=value)
+            for requestor_id, name, value in rows
+        ])
+        invalidate_pending_count()
+        bump_generation()
+    return len(rows)
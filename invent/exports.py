@@ -0,0 +1,44 @@
+import tempfile
+
+from django.http import FileResponse
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# How many rows to pull from the database per round trip while exporting
+EXPORT_CHUNK_SIZE = 2000
+
+
+def xlsx_streaming_response(filename, sheet_title, headers, rows, column_width=None):
+    """
+    Writes `rows` into a write-only workbook and streams the result back as a download.
+
+    The write-only worksheet flushes rows to a temp file as they are appended, and
+    the finished workbook is spooled to another temp file, so memory stays flat no
+    matter how many rows the queryset yields. `rows` should be a lazy iterable
+    (e.g. a generator over `queryset.iterator()`).
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title)
+
+    # Column widths must be set before the first row is written in write-only mode
+    if column_width:
+        for i in range(1, len(headers) + 1):
+            ws.column_dimensions[get_column_letter(i)].width = column_width
+
+    ws.append(headers)
+    for row in rows:
+        ws.append(row)
+
+    output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
+
+    # FileResponse streams the file in blocks and closes it once the response is done
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=filename,
+        content_type=XLSX_CONTENT_TYPE,
+    )
@@ -0,0 +1,178 @@
+import openpyxl
+from django.db import transaction
+
+from .changelog import record_changes
+from .counters import record_items_created
+from .ledger import record_opening_balances
+from .models import InventoryItem
+
+# Rows are validated, de-duplicated and inserted this many at a time
+IMPORT_BATCH_SIZE = 500
+
+# Expected column order of the upload sheet (header row is skipped)
+UPLOAD_COLUMNS = ['name', 'serial', 'category', 'condition',
+                  'status', 'total', 'issued', 'returned']
+
+VALID_CONDITIONS = {choice[0] for choice in InventoryItem.CONDITION_CHOICES}
+VALID_STATUSES = {choice[0] for choice in InventoryItem.STATUS_CHOICES}
+
+
+class ImportReport:
+    """Outcome of an inventory import: how many rows were created and why the others were not."""
+
+    def __init__(self):
+        self.created_count = 0
+        self.skipped_count = 0
+        # List of (row_number, item_name, message) tuples, in sheet order
+        self.errors = []
+
+    def add_error(self, row_number, name, message):
+        self.errors.append((row_number, name or '', message))
+        self.skipped_count += 1
+
+
+def _clean_text(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def _clean_quantity(value, label):
+    if value is None or value == '':
+        return 0
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{label} must be a whole number (got '{value}').")
+    if quantity < 0:
+        raise ValueError(f"{label} cannot be negative.")
+    return quantity
+
+
+def normalize_row(values):
+    """
+    Turns one raw sheet row into keyword arguments for InventoryItem.
+    Raises ValueError with a user-facing message if the row is invalid.
+    """
+    # Pad/trim so short or over-wide rows don't blow up the unpacking
+    values = (list(values) + [None] * len(UPLOAD_COLUMNS))[:len(UPLOAD_COLUMNS)]
+    name, serial, category, condition, status, total, issued, returned = values
+
+    name = _clean_text(name)
+    if not name:
+        raise ValueError("Item name is required.")
+    if len(name) > 255:
+        raise ValueError("Item name is longer than 255 characters.")
+
+    # Blank serials are stored as NULL so they don't collide on the unique index
+    serial = _clean_text(serial) or None
+    if serial and len(serial) > 255:
+        raise ValueError("Serial number is longer than 255 characters.")
+
+    category = _clean_text(category)
+    if len(category) > 100:
+        raise ValueError("Category is longer than 100 characters.")
+
+    condition = _clean_text(condition) or "Serviceable"
+    if condition not in VALID_CONDITIONS:
+        raise ValueError(f"Unknown condition '{condition}'.")
+
+    status = _clean_text(status) or "In Stock"
+    if status not in VALID_STATUSES:
+        raise ValueError(f"Unknown status '{status}'.")
+
+    quantity_total = _clean_quantity(total, "Total quantity")
+    quantity_issued = _clean_quantity(issued, "Issued quantity")
+    quantity_returned = _clean_quantity(returned, "Returned quantity")
+    if quantity_issued > quantity_total:
+        raise ValueError("Quantity issued cannot be greater than total quantity.")
+
+    return {
+        'name': name,
+        'serial_number': serial,
+        'category': category,
+        'condition': condition,
+        'status': status,
+        'quantity_total': quantity_total,
+        'quantity_issued': quantity_issued,
+        'quantity_returned': quantity_returned,
+    }
+
+
+def _flush_batch(batch, seen_serials, report, created_by, batch_size):
+    """
+    Checks a batch of (row_number, fields) against the database in one query
+    and bulk-inserts the rows whose serial numbers are new.
+    """
+    serials = [fields['serial_number'] for _, fields in batch if fields['serial_number']]
+    existing = set(
+        InventoryItem.objects.filter(serial_number__in=serials)
+        .values_list('serial_number', flat=True)
+    ) if serials else set()
+
+    new_items = []
+    for row_number, fields in batch:
+        serial = fields['serial_number']
+        if serial in existing:
+            report.add_error(row_number, fields['name'],
+                             f"An item with serial number '{serial}' already exists.")
+            continue
+        if serial and serial in seen_serials:
+            report.add_error(row_number, fields['name'],
+                             f"Serial number '{serial}' appears more than once in this file.")
+            continue
+        if serial:
+            seen_serials.add(serial)
+        new_items.append(InventoryItem(created_by=created_by, **fields))
+
+    InventoryItem.objects.bulk_create(new_items, batch_size=batch_size)
+    # bulk_create() skips save(), so keep the dashboard counters, opening balances and
+    # change log in step by hand
+    record_items_created(new_items)
+    record_opening_balances(new_items)
+    record_changes(InventoryItem, [item.pk for item in new_items], 'insert')
+    report.created_count += len(new_items)
+
+
+def import_inventory_workbook(file, created_by, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Streams an inventory .xlsx upload and bulk-inserts its rows.
+
+    The workbook is opened read-only so rows are parsed lazily instead of loading
+    the whole sheet, and every batch costs one SELECT for serial de-duplication
+    plus chunked INSERTs. All inserts run in a single transaction; invalid rows
+    are skipped and described in the returned ImportReport.
+    """
+    report = ImportReport()
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = wb.active
+        seen_serials = set()
+        batch = []
+
+        with transaction.atomic():
+            # Skip header row; row numbers match what the user sees in Excel
+            for row_number, values in enumerate(sheet.iter_rows(min_row=2, values_only=True), 2):
+                # Read-only sheets often report trailing blank rows
+                if not any(value not in (None, '') for value in values):
+                    continue
+
+                try:
+                    fields = normalize_row(values)
+                except ValueError as e:
+                    report.add_error(row_number, _clean_text(values[0]) if values else '', str(e))
+                    continue
+
+                batch.append((row_number, fields))
+                if len(batch) >= batch_size:
+                    _flush_batch(batch, seen_serials, report, created_by, batch_size)
+                    batch = []
+
+            if batch:
+                _flush_batch(batch, seen_serials, report, created_by, batch_size)
+    finally:
+        wb.close()
+
+    # Duplicate-serial errors are found per batch, so put everything back in sheet order
+    report.errors.sort(key=lambda error: error[0])
+    return report
@@ -0,0 +1,217 @@
+"""
+Reconciling InventoryItem quantities with the StockTransaction ledger.
+
+The quantities on InventoryItem are updated separately from the ledger rows that
+explain them, so they can drift apart (edits by hand, a failed write path, admin
+changes). reconcile() replays the ledger, grouped per item and transaction type in
+one streamed query, and compares the result with the stored quantities.
+
+Each consistent item gets a StockCheckpoint: its quantities as of the newest ledger
+row at the time of the run. Later runs start from the checkpoint and only read the
+transactions recorded since. Without a checkpoint (or with `full`) the replay starts
+from the item's StockOpeningBalance: the quantities it was created with (see
+record_opening_balances()) plus the sum of its archived ledger rows (see archive.py).
+
+An item with no checkpoint, no opening balance and no ledger rows has nothing to
+replay, so --fix leaves it alone rather than zeroing its quantities.
+"""
+from django.db import transaction
+from django.db.models import F, Max, Min, Q, Sum
+
+from .models import InventoryItem, StockCheckpoint, StockOpeningBalance, StockTransaction
+
+QUANTITY_FIELDS = ['quantity_total', 'quantity_issued', 'quantity_returned']
+
+# What one unit of each transaction type does to (quantity_total, quantity_issued,
+# quantity_returned), as written by adjust_stock, stock.issue_stock and the return views
+LEDGER_EFFECTS = {
+    'Receive': (1, 0, 0),
+    'Adjustment': (1, 0, 0),
+    'Issue': (0, 1, 0),
+    'Return': (1, -1, 1),
+}
+
+CHECKPOINT_BATCH_SIZE = 1000
+
+
+def apply_transactions(balance, transaction_type, quantity):
+    """Adds `quantity` units of `transaction_type` to a [total, issued, returned] list."""
+    for i, effect in enumerate(LEDGER_EFFECTS.get(transaction_type, (0, 0, 0))):
+        balance[i] += effect * quantity
+
+
+def _grouped_ledger(high_water, full, item_ids):
+    """
+    Sum of quantities per (item, transaction type) for the ledger rows not yet folded
+    into a checkpoint, ordered by item so it can be merged with the items as it streams.
+    """
+    rows = StockTransaction.objects.filter(id__lte=high_water)
+    if item_ids:
+        rows = rows.filter(item_id__in=item_ids)
+    if not full:
+        items = InventoryItem.objects.filter(pk__in=item_ids) if item_ids else InventoryItem.objects.all()
+        if not items.filter(stock_checkpoint__isnull=True).exists():
+            # Everything is checkpointed, so the primary key bounds the range to read
+            floor = StockCheckpoint.objects.filter(item__in=items).aggregate(
+                floor=Min('last_transaction_id'))['floor'] or 0
+            rows = rows.filter(id__gt=floor)
+        rows = rows.filter(Q(item__stock_checkpoint__isnull=True)
+                           | Q(id__gt=F('item__stock_checkpoint__last_transaction_id')))
+    return (rows.order_by('item_id').values('item_id', 'transaction_type')
+            .annotate(quantity=Sum('quantity')).iterator())
+
+
+def _checkpoint_values(item, full):
+    if full or item['stock_checkpoint__last_transaction_id'] is None:
+        return [item[f'opening_balance__{name}'] or 0 for name in QUANTITY_FIELDS], None
+    return [item[f'stock_checkpoint__{name}'] for name in QUANTITY_FIELDS], \
+        item['stock_checkpoint__last_transaction_id']
+
+
+def _save_checkpoints(checkpoints):
+    StockCheckpoint.objects.bulk_create(
+        checkpoints, update_conflicts=True, unique_fields=['item'],
+        update_fields=['last_transaction_id', *QUANTITY_FIELDS, 'updated_at'],
+    )
+
+
+def record_opening_balances(items):
+    """
+    Records the quantities newly created items start with as their opening balances,
+    so the ledger, which only holds later stock movements, still adds up to them.
+    Call in the same transaction as the insert; InventoryItem.save() does it for
+    single items, bulk_create() callers have to do it themselves.
+    """
+    StockOpeningBalance.objects.bulk_create([
+        StockOpeningBalance(item_id=item.pk, **{name: getattr(item, name) for name in QUANTITY_FIELDS})
+        for item in items
+    ])
+
+
+def _expected_now(item_id, full=False):
+    """
+    Exact expected quantities for one item, from its checkpoint and every later ledger row.
+    Returns (quantities, last transaction id, whether there was anything to replay).
+    """
+    checkpoint = None if full else StockCheckpoint.objects.filter(item_id=item_id).first()
+    start = checkpoint or StockOpeningBalance.objects.filter(item_id=item_id).first()
+    balance = [getattr(start, name) for name in QUANTITY_FIELDS] if start else [0, 0, 0]
+    last_id = checkpoint.last_transaction_id if checkpoint else 0
+    rows = (StockTransaction.objects.filter(item_id=item_id, id__gt=last_id).order_by()
+            .values('transaction_type').annotate(quantity=Sum('quantity'), last=Max('id')))
+    has_history = start is not None
+    for row in rows:
+        apply_transactions(balance, row['transaction_type'], row['quantity'])
+        last_id = max(last_id, row['last'])
+        has_history = True
+    return balance, last_id, has_history
+
+
+def _confirm(item_id, fix, full):
+    """
+    Re-checks a suspected mismatch with the item row locked, so changes made while the
+    ledger was being streamed are not reported. Returns the mismatch dict, or None if
+    the item turned out to be consistent.
+    """
+    with transaction.atomic():
+        item = InventoryItem.objects.select_for_update().filter(pk=item_id).first()
+        if item is None:
+            return None
+        expected, last_id, has_history = _expected_now(item_id, full)
+        stored = [getattr(item, name) for name in QUANTITY_FIELDS]
+        if stored == expected:
+            return None
+
+        mismatch = {
+            'item_id': item.pk,
+            'name': item.name,
+            'stored': dict(zip(QUANTITY_FIELDS, stored)),
+            'expected': dict(zip(QUANTITY_FIELDS, expected)),
+            'fixed': False,
+            # Why --fix left it alone
+            'reason': None,
+        }
+        if not has_history:
+            mismatch['reason'] = "the item has no ledger history or checkpoint"
+        elif min(expected) < 0:
+            mismatch['reason'] = "the ledger adds up to a negative amount"
+        if fix and mismatch['reason'] is None:
+            for name, value in zip(QUANTITY_FIELDS, expected):
+                setattr(item, name, value)
+            # save() keeps the dashboard counters in step
+            item.save(update_fields=QUANTITY_FIELDS + ['updated_at'])
+            _save_checkpoints([StockCheckpoint(
+                item_id=item.pk, last_transaction_id=last_id,
+                **dict(zip(QUANTITY_FIELDS, expected)))])
+            mismatch['fixed'] = True
+        return mismatch
+
+
+def reconcile(fix=False, baseline=False, full=False, checkpoint=True, item_ids=None):
+    """
+    Compares every item's quantities (or just those in `item_ids`) with the ledger.
+
+    fix:        set mismatched quantities to what the ledger says (unless that is negative,
+                or the item has no opening balance, checkpoint or ledger rows at all)
+    baseline:   accept the stored quantities of items without a checkpoint as their
+                opening balance, e.g. stock entered before the ledger existed
+    full:       ignore checkpoints and replay the whole ledger
+    checkpoint: write checkpoints for consistent items
+
+    Returns a summary dict; 'mismatches' lists one dict per confirmed mismatch.
+    """
+    high_water = StockTransaction.objects.aggregate(high=Max('id'))['high'] or 0
+    ledger = _grouped_ledger(high_water, full, item_ids)
+    pending = next(ledger, None)
+
+    items = InventoryItem.objects.order_by('pk').values(
+        'pk', *QUANTITY_FIELDS, 'stock_checkpoint__last_transaction_id',
+        *[f'stock_checkpoint__{name}' for name in QUANTITY_FIELDS],
+        *[f'opening_balance__{name}' for name in QUANTITY_FIELDS])
+    if item_ids:
+        items = items.filter(pk__in=item_ids)
+
+    summary = {'items': 0, 'ledger_groups': 0, 'checkpoints': 0, 'baselined': 0, 'mismatches': []}
+    suspects = []
+    checkpoints = []
+    for item in items.iterator(chunk_size=2000):
+        summary['items'] += 1
+        expected, last_id = _checkpoint_values(item, full)
+        new_rows = False
+        # Rows of items that no longer exist sort before the next item; skip them
+        while pending is not None and pending['item_id'] < item['pk']:
+            pending = next(ledger, None)
+        while pending is not None and pending['item_id'] == item['pk']:
+            apply_transactions(expected, pending['transaction_type'], pending['quantity'])
+            summary['ledger_groups'] += 1
+            new_rows = True
+            pending = next(ledger, None)
+
+        stored = [item[name] for name in QUANTITY_FIELDS]
+        if stored != expected:
+            if baseline and last_id is None and not full:
+                checkpoints.append(StockCheckpoint(
+                    item_id=item['pk'], last_transaction_id=high_water,
+                    **dict(zip(QUANTITY_FIELDS, stored))))
+                summary['baselined'] += 1
+            else:
+                suspects.append(item['pk'])
+        elif checkpoint and (new_rows or last_id is None):
+            checkpoints.append(StockCheckpoint(
+                item_id=item['pk'], last_transaction_id=high_water,
+                **dict(zip(QUANTITY_FIELDS, expected))))
+
+        if len(checkpoints) >= CHECKPOINT_BATCH_SIZE:
+            _save_checkpoints(checkpoints)
+            summary['checkpoints'] += len(checkpoints)
+            checkpoints = []
+
+    if checkpoints:
+        _save_checkpoints(checkpoints)
+        summary['checkpoints'] += len(checkpoints)
+
+    for item_id in suspects:
+        mismatch = _confirm(item_id, fix, full)
+        if mismatch:
+            summary['mismatches'].append(mismatch)
+    return summary
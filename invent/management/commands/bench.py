@@ -0,0 +1,219 @@
+import json
+import math
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from invent import urls as invent_urls
+from invent.benchdata import BENCH_CLERK_USERNAME, bench_users, seed_dataset, throwaway_database
+from invent.models import InventoryItem, ItemRequest, StockTransaction
+
+# Pages viewed logged out, and pages viewed as the requestor; everything else is the clerk's
+ANONYMOUS_VIEWS = {'register', 'login'}
+REQUESTOR_VIEWS = {'requestor_dashboard', 'requestor_dashboard_async', 'request_item', 'request_summary',
+                   'cancel_request'}
+# Views a GET cannot exercise
+SKIPPED_VIEWS = {
+    'logout': 'ends the session',
+    'batch_request_action': 'POST only',
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Requests every page in invent/urls.py through the test client and reports p50/p95/p99 '
+            'latency, query count and peak Python memory per view, as JSON for comparing runs.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Timed requests per view, after one warm-up request (default: 20)')
+        parser.add_argument('--views', nargs='+', metavar='URL_NAME',
+                            help='Only benchmark these views (URL names)')
+        parser.add_argument('--output', default='bench_results.json',
+                            help='Where to write the JSON results (default: bench_results.json)')
+        parser.add_argument('--compare', metavar='PATH',
+                            help='Earlier results file to print the latency change against')
+        parser.add_argument('--existing', action='store_true',
+                            help='Use the configured database (seeded with seed_bench_data) instead '
+                                 'of a throwaway one')
+        parser.add_argument('--users', type=int, default=50,
+                            help='Throwaway database only: requestor accounts (default: 50)')
+        parser.add_argument('--items', type=int, default=500,
+                            help='Throwaway database only: inventory items (default: 500)')
+        parser.add_argument('--requests', type=int, default=5000,
+                            help='Throwaway database only: item requests (default: 5000)')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be at least 1.")
+
+        if options['existing']:
+            if not User.objects.filter(username=BENCH_CLERK_USERNAME).exists():
+                raise CommandError("No benchmark data found. Run `manage.py seed_bench_data` first.")
+            # Lets the test client's host through ALLOWED_HOSTS and keeps emails in memory
+            setup_test_environment()
+            try:
+                results = self.run(options)
+            finally:
+                teardown_test_environment()
+        else:
+            with throwaway_database():
+                seed_dataset(users=options['users'], items=options['items'],
+                             requests=options['requests'], adjustments=options['requests'] // 5, seed=1)
+                results = self.run(options)
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        self.print_table(results, options['compare'])
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def run(self, options):
+        clerk, requestor = bench_users()
+        clients = {'anonymous': Client(), 'clerk': Client(), 'requestor': Client()}
+        clients['clerk'].force_login(clerk)
+        clients['requestor'].force_login(requestor)
+
+        views = {}
+        for name, url, role in self.targets(requestor, options['views']):
+            if url is None:
+                views[name] = {'skipped': role}
+                continue
+            views[name] = self.measure(clients[role], url, role, options['iterations'])
+
+        return {
+            'meta': {
+                'revision': git_revision(),
+                'timestamp': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'dataset': {
+                    'users': User.objects.count(),
+                    'items': InventoryItem.objects.count(),
+                    'requests': ItemRequest.objects.count(),
+                    'transactions': StockTransaction.objects.count(),
+                },
+            },
+            'views': views,
+        }
+
+    def targets(self, requestor, only=None):
+        """(url name, url or None, role or skip reason) for every named route in invent/urls.py."""
+        sample_kwargs = {
+            'cancel_request': lambda: ItemRequest.objects.filter(
+                requestor=requestor, status='Pending').values_list('pk', flat=True).first(),
+            'edit_item': lambda: InventoryItem.objects.values_list('pk', flat=True).first(),
+            'process_return_for_request': lambda: ItemRequest.objects.filter(status='Issued').exclude(
+                quantity__lte=F('returned_quantity')).values_list('pk', flat=True).first(),
+        }
+        for pattern in invent_urls.urlpatterns:
+            name = pattern.name
+            if not name or (only and name not in only):
+                continue
+            if name in SKIPPED_VIEWS:
+                yield name, None, SKIPPED_VIEWS[name]
+                continue
+
+            kwargs = None
+            converters = pattern.pattern.converters
+            if converters:
+                sample = sample_kwargs.get(name, lambda: None)()
+                if sample is None:
+                    yield name, None, 'no suitable row in the dataset'
+                    continue
+                kwargs = {next(iter(converters)): sample}
+
+            role = ('anonymous' if name in ANONYMOUS_VIEWS
+                    else 'requestor' if name in REQUESTOR_VIEWS else 'clerk')
+            yield name, reverse(name, kwargs=kwargs), role
+
+    def fetch(self, client, url):
+        response = client.get(url)
+        if response.streaming:
+            # Exports stream their body; time the whole download
+            b''.join(response.streaming_content)
+            response.close()
+        return response
+
+    def measure(self, client, url, role, iterations):
+        self.fetch(client, url)  # warm-up
+
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            response = self.fetch(client, url)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+
+        # One separate profiled request, so query capture and tracemalloc don't skew the timings
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                self.fetch(client, url)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'url': url,
+            'role': role,
+            'status': response.status_code,
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'p99_ms': round(percentile(timings, 99), 2),
+            'mean_ms': round(sum(timings) / len(timings), 2),
+            'queries': len(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def print_table(self, results, compare_path=None):
+        previous = {}
+        if compare_path:
+            try:
+                with open(compare_path) as f:
+                    previous = json.load(f).get('views', {})
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read {compare_path}: {e}")
+
+        self.stdout.write(f"{'view':34} {'p50':>9} {'p95':>9} {'p99':>9} {'queries':>8} {'peak KB':>9}")
+        for name, view in results['views'].items():
+            if 'skipped' in view:
+                self.stdout.write(f"{name:34} skipped ({view['skipped']})")
+                continue
+            line = (f"{name:34} {view['p50_ms']:>7.1f}ms {view['p95_ms']:>7.1f}ms {view['p99_ms']:>7.1f}ms "
+                    f"{view['queries']:>8} {view['peak_memory_kb']:>9.0f}")
+            if view['status'] != 200:
+                line += f"  HTTP {view['status']}"
+            before = previous.get(name, {}).get('p50_ms')
+            if before:
+                change = (view['p50_ms'] - before) / before * 100
+                line += f"  p50 {change:+.0f}% vs {before:.1f}ms"
+            self.stdout.write(line)
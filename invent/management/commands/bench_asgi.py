@@ -0,0 +1,200 @@
+import asyncio
+import io
+import random
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from invent.benchdata import bench_users, seed_dataset, throwaway_database
+
+# (sync view, async variant, who looks at it), by url name
+VIEW_PAIRS = (
+    ('store_clerk_dashboard', 'store_clerk_dashboard_async', 'clerk'),
+    ('requestor_dashboard', 'requestor_dashboard_async', 'requestor'),
+    ('reports', 'reports_async', 'clerk'),
+)
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = ('Compares the async dashboard and reports views served by Django\'s ASGI handler with the '
+            'sync views served by its WSGI handler. Both handlers are called in-process, the WSGI one '
+            'from a pool of threads like a threaded WSGI server and the ASGI one from concurrent tasks '
+            'on one event loop, against a throwaway on-disk database. Reports requests per second and '
+            'p50/p95 latency per view.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Timed requests per view and handler (default: 200)')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Requests in flight at once: WSGI threads or ASGI tasks (default: 8)')
+        parser.add_argument('--data-requests', type=int, default=5000,
+                            help='Item requests in the seeded dataset (default: 5000)')
+        parser.add_argument('--cold-cache', action='store_true',
+                            help='Clear the cache before every request, so the reports are computed '
+                                 'each time instead of served from the report cache')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--requests and --concurrency must be at least 1.")
+        self.options = options
+
+        # Threads and the ASGI handler's per-request threads need a shared on-disk database
+        with throwaway_database(on_disk=True):
+            seed_dataset(users=20, items=200, requests=options['data_requests'],
+                         adjustments=options['data_requests'] // 5,
+                         seed=random.Random(options['seed']).randrange(1 << 30))
+            clerk, requestor = bench_users()
+            self.cookies = {'clerk': self.session_cookie(clerk), 'requestor': self.session_cookie(requestor)}
+            # The throwaway database only exists on disk from here on; let the handlers open their own
+            connection.close()
+
+            self.wsgi_app = get_wsgi_application()
+            self.asgi_app = get_asgi_application()
+            self.stdout.write(f"{options['requests']} requests per view, {options['concurrency']} at a time"
+                              f"{', cold cache' if options['cold_cache'] else ''}")
+            for sync_name, async_name, role in VIEW_PAIRS:
+                self.compare(sync_name, async_name, self.cookies[role])
+
+    def session_cookie(self, user):
+        client = Client()
+        client.force_login(user)
+        return f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+    def compare(self, sync_name, async_name, cookie):
+        wsgi = self.measure(self.run_wsgi, reverse(sync_name), cookie)
+        asgi = self.measure(self.run_asgi, reverse(async_name), cookie)
+        for label, stats in ((f'{sync_name} (WSGI)', wsgi), (f'{async_name} (ASGI)', asgi)):
+            line = (f"  {label:<38} {stats['rps']:>7,.1f} req/s  p50 {stats['p50']:>6.1f}ms  "
+                    f"p95 {stats['p95']:>6.1f}ms")
+            if stats['errors']:
+                self.stdout.write(self.style.ERROR(f"{line}  {stats['errors']} failed"))
+            else:
+                self.stdout.write(line)
+        if wsgi['rps']:
+            self.stdout.write(self.style.SUCCESS(
+                f"  ASGI: {asgi['rps'] / wsgi['rps']:.2f}x the requests per second, "
+                f"p95 {asgi['p95'] - wsgi['p95']:+.1f}ms"))
+
+    def measure(self, run, path, cookie):
+        # One untimed request first, so URL resolving, templates and the cache are warm
+        run(path, cookie, 1)
+        started = time.perf_counter()
+        latencies, errors = run(path, cookie, self.options['requests'])
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            'rps': len(latencies) / elapsed,
+            'p50': statistics.median(latencies) if latencies else 0.0,
+            'p95': percentile(latencies, 0.95) if latencies else 0.0,
+            'errors': errors,
+        }
+
+    def before_request(self):
+        if self.options['cold_cache']:
+            cache.clear()
+
+    # --- WSGI ---
+
+    def run_wsgi(self, path, cookie, total):
+        remaining = iter(range(total))
+        lock = threading.Lock()
+        latencies, errors = [], []
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if next(remaining, None) is None:
+                            return
+                    self.before_request()
+                    started = time.perf_counter()
+                    status = self.wsgi_get(path, cookie)
+                    with lock:
+                        (latencies if status == 200 else errors).append((time.perf_counter() - started) * 1000)
+            finally:
+                # Each thread has its own database connection
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(min(self.options['concurrency'], total))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, len(errors)
+
+    def wsgi_get(self, path, cookie):
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+            'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1', 'HTTP_HOST': 'testserver', 'HTTP_COOKIE': cookie,
+            'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        statuses = []
+        response = self.wsgi_app(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            for _ in response:
+                pass
+        finally:
+            # What a WSGI server does; fires request_finished, which closes old connections
+            response.close()
+        return int(statuses[0].split()[0])
+
+    # --- ASGI ---
+
+    def run_asgi(self, path, cookie, total):
+        return asyncio.run(self.asgi_workers(path, cookie, total))
+
+    async def asgi_workers(self, path, cookie, total):
+        remaining = iter(range(total))
+        latencies, errors = [], []
+
+        async def worker():
+            while next(remaining, None) is not None:
+                self.before_request()
+                started = time.perf_counter()
+                status = await self.asgi_get(path, cookie)
+                (latencies if status == 200 else errors).append((time.perf_counter() - started) * 1000)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.options['concurrency'], total))))
+        return latencies, len(errors)
+
+    async def asgi_get(self, path, cookie):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+            'root_path': '', 'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        body_sent = False
+        statuses = []
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # The handler listens for a disconnect until the response is sent, then gives up
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        await self.asgi_app(scope, receive, send)
+        return statuses[0]
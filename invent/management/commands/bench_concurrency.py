@@ -0,0 +1,197 @@
+import logging
+import random
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import F
+from django.test import Client
+from django.urls import reverse
+
+from invent.benchdata import bench_users, seed_dataset, throwaway_database
+from invent.counters import rebuild_counters
+from invent.models import InventoryItem
+
+PROFILES = ('default', 'production')
+
+# Share of the write mix per kind of write
+WRITE_MIX = (('issue', 5), ('adjust', 3), ('request', 2))
+
+
+class RetryCounter(logging.Handler):
+    """Counts the retries retry_on_lock logs. Handler.handle() already holds the handler's lock."""
+
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+class Command(BaseCommand):
+    help = ('Compares the default SQLite settings with the production profile '
+            '(settings.SQLITE_PRODUCTION_OPTIONS): clerks post stock issues, adjustments and item '
+            'requests through the real views from several threads while others load the dashboard, '
+            'against a throwaway on-disk database. Reports writes and reads per second.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8,
+                            help='Threads posting writes (default: 8)')
+        parser.add_argument('--readers', type=int, default=2,
+                            help='Threads loading the clerk dashboard meanwhile (default: 2)')
+        parser.add_argument('--duration', type=float, default=5.0,
+                            help='Seconds to run each profile for (default: 5)')
+        parser.add_argument('--profile', choices=PROFILES + ('both',), default='both',
+                            help='Which database profile to measure (default: both)')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("This benchmark compares SQLite profiles; the database is not SQLite.")
+        if options['writers'] < 1:
+            raise CommandError("--writers must be at least 1.")
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        profiles = PROFILES if options['profile'] == 'both' else (options['profile'],)
+
+        self.stdout.write(f"{options['writers']} writers, {options['readers']} readers, "
+                          f"{options['duration']:g}s per profile")
+        results = {profile: self.run_profile(profile) for profile in profiles}
+
+        if len(results) == 2 and results['default']['writes_per_second']:
+            gain = results['production']['writes_per_second'] / results['default']['writes_per_second']
+            self.stdout.write(self.style.SUCCESS(f"Production profile: {gain:.1f}x the write throughput."))
+
+    def run_profile(self, profile):
+        settings_dict = connections.settings[connection.alias]
+        saved_options = settings_dict.get('OPTIONS', {})
+        request_logger = logging.getLogger('django.request')
+        retry_logger = logging.getLogger('invent.retry')
+        saved_levels = (request_logger.level, retry_logger.level)
+        retries = RetryCounter()
+
+        # Every connection opened from now on (one per thread) uses the profile's options
+        connection.close()
+        settings_dict['OPTIONS'] = dict(settings.SQLITE_PRODUCTION_OPTIONS) if profile == 'production' else {}
+        # Failed writes are counted below; don't print a traceback for each
+        request_logger.setLevel(logging.CRITICAL)
+        retry_logger.setLevel(logging.INFO)
+        retry_logger.addHandler(retries)
+        try:
+            # Threads need a shared on-disk database; in-memory SQLite test databases are per connection
+            with throwaway_database(on_disk=True):
+                self.setup_data()
+                stats = self.run_workers()
+                stats['retries'] = retries.count
+        finally:
+            retry_logger.removeHandler(retries)
+            request_logger.setLevel(saved_levels[0])
+            retry_logger.setLevel(saved_levels[1])
+            connection.close()
+            settings_dict['OPTIONS'] = saved_options
+
+        elapsed = stats['elapsed']
+        stats['writes_per_second'] = stats['writes'] / elapsed
+        latencies = sorted(stats['latencies']) or [0]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(
+            f"  {profile:<10} {stats['writes']:>6} writes = {stats['writes_per_second']:>6,.0f}/s "
+            f"(p50 {statistics.median(latencies):.0f}ms, p95 {p95:.0f}ms), "
+            f"failed: {stats['failed']}, lock retries: {stats['retries']}; "
+            f"{stats['reads']} reads = {stats['reads'] / elapsed:,.0f}/s")
+        return stats
+
+    def setup_data(self):
+        seed_dataset(users=5, items=20, requests=200, adjustments=20, days=30,
+                     seed=self.rng.randrange(1 << 30))
+        # Plenty of stock, so issues never fail for lack of it
+        InventoryItem.objects.update(quantity_total=F('quantity_total') + 1_000_000)
+        rebuild_counters()
+        self.clerk, self.requestor = bench_users()
+        self.item_ids = list(InventoryItem.objects.values_list('pk', flat=True))
+
+    def run_workers(self):
+        writers, readers = self.options['writers'], self.options['readers']
+        self.stats = {'writes': 0, 'failed': 0, 'reads': 0, 'latencies': []}
+        self.lock = threading.Lock()
+        self.start = threading.Barrier(writers + readers + 1)
+        self.stop = threading.Event()
+
+        # Log everyone in up front; the sessions are written to the database too
+        threads = [threading.Thread(target=self.run_worker, args=(
+            self.write_worker, i, {'clerk': self.client(self.clerk), 'requestor': self.client(self.requestor)}))
+            for i in range(writers)]
+        threads += [threading.Thread(target=self.run_worker, args=(self.read_worker, i, self.client(self.clerk)))
+                    for i in range(readers)]
+        for thread in threads:
+            thread.start()
+        self.start.wait()
+        started = time.monotonic()
+        time.sleep(self.options['duration'])
+        self.stop.set()
+        for thread in threads:
+            thread.join()
+        self.stats['elapsed'] = time.monotonic() - started
+        return self.stats
+
+    def client(self, user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def run_worker(self, worker, number, clients):
+        try:
+            worker(random.Random(self.rng.random() + number), clients)
+        finally:
+            # Each thread has its own database connection
+            connection.close()
+
+    def count(self, **amounts):
+        with self.lock:
+            for name, amount in amounts.items():
+                if name == 'latency':
+                    self.stats['latencies'].append(amount)
+                else:
+                    self.stats[name] += amount
+
+    def write_worker(self, rng, clients):
+        kinds, weights = zip(*WRITE_MIX)
+        self.start.wait()
+        while not self.stop.is_set():
+            kind = rng.choices(kinds, weights)[0]
+            item_id = rng.choice(self.item_ids)
+            if kind == 'issue':
+                client, url = clients['clerk'], reverse('issue_item')
+                data = {'item': item_id, 'quantity': 1, 'issued_to': 'bench'}
+            elif kind == 'adjust':
+                client, url = clients['clerk'], reverse('adjust_stock')
+                data = {'item': item_id, 'adjustment_quantity': 1, 'reason': 'bench'}
+            else:
+                client, url = clients['requestor'], reverse('request_item')
+                data = {'item': item_id, 'quantity': 1, 'reason': 'bench'}
+
+            started = time.perf_counter()
+            try:
+                # Each of these views redirects after a successful write
+                ok = client.post(url, data).status_code == 302
+            except Exception:
+                # Lock errors that outlasted retry_on_lock
+                ok = False
+            if ok:
+                self.count(writes=1, latency=(time.perf_counter() - started) * 1000)
+            else:
+                self.count(failed=1)
+
+    def read_worker(self, rng, client):
+        url = reverse('store_clerk_dashboard')
+        self.start.wait()
+        while not self.stop.is_set():
+            try:
+                if client.get(url).status_code == 200:
+                    self.count(reads=1)
+            except Exception:
+                pass
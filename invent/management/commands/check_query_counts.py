@@ -0,0 +1,83 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from invent.benchdata import QUERY_BUDGETS, VIEW_PROBES, bench_users, seed_dataset, throwaway_database
+
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway test database at two sizes, renders the main pages and fails if '
+            'any page runs a different number of queries than its budget, or if the number grows '
+            'with the data (an N+1 query).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000,
+                            help='Number of synthetic item requests in the larger dataset (default: 5000)')
+        parser.add_argument('--show-queries', action='store_true',
+                            help='Print the SQL of pages that fail their budget')
+
+    def handle(self, *args, **options):
+        requests = options['requests']
+        with throwaway_database():
+            seed_dataset(users=10, items=50, requests=requests // 10, adjustments=100, seed=1)
+            small = self.measure()
+            seed_dataset(users=40, items=450, requests=requests - requests // 10, adjustments=900, seed=2)
+            large = self.measure()
+
+        failures = 0
+        for probe, (count, queries) in large.items():
+            label = self.label(probe)
+            budget = QUERY_BUDGETS.get((probe[0], probe[3]))
+            problems = []
+            if count != small[probe][0]:
+                problems.append(f"changes with the data ({small[probe][0]} -> {count} queries)")
+            if budget is None:
+                problems.append(f"has no budget (runs {count} queries)")
+            elif count != budget:
+                problems.append(f"runs {count} queries, budget is {budget}")
+
+            if not problems:
+                self.stdout.write(f"{label}: {count} queries")
+                continue
+            failures += 1
+            self.stdout.write(self.style.ERROR(f"{label}: {'; '.join(problems)}"))
+            if options['show_queries']:
+                for sql in queries:
+                    self.stdout.write(f"    {sql[:200]}")
+
+        if failures:
+            raise CommandError(f"{failures} page(s) over or off their query budget.")
+        self.stdout.write(self.style.SUCCESS("All pages within their query budgets."))
+
+    def label(self, probe):
+        url_name, _, role, query_string = probe
+        return f"{url_name}{'?' + query_string if query_string else ''} ({role})"
+
+    def measure(self):
+        clerk, requestor = bench_users()
+        clients = {'clerk': Client(), 'requestor': Client()}
+        clients['clerk'].force_login(clerk)
+        clients['requestor'].force_login(requestor)
+
+        urls = {
+            probe: reverse(probe[0], kwargs=probe[1]) + (f'?{probe[3]}' if probe[3] else '')
+            for probe in VIEW_PROBES
+        }
+        # One unmeasured pass first, so one-off per-process work (e.g. the FTS
+        # availability check) is not charged to whichever page happens to run first
+        for probe, url in urls.items():
+            clients[probe[2]].get(url)
+
+        counts = {}
+        for probe, url in urls.items():
+            # Every page is measured with a cold cache so the numbers do not depend on the order
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = clients[probe[2]].get(url)
+            if response.status_code != 200:
+                raise CommandError(f"{url} returned HTTP {response.status_code}.")
+            counts[probe] = (len(queries), [q['sql'] for q in queries.captured_queries])
+        return counts
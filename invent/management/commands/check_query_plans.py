@@ -0,0 +1,81 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from invent.benchdata import VIEW_PROBES, bench_users, seed_dataset, throwaway_database
+
+# A plan step that reads a whole invent table without any index
+FULL_SCAN_RE = re.compile(r'^SCAN (invent_\w+)(?: AS \w+)?$')
+
+# Full scans that are expected, keyed by (url name, table) with the reason as value
+ALLOWED_SCANS = {
+    # The admin lists newest first with ORDER BY id DESC LIMIT n: a backwards rowid walk
+    ('admin:invent_itemrequest_changelist', 'invent_itemrequest'): 'rowid walk for ORDER BY id DESC',
+    ('admin:invent_inventoryitem_changelist', 'invent_inventoryitem'):
+        'rowid walk for ORDER BY id DESC, and DISTINCT category for the list filter',
+    ('api_v1_transactions', 'invent_stocktransaction'): 'rowid walk for ORDER BY id DESC',
+}
+
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway test database, renders the main pages and fails if any of '
+            'their queries does a full table scan (SQLite EXPLAIN QUERY PLAN).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000,
+                            help='Number of synthetic item requests to seed (default: 5000)')
+        parser.add_argument('--items', type=int, default=500,
+                            help='Number of synthetic inventory items to seed (default: 500)')
+        parser.add_argument('--show-plans', action='store_true',
+                            help='Print the plan of every query, not only the offending ones')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("check_query_plans reads SQLite query plans; the default database is not SQLite.")
+
+        with throwaway_database():
+            seed_dataset(items=options['items'], requests=options['requests'], seed=1)
+            problems = self.check_plans(options['show_plans'])
+
+        if problems:
+            for url, sql, detail in problems:
+                self.stdout.write(self.style.ERROR(f"{url}: {detail}\n    {sql[:300]}"))
+            raise CommandError(f"{len(problems)} quer{'y' if len(problems) == 1 else 'ies'} "
+                               f"with full table scans.")
+        self.stdout.write(self.style.SUCCESS("No unexpected full table scans."))
+
+    def check_plans(self, show_plans):
+        clerk, requestor = bench_users()
+        clients = {'clerk': Client(), 'requestor': Client()}
+        clients['clerk'].force_login(clerk)
+        clients['requestor'].force_login(requestor)
+
+        problems = []
+        for url_name, kwargs, role, query_string in VIEW_PROBES:
+            url = reverse(url_name, kwargs=kwargs) + (f'?{query_string}' if query_string else '')
+            with CaptureQueriesContext(connection) as queries:
+                response = clients[role].get(url)
+            if response.status_code != 200:
+                raise CommandError(f"{url} returned HTTP {response.status_code}.")
+
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'invent_' not in sql:
+                    continue
+                for detail in self.explain(sql):
+                    if show_plans:
+                        self.stdout.write(f"{url}: {detail}")
+                    match = FULL_SCAN_RE.match(detail)
+                    if match and (url_name, match.group(1)) not in ALLOWED_SCANS:
+                        problems.append((url, sql, detail))
+        return problems
+
+    def explain(self, sql):
+        # captured SQL has its parameters inlined, which is fine for EXPLAIN
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[3] for row in cursor.fetchall()]
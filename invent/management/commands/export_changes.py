@@ -0,0 +1,56 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from invent.api import DEFAULT_FEED_LIMIT, MAX_LIMIT, change_feed_page
+from invent.changelog import RESOURCES, latest_sequence
+
+
+class Command(BaseCommand):
+    help = ('Writes the inserts, updates and deletes made since a change feed cursor as JSON lines, '
+            'one change per line, the same as /api/v1/changes/. Pass the printed cursor as --since '
+            'next time to fetch only what changed in between.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', default='0', metavar='CURSOR',
+                            help="Sequence number to continue from: 0 for everything (default), "
+                                 "'latest' to print the current cursor only")
+        parser.add_argument('--resource', action='append', choices=list(RESOURCES),
+                            help='Only changes to this resource (repeatable; default: all)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_FEED_LIMIT,
+                            help=f'Log entries read per query (default: {DEFAULT_FEED_LIMIT})')
+        parser.add_argument('--output', metavar='PATH',
+                            help='Write the changes to this file instead of standard output')
+
+    def handle(self, *args, **options):
+        if not 1 <= options['batch_size'] <= MAX_LIMIT:
+            raise CommandError(f"--batch-size must be between 1 and {MAX_LIMIT}.")
+        if options['since'] == 'latest':
+            cursor = latest_sequence()
+        else:
+            try:
+                cursor = int(options['since'])
+            except ValueError:
+                raise CommandError("--since must be a sequence number or 'latest'.")
+            if cursor < 0:
+                raise CommandError("--since can't be negative.")
+        resources = list(dict.fromkeys(options['resource'] or RESOURCES))
+
+        output = open(options['output'], 'w', encoding='utf-8') if options['output'] else sys.stdout
+        written = 0
+        try:
+            has_more = options['since'] != 'latest'
+            while has_more:
+                page = change_feed_page(cursor, resources, options['batch_size'])
+                for change in page['changes']:
+                    output.write(json.dumps(change, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n')
+                written += len(page['changes'])
+                cursor, has_more = page['cursor'], page['has_more']
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        # The changes may be on standard output, so report on standard error
+        self.stderr.write(self.style.SUCCESS(f"{written} changes. Next cursor: {cursor}"))
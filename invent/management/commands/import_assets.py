@@ -1,8 +1,18 @@
 import csv
+import time
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from invent.changelog import record_changes
+from invent.counters import record_items_created
+from invent.ledger import record_opening_balances
 from invent.models import InventoryItem
 
+# Fields that --mode=sync keeps in step with the CSV for existing serial numbers
+SYNC_FIELDS = ['name', 'category', 'condition']
+
+
 class Command(BaseCommand):
     help = 'Imports ICT assets from a CSV file into the InventoryItem model.'
 
@@ -10,6 +20,14 @@ class Command(BaseCommand):
         parser.add_argument('csv_file', type=str, help='The path to the CSV file')
         parser.add_argument('--created_by_username', type=str, default='admin',
                             help='Username of the user who created these inventory items (default: admin)')
+        parser.add_argument('--mode', choices=['create', 'sync'], default='create',
+                            help="'create' only adds new serial numbers (default). "
+                                 "'sync' also updates name, category and condition of existing serial numbers "
+                                 "using bulk inserts/updates and prints a single summary.")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of CSV rows diffed and written per batch in sync mode (default: 1000)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Sync mode only: report what would change without writing anything')
 
     def handle(self, *args, **options):
         csv_file_path = options['csv_file']
@@ -20,6 +38,13 @@ class Command(BaseCommand):
         except User.DoesNotExist:
             raise CommandError(f"User '{created_by_username}' does not exist. Please create the user or provide an existing one.")
 
+        if options['mode'] == 'sync':
+            if options['batch_size'] < 1:
+                raise CommandError("--batch-size must be at least 1.")
+            return self.handle_sync(csv_file_path, created_by_user, options)
+        if options['dry_run']:
+            raise CommandError("--dry-run is only supported with --mode=sync.")
+
         self.stdout.write(self.style.SUCCESS(f"Starting import from {csv_file_path}..."))
 
         imported_count = 0
@@ -83,4 +108,120 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.SUCCESS(
             f"Import complete. Imported {imported_count} items. Skipped {skipped_count} items."
-        ))
\ No newline at end of file
+        ))
+
+    # --- Sync mode ---
+
+    def handle_sync(self, csv_file_path, created_by_user, options):
+        """
+        Diffs the CSV against existing InventoryItem rows keyed by serial number.
+        Each batch costs one SELECT, one bulk INSERT and one bulk UPDATE instead of
+        a round trip per row. Per-row messages are only printed with --verbosity 2.
+        """
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        verbose = options['verbosity'] >= 2
+        valid_conditions = {c[0] for c in InventoryItem.CONDITION_CHOICES}
+
+        self.stats = {'rows': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+        seen_serials = set()
+        started = time.monotonic()
+
+        try:
+            with open(csv_file_path, newline='', encoding='utf-8') as csvfile, transaction.atomic():
+                reader = csv.DictReader(csvfile)
+                batch = {}
+                for row_num, row in enumerate(reader, 2): # Start from 2 for row number in CSV
+                    self.stats['rows'] += 1
+                    asset_description = (row.get('Asset Description') or '').strip()
+                    serial_number = (row.get('Serial Number') or '').strip()
+                    condition = (row.get('Condition') or '').strip()
+
+                    if not asset_description or not serial_number:
+                        self.stats['skipped'] += 1
+                        if verbose:
+                            self.stdout.write(self.style.WARNING(
+                                f"Row {row_num}: Skipping due to missing 'Asset Description' or 'Serial Number'"))
+                        continue
+                    if serial_number in seen_serials:
+                        self.stats['skipped'] += 1
+                        if verbose:
+                            self.stdout.write(self.style.WARNING(
+                                f"Row {row_num}: Skipping duplicate S/N '{serial_number}' (first occurrence wins)"))
+                        continue
+                    seen_serials.add(serial_number)
+
+                    batch[serial_number] = {
+                        'name': asset_description,
+                        'category': (row.get('Asset Category-Minor') or '').strip(),
+                        # Default if CSV value doesn't match choices
+                        'condition': condition if condition in valid_conditions else "Serviceable",
+                    }
+                    if len(batch) >= batch_size:
+                        self.sync_batch(batch, created_by_user, batch_size, dry_run, verbose)
+                        batch = {}
+
+                if batch:
+                    self.sync_batch(batch, created_by_user, batch_size, dry_run, verbose)
+
+                if dry_run:
+                    # Nothing is written in a dry run, but roll back anyway to be safe
+                    transaction.set_rollback(True)
+        except FileNotFoundError:
+            raise CommandError(f"CSV file not found at '{csv_file_path}'")
+        except Exception as e:
+            raise CommandError(f"An error occurred during CSV processing: {e}")
+
+        elapsed = time.monotonic() - started
+        rate = self.stats['rows'] / elapsed if elapsed > 0 else 0
+        prefix = "Dry run complete (no changes written)." if dry_run else "Sync complete."
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} Rows: {self.stats['rows']}, created: {self.stats['created']}, "
+            f"updated: {self.stats['updated']}, unchanged: {self.stats['unchanged']}, "
+            f"skipped: {self.stats['skipped']}. {elapsed:.2f}s ({rate:,.0f} rows/s)."
+        ))
+
+    def sync_batch(self, batch, created_by_user, batch_size, dry_run, verbose):
+        existing = InventoryItem.objects.filter(
+            serial_number__in=list(batch)).only('id', 'serial_number', *SYNC_FIELDS)
+        existing_by_serial = {item.serial_number: item for item in existing}
+
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        for serial_number, fields in batch.items():
+            item = existing_by_serial.get(serial_number)
+            if item is None:
+                to_create.append(InventoryItem(
+                    serial_number=serial_number,
+                    quantity_total=1, # Each unique serial number is one item
+                    created_by=created_by_user,
+                    status='In Stock',
+                    **fields,
+                ))
+                if verbose:
+                    self.stdout.write(f"Create '{fields['name']}' (S/N: {serial_number})")
+                continue
+
+            changed = [f for f in SYNC_FIELDS if getattr(item, f) != fields[f]]
+            if not changed:
+                self.stats['unchanged'] += 1
+                continue
+            for field in changed:
+                setattr(item, field, fields[field])
+            # bulk_update() bypasses auto_now, so stamp it by hand
+            item.updated_at = now
+            to_update.append(item)
+            if verbose:
+                self.stdout.write(f"Update S/N '{serial_number}': {', '.join(changed)}")
+
+        if not dry_run:
+            InventoryItem.objects.bulk_create(to_create, batch_size=batch_size)
+            record_items_created(to_create)
+            record_opening_balances(to_create)
+            record_changes(InventoryItem, [item.pk for item in to_create], 'insert')
+            InventoryItem.objects.bulk_update(
+                to_update, SYNC_FIELDS + ['updated_at'], batch_size=batch_size)
+            record_changes(InventoryItem, [item.pk for item in to_update], 'update')
+        self.stats['created'] += len(to_create)
+        self.stats['updated'] += len(to_update)
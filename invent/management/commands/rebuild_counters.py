@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from invent.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the dashboard counters table from InventoryItem and ItemRequest data.'
+
+    def handle(self, *args, **options):
+        count = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} dashboard counters."))
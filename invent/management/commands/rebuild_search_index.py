@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from invent.search import install_search_index
+
+
+class Command(BaseCommand):
+    help = 'Recreates the inventory full-text search index and its sync triggers, then re-indexes all items.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default',
+                            help='Database alias to rebuild the index in (default: default)')
+
+    def handle(self, *args, **options):
+        if not install_search_index(using=options['database'], rebuild=True):
+            raise CommandError(
+                "Full-text search needs SQLite with FTS5; searches will keep using icontains.")
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from invent.ledger import reconcile
+
+
+class Command(BaseCommand):
+    help = ('Checks every inventory item\'s total/issued/returned quantities against the stock '
+            'transaction ledger and reports (or, with --fix, corrects) any mismatch. Only ledger '
+            'rows recorded since the previous run\'s checkpoints are read.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Set mismatched quantities to what the ledger says')
+        parser.add_argument('--baseline', action='store_true',
+                            help='Accept the current quantities of items that have no checkpoint yet '
+                                 '(e.g. stock entered before it was recorded in the ledger)')
+        parser.add_argument('--full', action='store_true',
+                            help='Ignore checkpoints and replay the whole ledger')
+        parser.add_argument('--no-checkpoint', action='store_true',
+                            help='Do not write checkpoints for consistent items')
+        parser.add_argument('--item', type=int, nargs='+', dest='item_ids', metavar='ID',
+                            help='Only reconcile these item IDs')
+
+    def handle(self, *args, **options):
+        if options['baseline'] and options['full']:
+            raise CommandError("--baseline cannot be combined with --full.")
+
+        started = time.monotonic()
+        summary = reconcile(
+            fix=options['fix'],
+            baseline=options['baseline'],
+            full=options['full'],
+            checkpoint=not options['no_checkpoint'],
+            item_ids=options['item_ids'],
+        )
+        elapsed = time.monotonic() - started
+
+        for mismatch in summary['mismatches']:
+            differences = ', '.join(
+                f"{name} {mismatch['stored'][name]} (ledger: {mismatch['expected'][name]})"
+                for name in mismatch['stored'] if mismatch['stored'][name] != mismatch['expected'][name]
+            )
+            line = f"Item {mismatch['item_id']} '{mismatch['name']}': {differences}"
+            if mismatch['fixed']:
+                self.stdout.write(self.style.WARNING(f"{line} - fixed"))
+            elif options['fix']:
+                self.stdout.write(self.style.ERROR(f"{line} - not fixed, {mismatch['reason']}"))
+            else:
+                self.stdout.write(self.style.ERROR(line))
+
+        self.stdout.write(
+            f"Checked {summary['items']} items against {summary['ledger_groups']} grouped ledger rows "
+            f"in {elapsed:.2f}s; wrote {summary['checkpoints']} checkpoints"
+            + (f" ({summary['baselined']} baselined)" if summary['baselined'] else "") + ".")
+
+        unfixed = [m for m in summary['mismatches'] if not m['fixed']]
+        if unfixed:
+            hint = "" if options['fix'] else " Run with --fix to correct them, or --baseline for stock that predates the ledger."
+            raise CommandError(f"{len(unfixed)} item(s) do not match the ledger.{hint}")
+        if summary['mismatches']:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(summary['mismatches'])} item(s)."))
+        else:
+            self.stdout.write(self.style.SUCCESS("All items match the ledger."))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from invent.replica import REPLICA_ALIAS, refresh_sqlite_replica, replica_configured
+
+
+class Command(BaseCommand):
+    help = ('Copies the primary SQLite database to the read replica file with the online backup API. '
+            'Run it periodically (or with --every); pages stay on the primary for a session until the '
+            'replica has caught up with that session\'s last change.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=-1,
+                            help='Pages copied per backup step; -1 copies everything in one step (default: -1)')
+        parser.add_argument('--every', type=float, default=None, metavar='SECONDS',
+                            help='Keep running and refresh the replica every SECONDS seconds')
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError(f"No '{REPLICA_ALIAS}' database is configured; set READ_REPLICA = True.")
+        for alias in (DEFAULT_DB_ALIAS, REPLICA_ALIAS):
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f"The '{alias}' database is not SQLite; use the database's own replication.")
+        if options['pages'] == 0 or options['pages'] < -1:
+            raise CommandError("--pages must be -1 or a positive number.")
+
+        while True:
+            started = time.monotonic()
+            refresh_sqlite_replica(options['pages'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Replica refreshed in {time.monotonic() - started:.2f}s."))
+            if options['every'] is None:
+                return
+            # Don't hold a connection to the primary while idle
+            connections[DEFAULT_DB_ALIAS].close()
+            time.sleep(max(0.0, options['every'] - (time.monotonic() - started)))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from invent.rollups import DEFAULT_BATCH_SIZE, rebuild_rollups, roll_up
+
+
+class Command(BaseCommand):
+    help = ('Brings the daily stock and request rollups behind the reports page trends up to date. '
+            'Only ledger rows and status changes recorded since the previous run are read; '
+            'run it periodically (e.g. every few minutes from cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute the rollups from scratch. Submissions and issues are '
+                                 'recounted from the requests table; request approvals, rejections, '
+                                 'cancellations and returns already rolled up are lost.')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'Rows folded in per transaction (default: {DEFAULT_BATCH_SIZE})')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        started = time.monotonic()
+        if options['rebuild']:
+            transactions, request_rows = rebuild_rollups(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt the rollups from {transactions} stock transactions and "
+                f"{request_rows} daily request totals in {time.monotonic() - started:.2f}s."))
+            return
+
+        transactions, status_changes = roll_up(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {transactions} stock transactions and {status_changes} request status changes "
+            f"in {time.monotonic() - started:.2f}s."))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from invent.benchdata import BENCH_CLERK_USERNAME, BENCH_PASSWORD, seed_dataset
+
+
+class Command(BaseCommand):
+    help = ('Fills the database with synthetic users, inventory items, requests and stock '
+            'transactions (bulk inserts, realistic status mix) for benchmarking. '
+            'Never run this against production data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='Requestor accounts (default: 200)')
+        parser.add_argument('--items', type=int, default=2000, help='Inventory items (default: 2000)')
+        parser.add_argument('--requests', type=int, default=50000, help='Item requests (default: 50000)')
+        parser.add_argument('--adjustments', type=int, default=5000,
+                            help='Stock adjustments on top of the receive/issue/return ledger (default: 5000)')
+        parser.add_argument('--days', type=int, default=730,
+                            help='Spread request dates over this many past days (default: 730)')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible data')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per INSERT/UPDATE statement (default: 1000)')
+
+    def handle(self, *args, **options):
+        for name in ('users', 'items', 'requests', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1.")
+
+        started = time.monotonic()
+        created = seed_dataset(
+            users=options['users'], items=options['items'], requests=options['requests'],
+            adjustments=options['adjustments'], days=options['days'], seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created['users']} users, {created['items']} items, {created['requests']} requests "
+            f"and {created['transactions']} stock transactions in {elapsed:.1f}s."
+        ))
+        self.stdout.write(f"Clerk login: {BENCH_CLERK_USERNAME} / {BENCH_PASSWORD}")
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from invent.notifications import DEFAULT_BATCH_SIZE, DEFAULT_MAX_ATTEMPTS, deliver_outbox
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued notification emails from the outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'Emails sent per mail connection (default: {DEFAULT_BATCH_SIZE})')
+        parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                            help=f'Give up on an email after this many failures (default: {DEFAULT_MAX_ATTEMPTS})')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and poll the outbox instead of exiting when it is empty')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to sleep between polls in --loop mode (default: 5)')
+
+    def handle(self, *args, **options):
+        totals = [0, 0, 0]
+        try:
+            while True:
+                sent, retried, failed = deliver_outbox(
+                    batch_size=options['batch_size'], max_attempts=options['max_attempts'])
+                for i, count in enumerate((sent, retried, failed)):
+                    totals[i] += count
+                if sent or retried or failed:
+                    self.stdout.write(
+                        f"Sent {sent}, will retry {retried}, failed {failed}.")
+
+                # A full batch means there is probably more waiting right now
+                if sent + retried + failed >= options['batch_size']:
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Outbox run complete. Sent {totals[0]}, will retry {totals[1]}, failed {totals[2]}."))
@@ -0,0 +1,167 @@
+import random
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Count, Sum
+
+from invent.benchdata import throwaway_database
+from invent.counters import read_counters, rebuild_counters
+from invent.models import InventoryItem, ItemRequest, StockTransaction
+from invent.stock import InsufficientStock, RequestNotIssuable, issue_request, issue_stock
+
+# How often a worker retries a statement that hit a database lock before giving up
+LOCK_RETRIES = 20
+
+
+class Command(BaseCommand):
+    help = ('Hammers the stock issue path from several threads against a throwaway database '
+            'and verifies that nothing was oversold or issued twice. Reports issues per second.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Number of concurrent workers (default: 8)')
+        parser.add_argument('--stock', type=int, default=300,
+                            help='Units of stock per item, deliberately less than is asked for (default: 300)')
+        parser.add_argument('--items', type=int, default=3,
+                            help='Number of contended items (default: 3)')
+        parser.add_argument('--requests', type=int, default=600,
+                            help='Approved requests the workers race to issue (default: 600)')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed')
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1:
+            raise CommandError("--threads must be at least 1.")
+        self.rng = random.Random(options['seed'])
+        self.lock = threading.Lock()
+
+        # Threads need a shared on-disk database; in-memory SQLite test databases are per connection
+        with throwaway_database(on_disk=True):
+            self.setup_data(options)
+            self.stdout.write(f"Direct issues: {options['threads']} threads, "
+                              f"{options['items']} items x {options['stock']} units")
+            self.run_phase('Direct issue', options['threads'], self.direct_issue_worker)
+            self.restock(options['stock'])
+            self.stdout.write(f"Request issues: {options['requests']} approved requests")
+            self.run_phase('Request issue', options['threads'], self.request_issue_worker)
+            problems = self.verify()
+
+        if problems:
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(problem))
+            raise CommandError(f"{len(problems)} consistency problem(s) found.")
+        self.stdout.write(self.style.SUCCESS("No oversells, no double issues, counters consistent."))
+
+    def setup_data(self, options):
+        self.clerk = User.objects.create_user('stress_clerk', 'stress_clerk@example.com', 'x')
+        requestors = [User.objects.create_user(f'stress_user_{i}', f'stress_user_{i}@example.com', 'x')
+                      for i in range(5)]
+        self.item_ids = [
+            InventoryItem.objects.create(
+                name=f'Stress item {i}', serial_number=f'STRESS-{i}', quantity_total=options['stock'],
+                created_by=self.clerk).pk
+            for i in range(options['items'])
+        ]
+        for _ in range(options['requests']):
+            item_id = self.rng.choice(self.item_ids)
+            ItemRequest.objects.create(
+                item_id=item_id, name='Stress item', quantity=self.rng.randint(1, 3),
+                requestor=self.rng.choice(requestors), status='Approved')
+        self.request_ids = list(ItemRequest.objects.values_list('pk', flat=True))
+
+    def restock(self, stock):
+        # Plain reset between phases; the ledger check only looks at request-linked issues then
+        InventoryItem.objects.filter(pk__in=self.item_ids).update(quantity_total=stock, quantity_issued=0)
+        StockTransaction.objects.filter(item_request__isnull=True).delete()
+        rebuild_counters()
+
+    def run_phase(self, label, thread_count, worker):
+        self.stats = {'issued': 0, 'units': 0, 'shortfalls': 0, 'conflicts': 0, 'lock_retries': 0}
+        threads = [threading.Thread(target=self.run_worker, args=(worker, i)) for i in range(thread_count)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        rate = self.stats['issued'] / elapsed if elapsed > 0 else 0
+        self.stdout.write(
+            f"  {label}: {self.stats['issued']} issues ({self.stats['units']} units) in {elapsed:.2f}s "
+            f"= {rate:,.0f} issues/s; shortfalls: {self.stats['shortfalls']}, "
+            f"lost races: {self.stats['conflicts']}, lock retries: {self.stats['lock_retries']}")
+
+    def run_worker(self, worker, number):
+        try:
+            worker(random.Random(self.rng.random() + number))
+        finally:
+            # Each thread has its own database connection
+            connection.close()
+
+    def count(self, **amounts):
+        with self.lock:
+            for name, amount in amounts.items():
+                self.stats[name] += amount
+
+    def retrying(self, func):
+        for _ in range(LOCK_RETRIES):
+            try:
+                return func()
+            except OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                self.count(lock_retries=1)
+                time.sleep(0.005)
+        return func()
+
+    def direct_issue_worker(self, rng):
+        exhausted = set()
+        while len(exhausted) < len(self.item_ids):
+            item_id = rng.choice(self.item_ids)
+            quantity = rng.randint(1, 5)
+            try:
+                self.retrying(lambda: issue_stock(item_id, quantity, self.clerk, issued_to='stress'))
+                self.count(issued=1, units=quantity)
+            except InsufficientStock as e:
+                self.count(shortfalls=1)
+                if e.available == 0:
+                    exhausted.add(item_id)
+
+    def request_issue_worker(self, rng):
+        # Every worker tries every request, in its own order, so each one is contended
+        request_ids = list(self.request_ids)
+        rng.shuffle(request_ids)
+        for request_id in request_ids:
+            item_request = ItemRequest.objects.select_related('requestor').get(pk=request_id)
+            try:
+                self.retrying(lambda: issue_request(item_request, self.clerk))
+                self.count(issued=1, units=item_request.quantity)
+            except InsufficientStock:
+                self.count(shortfalls=1)
+            except RequestNotIssuable:
+                self.count(conflicts=1)
+
+    def verify(self):
+        problems = []
+        for item in InventoryItem.objects.filter(pk__in=self.item_ids):
+            if item.quantity_issued > item.quantity_total:
+                problems.append(f"{item.name}: oversold by {item.quantity_issued - item.quantity_total} units")
+            ledger = StockTransaction.objects.filter(
+                item=item, transaction_type='Issue').aggregate(total=Sum('quantity'))['total'] or 0
+            if ledger != item.quantity_issued:
+                problems.append(f"{item.name}: quantity_issued {item.quantity_issued} but ledger says {ledger}")
+
+        twice = (StockTransaction.objects.filter(transaction_type='Issue', item_request__isnull=False)
+                 .values('item_request').annotate(n=Count('id')).filter(n__gt=1).count())
+        if twice:
+            problems.append(f"{twice} requests were issued more than once")
+        issued = ItemRequest.objects.filter(status='Issued').count()
+        if issued != self.stats['issued']:
+            problems.append(f"{issued} requests are Issued but {self.stats['issued']} issues succeeded")
+
+        counters = read_counters()
+        actual = InventoryItem.objects.aggregate(total=Sum('quantity_issued'))['total'] or 0
+        if counters['quantity_issued'] != actual or counters['issued'] != issued:
+            problems.append("dashboard counters drifted from the data")
+        return problems
@@ -0,0 +1,214 @@
+"""
+Per-request performance instrumentation.
+
+PerformanceMiddleware is off unless settings.PERF_INSTRUMENTATION is True; when it is
+off Django drops it from the middleware chain at startup, so it costs nothing. When it
+is on, every response gets a Server-Timing header (total, SQL, template and mail time,
+plus report cache hits and misses) and requests slower than PERF_SLOW_REQUEST_MS are
+logged as one JSON line on the 'invent.perf' logger, with EXPLAIN output for the
+slowest queries.
+
+Timings are collected through hooks installed once (a database execute wrapper and
+wrappers around template rendering and EmailMessage.send) that look up the current
+request's RequestTimings in a context variable and do nothing outside a request.
+"""
+import contextvars
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.mail import EmailMessage
+from django.db import DatabaseError, connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template as DjangoTemplate
+
+logger = logging.getLogger('invent.perf')
+
+DEFAULT_SLOW_REQUEST_MS = 1000
+DEFAULT_EXPLAIN_SLOWEST = 3
+
+_current = contextvars.ContextVar('invent_perf_timings', default=None)
+_hooks_installed = False
+
+
+class RequestTimings:
+    """What one request spent its time on. Durations are in milliseconds."""
+
+    def __init__(self):
+        self.queries = []  # (duration, alias, sql, params, many)
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.mail_ms = 0.0
+        self.emails = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def slowest_queries(self, count):
+        return sorted(self.queries, key=lambda query: query[0], reverse=True)[:count]
+
+
+def current_timings():
+    """The RequestTimings of the request being handled, or None."""
+    return _current.get()
+
+
+def record_cache_lookup(hit):
+    """Counts a report cache lookup (see reportcache.py) against the current request."""
+    timings = _current.get()
+    if timings is None:
+        return
+    if hit:
+        timings.cache_hits += 1
+    else:
+        timings.cache_misses += 1
+
+
+# --- Hooks ---
+
+def _sql_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = (time.perf_counter() - started) * 1000
+        timings.sql_ms += duration
+        timings.queries.append((duration, context['connection'].alias, sql, params, many))
+
+
+def _wrap_connection(connection, **kwargs):
+    if _sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_sql_wrapper)
+
+
+def _timed_template_render(render):
+    def wrapper(self, *args, **kwargs):
+        timings = _current.get()
+        if timings is None:
+            return render(self, *args, **kwargs)
+        started = time.perf_counter()
+        sql_before = timings.sql_ms
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            # Querysets evaluated while rendering are already counted as SQL time
+            elapsed = (time.perf_counter() - started) * 1000
+            timings.template_ms += elapsed - (timings.sql_ms - sql_before)
+    return wrapper
+
+
+def _timed_email_send(send):
+    def wrapper(self, *args, **kwargs):
+        timings = _current.get()
+        if timings is None:
+            return send(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return send(self, *args, **kwargs)
+        finally:
+            timings.mail_ms += (time.perf_counter() - started) * 1000
+            timings.emails += 1
+    return wrapper
+
+
+def install_hooks():
+    """Installs the timing hooks. Idempotent; only called when instrumentation is on."""
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    _hooks_installed = True
+    # Connections are per thread and may be (re)opened later, so catch those too
+    connection_created.connect(_wrap_connection, dispatch_uid='invent_perf_sql')
+    for connection in connections.all(initialized_only=True):
+        _wrap_connection(connection)
+    # Top-level renders only: {% include %} and {% extends %} go through the engine directly
+    DjangoTemplate.render = _timed_template_render(DjangoTemplate.render)
+    EmailMessage.send = _timed_email_send(EmailMessage.send)
+
+
+# --- Reporting ---
+
+def explain(alias, sql, params):
+    """The database's plan for a captured SELECT, or None if it can't be explained."""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+    except DatabaseError as e:
+        return [f"EXPLAIN failed: {e}"]
+
+
+def server_timing_header(timings, total_ms):
+    return ', '.join([
+        f'total;dur={total_ms:.1f}',
+        f'sql;dur={timings.sql_ms:.1f};desc="{len(timings.queries)} queries"',
+        f'tpl;dur={timings.template_ms:.1f}',
+        f'mail;dur={timings.mail_ms:.1f};desc="{timings.emails} emails"',
+        f'cache;desc="{timings.cache_hits} hits, {timings.cache_misses} misses"',
+    ])
+
+
+def slow_request_record(request, response, timings, total_ms, explain_count):
+    return {
+        'event': 'slow_request',
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'user': getattr(getattr(request, 'user', None), 'username', None) or None,
+        'total_ms': round(total_ms, 1),
+        'sql_ms': round(timings.sql_ms, 1),
+        'queries': len(timings.queries),
+        'template_ms': round(timings.template_ms, 1),
+        'mail_ms': round(timings.mail_ms, 1),
+        'emails': timings.emails,
+        'cache_hits': timings.cache_hits,
+        'cache_misses': timings.cache_misses,
+        'slowest_queries': [
+            {
+                'ms': round(duration, 2),
+                'db': alias,
+                'sql': sql,
+                'explain': None if many else explain(alias, sql, params),
+            }
+            for duration, alias, sql, params, many in timings.slowest_queries(explain_count)
+        ],
+    }
+
+
+class PerformanceMiddleware:
+    """
+    Adds a Server-Timing header to every response and logs slow requests.
+    List it first in MIDDLEWARE so the total covers the other middleware too.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERF_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'PERF_SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS)
+        self.explain_count = getattr(settings, 'PERF_EXPLAIN_SLOWEST', DEFAULT_EXPLAIN_SLOWEST)
+        install_hooks()
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        response['Server-Timing'] = server_timing_header(timings, total_ms)
+        if total_ms >= self.slow_ms:
+            # The EXPLAINs run after the reset above, so they aren't counted themselves
+            record = slow_request_record(request, response, timings, total_ms, self.explain_count)
+            logger.warning(json.dumps(record, default=str), extra={'perf': record})
+        return response
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+
+
+# Counter names and meanings as of this migration; later changes to invent.counters must
+# not change what it computed
+STATUS_KEYS = {
+    'Pending': 'pending',
+    'Approved': 'approved',
+    'Issued': 'issued',
+    'Rejected': 'rejected',
+    'Cancelled': 'cancelled',
+    'Partially Returned': 'partially_returned',
+    'Fully Returned': 'fully_returned',
+}
+INVENTORY_COUNTERS = ['quantity_total', 'quantity_issued', 'quantity_returned']
+
+
+def populate_counters(apps, schema_editor):
+    DashboardCounter = apps.get_model('invent', 'DashboardCounter')
+    InventoryItem = apps.get_model('invent', 'InventoryItem')
+    ItemRequest = apps.get_model('invent', 'ItemRequest')
+
+    aggregates = {
+        'total': Count('id'),
+        'returned_total': Sum('returned_quantity'),
+        'outstanding_issued': Count('id', filter=Q(status='Issued', quantity__gt=F('returned_quantity'))),
+        **{key: Count('id', filter=Q(status=status)) for status, key in STATUS_KEYS.items()},
+    }
+    totals = InventoryItem.objects.aggregate(**{name: Sum(name) for name in INVENTORY_COUNTERS})
+    rows = [(None, name, value or 0) for name, value in totals.items()]
+    rows += [(None, name, value or 0) for name, value in ItemRequest.objects.aggregate(**aggregates).items()]
+    for summary in ItemRequest.objects.order_by().values('requestor_id').annotate(**aggregates):
+        requestor_id = summary.pop('requestor_id')
+        rows += [(requestor_id, name, value or 0) for name, value in summary.items()]
+
+    DashboardCounter.objects.bulk_create([
+        DashboardCounter(requestor_id=requestor_id, name=name, value=value)
+        for requestor_id, name, value in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invent', '0012_itemrequest_date_issued_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('value', models.BigIntegerField(default=0)),
+                ('requestor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('requestor', 'name'), name='unique_dashboard_counter_per_requestor'), models.UniqueConstraint(condition=models.Q(('requestor__isnull', True)), fields=('name',), name='unique_global_dashboard_counter')],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:48
+
+import django.db.models.expressions
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invent', '0014_outboxemail'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='quantity_available',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('quantity_total'), '-', models.F('quantity_issued')), output_field=models.IntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(condition=models.Q(('quantity_available__gt', 0)), fields=['name'], name='inventory_available_name_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invent', '0017_stocktransaction_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_transaction_id', models.BigIntegerField(default=0)),
+                ('quantity_total', models.IntegerField(default=0)),
+                ('quantity_issued', models.IntegerField(default=0)),
+                ('quantity_returned', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock_checkpoint', to='invent.inventoryitem')),
+            ],
+        ),
+    ]
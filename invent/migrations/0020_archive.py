@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invent', '0019_daily_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedStockTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('transaction_type', models.CharField(choices=[('Issue', 'Issue'), ('Adjustment', 'Adjustment'), ('Return', 'Return'), ('Receive', 'Receive')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('item_request_id', models.BigIntegerField(blank=True, null=True)),
+                ('issued_to', models.CharField(blank=True, max_length=255, null=True)),
+                ('reason', models.TextField(blank=True, null=True)),
+                ('transaction_date', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='invent.inventoryitem')),
+                ('recorded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockOpeningBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_transaction_id', models.BigIntegerField(default=0)),
+                ('quantity_total', models.IntegerField(default=0)),
+                ('quantity_issued', models.IntegerField(default=0)),
+                ('quantity_returned', models.IntegerField(default=0)),
+                ('transactions', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='opening_balance', to='invent.inventoryitem')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedItemRequest',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('reason', models.TextField(blank=True, null=True)),
+                ('application_date', models.DateField(default=django.utils.timezone.now)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Approved', 'Approved'), ('Issued', 'Issued'), ('Rejected', 'Rejected'), ('Cancelled', 'Cancelled'), ('Partially Returned', 'Partially Returned'), ('Fully Returned', 'Fully Returned')], max_length=20)),
+                ('date_requested', models.DateTimeField()),
+                ('date_issued', models.DateTimeField(blank=True, null=True)),
+                ('returned_quantity', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='invent.inventoryitem')),
+                ('requestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-date_requested', '-id'], name='archreq_date_idx'), models.Index(fields=['status', '-date_requested', '-id'], name='archreq_status_date_idx')],
+            },
+        ),
+    ]
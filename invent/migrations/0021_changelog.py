@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-18 03:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def log_existing_rows(apps, schema_editor):
+    # Rows from before the change log count as inserted, so a mirror can start from sequence 0
+    ChangeLogEntry = apps.get_model('invent', 'ChangeLogEntry')
+    now = django.utils.timezone.now()
+    for resource, model_names in (('items', ['InventoryItem']),
+                                  ('requests', ['ArchivedItemRequest', 'ItemRequest']),
+                                  ('transactions', ['ArchivedStockTransaction', 'StockTransaction'])):
+        for model_name in model_names:
+            ids = apps.get_model('invent', model_name).objects.order_by('pk').values_list('pk', flat=True)
+            ChangeLogEntry.objects.bulk_create([
+                ChangeLogEntry(resource=resource, object_id=pk, action='insert', changed_at=now)
+                for pk in ids.iterator()
+            ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invent', '0020_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('insert', 'Insert'), ('update', 'Update'), ('delete', 'Delete')], max_length=6)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['resource', 'id'], name='changelog_resource_seq_idx')],
+            },
+        ),
+        migrations.RunPython(log_existing_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_archived_requests(apps, schema_editor):
+    # Requests archived before the counts were kept
+    ArchivedItemRequest = apps.get_model('invent', 'ArchivedItemRequest')
+    StockOpeningBalance = apps.get_model('invent', 'StockOpeningBalance')
+    counts = ArchivedItemRequest.objects.order_by().values('item_id').annotate(archived=Count('id'))
+    for row in counts.iterator():
+        StockOpeningBalance.objects.update_or_create(
+            item_id=row['item_id'], defaults={'archived_requests': row['archived']})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invent', '0022_outbox_claim'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockopeningbalance',
+            name='archived_requests',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_archived_requests, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invent', '0023_archived_request_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryItemSearchEntry',
+            fields=[
+                ('item', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='invent.inventoryitem')),
+                ('rank', models.FloatField(null=True)),
+            ],
+            options={
+                'db_table': 'invent_inventoryitem_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:10
+
+from django.db import migrations
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+QUANTITY_FIELDS = ['quantity_total', 'quantity_issued', 'quantity_returned']
+
+# invent.ledger.LEDGER_EFFECTS as of this migration
+LEDGER_EFFECTS = {
+    'Receive': (1, 0, 0),
+    'Adjustment': (1, 0, 0),
+    'Issue': (0, 1, 0),
+    'Return': (1, -1, 1),
+}
+
+
+def record_opening_balances(apps, schema_editor):
+    # Items created before creation recorded an opening balance. Take the quantities
+    # they were last known to be right at (their checkpoint, or what is stored if they
+    # were never reconciled) as given, and record what the ledger does not explain as
+    # their opening balance, so a full replay adds up to them as well.
+    InventoryItem = apps.get_model('invent', 'InventoryItem')
+    StockOpeningBalance = apps.get_model('invent', 'StockOpeningBalance')
+    StockTransaction = apps.get_model('invent', 'StockTransaction')
+
+    replayed = {}
+    rows = (StockTransaction.objects
+            .filter(Q(item__stock_checkpoint__isnull=True)
+                    | Q(id__lte=F('item__stock_checkpoint__last_transaction_id')))
+            .order_by().values('item_id', 'transaction_type').annotate(quantity=Sum('quantity')))
+    for row in rows.iterator():
+        balance = replayed.setdefault(row['item_id'], [0, 0, 0])
+        for i, effect in enumerate(LEDGER_EFFECTS.get(row['transaction_type'], (0, 0, 0))):
+            balance[i] += effect * row['quantity']
+
+    balances = {balance.item_id: balance for balance in StockOpeningBalance.objects.all()}
+    items = InventoryItem.objects.values(
+        'pk', *QUANTITY_FIELDS, 'stock_checkpoint__id',
+        *[f'stock_checkpoint__{name}' for name in QUANTITY_FIELDS])
+    now = timezone.now()
+    to_create, to_update = [], []
+    for item in items.iterator():
+        prefix = 'stock_checkpoint__' if item['stock_checkpoint__id'] is not None else ''
+        known = [item[f'{prefix}{name}'] for name in QUANTITY_FIELDS]
+        balance = balances.get(item['pk']) or StockOpeningBalance(item_id=item['pk'])
+        ledger = replayed.get(item['pk'], [0, 0, 0])
+        missing = [value - getattr(balance, name) - moved
+                   for name, value, moved in zip(QUANTITY_FIELDS, known, ledger)]
+        if balance.pk and not any(missing):
+            continue
+        for name, amount in zip(QUANTITY_FIELDS, missing):
+            setattr(balance, name, getattr(balance, name) + amount)
+        balance.updated_at = now
+        (to_update if balance.pk else to_create).append(balance)
+
+    StockOpeningBalance.objects.bulk_create(to_create, batch_size=1000)
+    StockOpeningBalance.objects.bulk_update(to_update, [*QUANTITY_FIELDS, 'updated_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invent', '0024_inventoryitem_search_entry'),
+    ]
+
+    operations = [
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,13 @@
 # models.py
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.core.mail import send_mail
+
+
+class InventoryItemQuerySet(models.QuerySet):
+    def available(self):
+        """Items that still have stock left to issue (uses the indexed quantity_available column)."""
+        return self.filter(quantity_available__gt=0)
 
 
 class InventoryItem(models.Model):
@@ -51,12 +56,23 @@ class InventoryItem(models.Model):
     quantity_returned = models.PositiveIntegerField(default=0)
     # Actual returns are handled via StockTransaction and ItemRequest.
 
+    # Stored generated column mirroring quantity_remaining() so the database can filter,
+    # sort and index on it. Never assign to it; it is recomputed on every write.
+    quantity_available = models.GeneratedField(
+        expression=models.F('quantity_total') - models.F('quantity_issued'),
+        output_field=models.IntegerField(),
+        db_persist=True,
+        db_index=True,
+    )
+
     created_by = models.ForeignKey(
         User, on_delete=models.SET_NULL, null=True, blank=True, related_name='inventory_created_by')
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = InventoryItemQuerySet.as_manager()
+
     def __str__(self):
         # If serial_number is truly unique per physical item, then quantity_total etc. would be 1 for each object.
         # If it's a type of item, then serial_number should not be unique and quantity_total would be > 1.
@@ -65,6 +81,35 @@ class InventoryItem(models.Model):
         return f"{self.name} (S/N: {self.serial_number or 'N/A'})"
         # If it's a type, it might be just `self.name`.
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded quantities so saves can update the dashboard counters by difference
+        from .counters import snapshot, ITEM_TRACKED_FIELDS
+        instance._counter_snapshot = snapshot(instance, ITEM_TRACKED_FIELDS)
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        from .counters import refresh_snapshot, ITEM_TRACKED_FIELDS
+        refresh_snapshot(self, ITEM_TRACKED_FIELDS, fields)
+
+    def save(self, *args, **kwargs):
+        from .counters import (ITEM_TRACKED_FIELDS, record_item_change,
+                               state_after_save, state_before_save)
+        from .ledger import record_opening_balances
+        with transaction.atomic():
+            old = state_before_save(self, ITEM_TRACKED_FIELDS)
+            super().save(*args, **kwargs)
+            new = state_after_save(
+                self, ITEM_TRACKED_FIELDS, old, kwargs.get('update_fields'))
+            record_item_change(old, new)
+            if old is None:
+                # The ledger has no rows for the stock an item is created with
+                record_opening_balances([self])
+        # quantity_available is recomputed by the database; drop the stale copy so it is re-read on access
+        self.__dict__.pop('quantity_available', None)
+
     def is_expired(self):
         return self.expiration_date and self.expiration_date < timezone.now().date()
 
@@ -72,6 +117,34 @@ class InventoryItem(models.Model):
         """Calculates the quantity currently available for new issues."""
         return self.quantity_total - self.quantity_issued
 
+    class Meta:
+        indexes = [
+            # Serves InventoryItem.objects.available().order_by('name') without a sort step
+            models.Index(fields=['name'], condition=models.Q(quantity_available__gt=0),
+                         name='inventory_available_name_idx'),
+            # Keyset pagination order of the inventory list
+            models.Index(fields=['name', 'id'], name='inventory_name_id_idx'),
+            # "Recently added" panel on the clerk dashboard
+            models.Index(fields=['-created_at'], name='inventory_created_idx'),
+        ]
+
+
+class InventoryItemSearchEntry(models.Model):
+    """
+    Read-only view of the SQLite FTS5 search index (see invent/search.py), so ranked
+    searches can join it through the ORM. The table and its triggers are created by
+    install_search_index(), not by migrations, and do not exist on other databases.
+    """
+    item = models.OneToOneField(
+        InventoryItem, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        related_name='search_entry')
+    # FTS5 hidden column: bm25() of the current MATCH, lower is more relevant
+    rank = models.FloatField(null=True)
+
+    class Meta:
+        managed = False
+        db_table = 'invent_inventoryitem_fts'
+
 
 class ItemRequest(models.Model):
     item = models.ForeignKey('InventoryItem', on_delete=models.CASCADE)
@@ -109,69 +182,88 @@ class ItemRequest(models.Model):
         super().__init__(*args, **kwargs)
         self._original_status = self.status
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded values so saves can update the dashboard counters by difference
+        from .counters import snapshot, REQUEST_TRACKED_FIELDS
+        instance._counter_snapshot = snapshot(instance, REQUEST_TRACKED_FIELDS)
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        from .counters import refresh_snapshot, REQUEST_TRACKED_FIELDS
+        refresh_snapshot(self, REQUEST_TRACKED_FIELDS, fields)
+
     def save(self, *args, **kwargs):
+        from .counters import (REQUEST_TRACKED_FIELDS, record_request_change,
+                               state_after_save, state_before_save)
+        from .notifications import queue_email
         status_changed = self.pk and self.status != self._original_status
-        super().save(*args, **kwargs)
-
-        if status_changed:
-            subject = None
-            message = None
-            user = self.requestor
-
-            if self.status == 'Rejected':
-                subject = "Item Request Rejected"
-                message = (
-                    f"Dear {user.first_name or user.username},\n\n"
-                    f"Your request for item \"{self.item.name}\" has been rejected.\n"
-                    f"If you believe this is an error, please contact the store clerk.\n\n"
-                    f"Thank you,\nInventory Management System"
-                )
-            elif self.status == 'Approved':
-                subject = "Item Request Approved"
-                message = (
-                    f"Dear {user.first_name or user.username},\n\n"
-                    f"Your request for item \"{self.item.name}\" has been approved.\n"
-                    f"You will be notified once the item is issued.\n\n"
-                    f"Thank you,\nInventory Management System"
-                )
-            elif self.status == 'Issued':
-                subject = "Item Issued"
-                message = (
-                    f"Dear {user.first_name or user.username},\n\n"
-                    f"Your item \"{self.item.name}\" has been issued successfully.\n"
-                    f"Kindly pick up you item.\n\n"
-                    f"Thank you,\nInventory Management System"
-                )
-                if not self.date_issued:  # Set date_issued only once
+        # Counters are updated in the same transaction as the row itself
+        with transaction.atomic():
+            old = state_before_save(self, REQUEST_TRACKED_FIELDS)
+            super().save(*args, **kwargs)
+            new = state_after_save(
+                self, REQUEST_TRACKED_FIELDS, old, kwargs.get('update_fields'))
+            record_request_change(old, new)
+
+            # Notifications go to the outbox in the same transaction; send_outbox delivers them
+            if status_changed:
+                if self.status == 'Issued' and not self.date_issued:  # Set date_issued only once
                     self.date_issued = timezone.now()
                     # Save date_issued immediately
                     super().save(update_fields=['date_issued'])
-            elif self.status == 'Cancelled':
-                subject = "Item Request Cancelled"
-                message = (
-                    f"Dear {user.first_name or user.username},\n\n"
-                    f"Your item request for \"{self.item.name}\" has been cancelled.\n\n"
-                    f"Regards,\nInventory Management System"
-                )
-            elif self.status == 'Partially Returned' or self.status == 'Fully Returned':
-                subject = f"Item Return Confirmation - Request for {self.item.name}"
-                message = (
-                    f"Dear {user.first_name or user.username},\n\n"
-                    f"The item \"{self.item.name}\" (Quantity: {self.returned_quantity}/{self.quantity}) from your request "
-                    f"has been marked as {self.status.lower()} in the system.\n\n"
-                    f"Thank you,\nInventory Management System"
-                )
-
-            if subject and message:
-                send_mail(
-                    subject,
-                    message,
-                    from_email=None,  # Uses DEFAULT_FROM_EMAIL from settings.py
-                    recipient_list=[user.email],
-                    fail_silently=False,
-                )
-
-            self._original_status = self.status  # Update tracker
+
+                notification = self.status_notification()
+                if notification:
+                    subject, message = notification
+                    queue_email(subject, message, [self.requestor.email])
+
+                self._original_status = self.status  # Update tracker
+
+    def status_notification(self):
+        """
+        The (subject, message) of the email telling the requestor their request moved
+        to its current status, or None if that status has no notification.
+        """
+        user = self.requestor
+
+        if self.status == 'Rejected':
+            return "Item Request Rejected", (
+                f"Dear {user.first_name or user.username},\n\n"
+                f"Your request for item \"{self.item.name}\" has been rejected.\n"
+                f"If you believe this is an error, please contact the store clerk.\n\n"
+                f"Thank you,\nInventory Management System"
+            )
+        elif self.status == 'Approved':
+            return "Item Request Approved", (
+                f"Dear {user.first_name or user.username},\n\n"
+                f"Your request for item \"{self.item.name}\" has been approved.\n"
+                f"You will be notified once the item is issued.\n\n"
+                f"Thank you,\nInventory Management System"
+            )
+        elif self.status == 'Issued':
+            return "Item Issued", (
+                f"Dear {user.first_name or user.username},\n\n"
+                f"Your item \"{self.item.name}\" has been issued successfully.\n"
+                f"Kindly pick up you item.\n\n"
+                f"Thank you,\nInventory Management System"
+            )
+        elif self.status == 'Cancelled':
+            return "Item Request Cancelled", (
+                f"Dear {user.first_name or user.username},\n\n"
+                f"Your item request for \"{self.item.name}\" has been cancelled.\n\n"
+                f"Regards,\nInventory Management System"
+            )
+        elif self.status == 'Partially Returned' or self.status == 'Fully Returned':
+            return f"Item Return Confirmation - Request for {self.item.name}", (
+                f"Dear {user.first_name or user.username},\n\n"
+                f"The item \"{self.item.name}\" (Quantity: {self.returned_quantity}/{self.quantity}) from your request "
+                f"has been marked as {self.status.lower()} in the system.\n\n"
+                f"Thank you,\nInventory Management System"
+            )
+        return None
 
     def __str__(self):
         return f"Request for {self.item.name} by {self.requestor.username}"
@@ -180,6 +272,19 @@ class ItemRequest(models.Model):
         """Calculates the quantity that was issued and is not yet returned for this request."""
         return self.quantity - self.returned_quantity
 
+    class Meta:
+        indexes = [
+            # Clerk queues and the request report: filter by status, newest first
+            models.Index(fields=['status', '-date_requested', '-id'], name='itemrequest_status_date_idx'),
+            # Unfiltered request listings, newest first
+            models.Index(fields=['-date_requested', '-id'], name='itemrequest_date_idx'),
+            # Requestor pages: a user's requests newest first, and per-status counts
+            models.Index(fields=['requestor', '-date_requested'], name='itemrequest_req_date_idx'),
+            models.Index(fields=['requestor', 'status'], name='itemrequest_req_status_idx'),
+            # Returns queue: Issued requests ordered by issue date
+            models.Index(fields=['status', '-date_issued'], name='itemrequest_status_iss_idx'),
+        ]
+
 
 class StockTransaction(models.Model):
     TRANSACTION_TYPES = [
@@ -223,8 +328,272 @@ class StockTransaction(models.Model):
 
     class Meta:
         ordering = ['-transaction_date']
+        indexes = [
+            # Recent transactions of one type (e.g. adjust_stock's history panel)
+            models.Index(fields=['transaction_type', '-transaction_date'], name='stocktx_type_date_idx'),
+            # Default ordering (plus the admin's id tie-breaker), so listings need no sort step
+            models.Index(fields=['-transaction_date', '-id'], name='stocktx_date_idx'),
+        ]
         permissions = [
             ("can_issue_item", "Can issue inventory items"),
             ("can_adjust_stock", "Can adjust inventory stock"),
             ("can_receive_stock", "Can receive new stock into inventory"),
         ]
+
+
+class StockCheckpoint(models.Model):
+    """
+    An item's quantities as of a point in the StockTransaction ledger, written by
+    `manage.py reconcile_stock`. The item's expected quantities are these plus the
+    effect of every transaction after `last_transaction_id`, so later reconciliation
+    runs only read the ledger from there on.
+    """
+    item = models.OneToOneField(
+        InventoryItem, on_delete=models.CASCADE, related_name='stock_checkpoint')
+    # Ledger rows with an id up to and including this one are folded into the quantities
+    last_transaction_id = models.BigIntegerField(default=0)
+    # Plain integers: a broken ledger can add up to a negative amount
+    quantity_total = models.IntegerField(default=0)
+    quantity_issued = models.IntegerField(default=0)
+    quantity_returned = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Checkpoint for item {self.item_id} at transaction {self.last_transaction_id}"
+
+
+class DashboardCounter(models.Model):
+    """
+    Denormalized running totals for the dashboards and reports page.
+
+    Rows with no requestor hold the global counters; rows with a requestor hold that
+    user's request counters. They are kept in step by InventoryItem/ItemRequest saves
+    (see invent/counters.py) and can be recomputed with `manage.py rebuild_counters`.
+    """
+    requestor = models.ForeignKey(
+        User, on_delete=models.CASCADE, null=True, blank=True, related_name='dashboard_counters')
+    name = models.CharField(max_length=50)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        scope = self.requestor.username if self.requestor_id else 'global'
+        return f"{self.name} ({scope}): {self.value}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['requestor', 'name'], name='unique_dashboard_counter_per_requestor'),
+            # NULLs never collide in a unique index, so the global rows need their own constraint
+            models.UniqueConstraint(
+                fields=['name'], condition=models.Q(requestor__isnull=True),
+                name='unique_global_dashboard_counter'),
+        ]
+
+
+class OutboxEmail(models.Model):
+    """
+    A notification email waiting to be delivered by the `send_outbox` worker.
+
+    Rows are written in the same transaction as the change that triggered them, so
+    no SMTP traffic happens on the request path and rolled-back changes send nothing.
+    """
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        # Claimed by a send_outbox run until next_attempt_at, then up for grabs again
+        ('Sending', 'Sending'),
+        ('Sent', 'Sent'),
+        # Gave up after too many failed attempts
+        ('Failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    # Comma separated list of recipient addresses
+    recipients = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True, null=True,
+                                  help_text="Leave blank to use DEFAULT_FROM_EMAIL")
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    # Identifies the send_outbox run holding a 'Sending' claim
+    claim_token = models.CharField(max_length=32, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipients} ({self.status})"
+
+    def recipient_list(self):
+        return [address for address in self.recipients.split(',') if address]
+
+    class Meta:
+        ordering = ['next_attempt_at', 'id']
+        indexes = [
+            # The worker's "what is due" query
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+
+class RequestStatusChange(models.Model):
+    """
+    Journal of request status changes (a new request counts as entering 'Pending').
+    Appended to wherever the dashboard counters are updated, and consumed and deleted
+    by `manage.py rollup_reports`, which folds it into DailyRequestRollup.
+    """
+    status = models.CharField(max_length=20, choices=ItemRequest.STATUS_CHOICES)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.status} at {self.changed_at:%Y-%m-%d %H:%M}"
+
+
+class DailyStockRollup(models.Model):
+    """Per item and day: the stock received, issued, returned and adjusted, from the ledger."""
+    date = models.DateField()
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='daily_rollups')
+    quantity_received = models.BigIntegerField(default=0)
+    quantity_issued = models.BigIntegerField(default=0)
+    quantity_returned = models.BigIntegerField(default=0)
+    # Net: adjustments can be negative
+    quantity_adjusted = models.BigIntegerField(default=0)
+    transactions = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Item {self.item_id} on {self.date}"
+
+    class Meta:
+        constraints = [
+            # Also the index date-range trend queries use
+            models.UniqueConstraint(fields=['date', 'item'], name='unique_daily_stock_rollup'),
+        ]
+
+
+class DailyRequestRollup(models.Model):
+    """Per day and status: how many requests moved into that status."""
+    date = models.DateField()
+    status = models.CharField(max_length=20, choices=ItemRequest.STATUS_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.status} on {self.date}: {self.count}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'status'], name='unique_daily_request_rollup'),
+        ]
+
+
+class RollupState(models.Model):
+    """How far `rollup_reports` has got through an append-only table."""
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_id}"
+
+
+# --- Archive (see invent/archive.py) ---
+
+class ArchivedItemRequest(models.Model):
+    """
+    A closed ItemRequest moved out of the live table by `manage.py archive_history`.
+    Same columns and id as the original row; the dashboard counters still include it.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='+')
+    name = models.CharField(max_length=100)
+    quantity = models.PositiveIntegerField(default=1)
+    reason = models.TextField(blank=True, null=True)
+    application_date = models.DateField(default=timezone.now)
+    requestor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    status = models.CharField(max_length=20, choices=ItemRequest.STATUS_CHOICES)
+    date_requested = models.DateTimeField()
+    date_issued = models.DateTimeField(null=True, blank=True)
+    returned_quantity = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived request {self.pk} ({self.status})"
+
+    class Meta:
+        indexes = [
+            # Merged into the request report and exports, newest first (and the archive horizon)
+            models.Index(fields=['-date_requested', '-id'], name='archreq_date_idx'),
+            models.Index(fields=['status', '-date_requested', '-id'], name='archreq_status_date_idx'),
+        ]
+
+
+class ArchivedStockTransaction(models.Model):
+    """
+    An old StockTransaction moved out of the live ledger by `manage.py archive_history`.
+    Its effect on the item's quantities lives on in the item's StockOpeningBalance.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='+')
+    transaction_type = models.CharField(max_length=20, choices=StockTransaction.TRANSACTION_TYPES)
+    quantity = models.IntegerField()
+    # The request may be live or archived, so this is a plain id
+    item_request_id = models.BigIntegerField(null=True, blank=True)
+    issued_to = models.CharField(max_length=255, blank=True, null=True)
+    reason = models.TextField(blank=True, null=True)
+    transaction_date = models.DateTimeField()
+    recorded_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived {self.transaction_type} of {self.quantity} for item {self.item_id}"
+
+
+class StockOpeningBalance(models.Model):
+    """
+    The quantities an item was created with plus the combined effect of its archived
+    ledger rows, carried forward so the live ledger plus this row still adds up to the
+    item's quantities. Also counts the item's archived requests, so all-time reports
+    never have to scan the archive.
+    """
+    item = models.OneToOneField(
+        InventoryItem, on_delete=models.CASCADE, related_name='opening_balance')
+    # Archived ledger rows with an id up to and including this one are folded in
+    last_transaction_id = models.BigIntegerField(default=0)
+    quantity_total = models.IntegerField(default=0)
+    quantity_issued = models.IntegerField(default=0)
+    quantity_returned = models.IntegerField(default=0)
+    transactions = models.PositiveIntegerField(default=0)
+    # Rows of this item in ArchivedItemRequest
+    archived_requests = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Opening balance for item {self.item_id} up to transaction {self.last_transaction_id}"
+
+
+class ChangeLogEntry(models.Model):
+    """
+    One insert, update or delete of an inventory item, request or ledger row, written
+    in the same transaction as the change itself (see invent/changelog.py). The id is
+    the change feed's sequence number, so it only ever grows.
+    """
+    ACTIONS = [
+        ('insert', 'Insert'),
+        ('update', 'Update'),
+        ('delete', 'Delete'),
+    ]
+
+    resource = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=6, choices=ACTIONS)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # The feed for one resource: WHERE resource = ? AND id > cursor ORDER BY id
+            models.Index(fields=['resource', 'id'], name='changelog_resource_seq_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.action} {self.resource} {self.object_id}"
@@ -0,0 +1,141 @@
+"""
+Outbox for notification emails.
+
+queue_email() only inserts an OutboxEmail row, so callers inside transaction.atomic()
+blocks never wait on SMTP. The `send_outbox` management command delivers the queue
+in batches over a single mail connection, retrying failures with exponential backoff.
+
+Several send_outbox runs may work the queue at once (two workers, or cron starting a
+run while a slow one is still going). Each run first claims its batch with a
+conditional UPDATE (`status` 'Sending' with its own claim_token, for CLAIM_TIMEOUT),
+and only sends the rows it got. A claim left behind by a run that died expires and
+the email is sent by a later run.
+"""
+import uuid
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_MAX_ATTEMPTS = 5
+# First retry waits this long, then doubles each time (capped at MAX_BACKOFF)
+BASE_BACKOFF = timedelta(seconds=30)
+MAX_BACKOFF = timedelta(hours=1)
+# How long a run may take to send its batch before others may claim the emails again
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def queue_email(subject, message, recipient_list, from_email=None):
+    """Adds an email to the outbox. Returns the OutboxEmail, or None if there is nobody to send to."""
+    recipients = [address for address in recipient_list if address]
+    if not recipients:
+        return None
+    return OutboxEmail.objects.create(
+        subject=subject,
+        message=message,
+        recipients=','.join(recipients),
+        from_email=from_email,
+    )
+
+
+def queue_emails(emails):
+    """
+    Bulk version of queue_email() for batch operations: `emails` is an iterable of
+    (subject, message, recipient_list) tuples, inserted with a single query.
+    """
+    rows = []
+    for subject, message, recipient_list in emails:
+        recipients = [address for address in recipient_list if address]
+        if recipients:
+            rows.append(OutboxEmail(subject=subject, message=message, recipients=','.join(recipients)))
+    return OutboxEmail.objects.bulk_create(rows)
+
+
+def backoff_for(attempts):
+    """How long to wait before the next try after `attempts` failed deliveries."""
+    return min(BASE_BACKOFF * (2 ** max(attempts - 1, 0)), MAX_BACKOFF)
+
+
+def claim_due(batch_size, now):
+    """
+    Claims up to `batch_size` due emails, including ones whose claim has expired, and
+    returns the claimed rows. Rows another run claimed first are left out.
+    """
+    due = OutboxEmail.objects.filter(status__in=['Pending', 'Sending'], next_attempt_at__lte=now)
+    ids = list(due.values_list('pk', flat=True)[:batch_size])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # Re-checking the due condition makes the claim conditional: of two runs that read
+    # the same ids, only the first UPDATE matches them
+    due.filter(pk__in=ids).update(
+        status='Sending', claim_token=token, next_attempt_at=now + CLAIM_TIMEOUT)
+    return list(OutboxEmail.objects.filter(status='Sending', claim_token=token))
+
+
+def deliver_outbox(batch_size=DEFAULT_BATCH_SIZE, max_attempts=DEFAULT_MAX_ATTEMPTS, connection=None):
+    """
+    Claims and sends up to `batch_size` due emails over one (reused) mail connection.
+    Returns a (sent, retried, failed) tuple.
+    """
+    now = timezone.now()
+    batch = claim_due(batch_size, now)
+    if not batch:
+        return 0, 0, 0
+
+    sent = retried = failed = 0
+    connection = connection or get_connection(fail_silently=False)
+    try:
+        try:
+            connection.open()
+        except Exception as e:
+            # Could not even reach the mail server: push the whole batch back
+            for email in batch:
+                failed += _record_failure(email, e, max_attempts, now)
+            return 0, len(batch) - failed, failed
+
+        for email in batch:
+            message = EmailMessage(
+                email.subject, email.message,
+                from_email=email.from_email or None,  # Uses DEFAULT_FROM_EMAIL from settings.py
+                to=email.recipient_list(),
+                connection=connection,
+            )
+            try:
+                message.send(fail_silently=False)
+            except Exception as e:
+                if _record_failure(email, e, max_attempts, now):
+                    failed += 1
+                else:
+                    retried += 1
+                continue
+
+            email.status = 'Sent'
+            email.attempts += 1
+            email.sent_at = timezone.now()
+            email.last_error = ''
+            email.claim_token = ''
+            email.save(update_fields=['status', 'attempts', 'sent_at', 'last_error', 'claim_token'])
+            sent += 1
+    finally:
+        connection.close()
+
+    return sent, retried, failed
+
+
+def _record_failure(email, error, max_attempts, now):
+    """Schedules a retry, or marks the email Failed. Returns True if it was given up on."""
+    email.attempts += 1
+    email.last_error = str(error)
+    email.claim_token = ''
+    gave_up = email.attempts >= max_attempts
+    if gave_up:
+        email.status = 'Failed'
+    else:
+        email.status = 'Pending'
+        email.next_attempt_at = now + backoff_for(email.attempts)
+    email.save(update_fields=['status', 'attempts', 'last_error', 'claim_token', 'next_attempt_at'])
+    return gave_up
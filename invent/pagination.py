@@ -0,0 +1,180 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are fetched with `WHERE (sort columns) > (last row seen) ... LIMIT n` instead of
+OFFSET, so page N costs the same as page 1. Cursors are opaque url-safe strings that
+encode the sort values of the boundary row and the direction to move in.
+"""
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Q
+
+# How long cached total counts are kept (seconds)
+COUNT_CACHE_TIMEOUT = 60
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """One page of results plus the cursors needed to move to its neighbours."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor, total_count):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        # None when the caller asked to skip counting
+        self.total_count = total_count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps({'v': values, 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, direction = payload['v'], payload['d']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return values, direction
+
+
+def _field_name(order):
+    return order.lstrip('-')
+
+
+def _after(ordering, values):
+    """Q matching rows that sort strictly after `values` under `ordering`."""
+    condition = Q()
+    for i, order in enumerate(ordering):
+        lookup = 'lt' if order.startswith('-') else 'gt'
+        step = Q(**{f'{_field_name(o)}': v for o, v in zip(ordering[:i], values[:i])})
+        step &= Q(**{f'{_field_name(order)}__{lookup}': values[i]})
+        condition |= step
+    return condition
+
+
+def _sort_rows(rows, ordering):
+    # Stable sorts, least significant column first
+    for order in reversed(ordering):
+        rows.sort(key=lambda row: getattr(row, _field_name(order)), reverse=order.startswith('-'))
+    return rows
+
+
+def _reverse(ordering):
+    return [order[1:] if order.startswith('-') else f'-{order}' for order in ordering]
+
+
+def _row_values(obj, ordering):
+    # value_to_string() keeps full precision (e.g. datetime microseconds), unlike JSON encoders
+    return [
+        obj._meta.get_field(_field_name(order)).value_to_string(obj) for order in ordering
+    ]
+
+
+def _parse_values(queryset, ordering, raw_values):
+    if len(raw_values) != len(ordering):
+        raise InvalidCursor(raw_values)
+    try:
+        return [
+            queryset.model._meta.get_field(_field_name(order)).to_python(value)
+            for order, value in zip(ordering, raw_values)
+        ]
+    except Exception:
+        raise InvalidCursor(raw_values)
+
+
+def keyset_paginate(queryset, ordering, cursor=None, per_page=50, count='exact', count_cache_key=None,
+                    merge=()):
+    """
+    Returns a KeysetPage of `queryset` sorted by `ordering`.
+
+    `ordering` must end in a unique column (e.g. ['name', 'id']) so cursors are unambiguous.
+    `count` is 'exact' (COUNT(*) every time), 'cached' (COUNT(*) cached under
+    `count_cache_key`), an int the caller already knows, or None to skip counting.
+    `merge` lists more querysets with the same ordering columns (e.g. archived rows)
+    whose rows are interleaved into the pages; the unique column must stay unique
+    across all of them. An invalid cursor falls back to the first page.
+    """
+    values, direction = None, 'next'
+    if cursor:
+        try:
+            raw_values, direction = decode_cursor(cursor)
+            values = _parse_values(queryset, ordering, raw_values)
+        except InvalidCursor:
+            values, direction = None, 'next'
+
+    page_ordering = ordering if direction == 'next' else _reverse(ordering)
+    rows = []
+    for source in (queryset, *merge):
+        source_rows = source.order_by(*page_ordering)
+        if values is not None:
+            source_rows = source_rows.filter(_after(page_ordering, values))
+        # One extra row tells us whether there is another page beyond this one
+        rows += source_rows[:per_page + 1]
+    if merge:
+        rows = _sort_rows(rows, page_ordering)[:per_page + 1]
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if direction == 'prev':
+        rows.reverse()
+        has_previous, has_next = has_more, True
+    else:
+        has_previous, has_next = values is not None, has_more
+
+    next_cursor = previous_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor(_row_values(rows[-1], ordering), 'next')
+    if rows and has_previous:
+        previous_cursor = encode_cursor(_row_values(rows[0], ordering), 'prev')
+
+    return KeysetPage(rows, next_cursor, previous_cursor,
+                      _total_count([queryset, *merge], count, count_cache_key))
+
+
+def count_cache_key(name, *parts):
+    """Cache key for the total count of a listing, given the filters that shape it."""
+    digest = hashlib.md5(json.dumps(parts).encode()).hexdigest()
+    return f'invent:count:{name}:{digest}'
+
+
+def _total_count(querysets, count, cache_key):
+    if count is None or isinstance(count, int):
+        return count
+    if count == 'cached' and cache_key:
+        total = cache.get(cache_key)
+        if total is None:
+            total = sum(queryset.count() for queryset in querysets)
+            cache.set(cache_key, total, COUNT_CACHE_TIMEOUT)
+        return total
+    return sum(queryset.count() for queryset in querysets)
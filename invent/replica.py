@@ -0,0 +1,173 @@
+"""
+Read-replica routing for the heavy read-only pages and exports.
+
+With READ_REPLICA on (see Inventory/settings.py) there is a second database alias,
+`replica`. Views decorated with @reads_from_replica read this app's models from it;
+everything else, and every write, uses the primary ('default'). Sessions, users and
+permissions are always read from the primary, so a password change or a revoked
+permission takes effect at once. Locally the replica
+is a copy of the SQLite file that `manage.py refresh_replica` takes with SQLite's
+online backup API.
+
+Read-your-writes: ReplicaMiddleware stores the time of a session's last POST (every
+mutation in this app is a POST). Until the replica holds a snapshot taken after that
+time, the session's reads stay on the primary. The snapshot time of a SQLite replica
+is the modification time of a marker file next to it (`<replica>.synced`), which
+refresh_replica sets to the moment the copy was started. Other replicas are assumed
+to lag by up to READ_REPLICA_MAX_LAG seconds.
+"""
+import contextvars
+import os
+import sqlite3
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_ALIAS = 'replica'
+LAST_WRITE_SESSION_KEY = 'invent_last_write'
+DEFAULT_MAX_LAG = 5
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+SYNC_MARKER_SUFFIX = '.synced'
+# Apps whose reads @reads_from_replica sends to the replica
+REPLICATED_APPS = {'invent'}
+
+_use_replica = contextvars.ContextVar('invent_use_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in connections.settings
+
+
+def replica_synced_at():
+    """Time (epoch seconds) of the replica's latest snapshot, or None if there is none yet."""
+    settings_dict = connections.settings[REPLICA_ALIAS]
+    if settings_dict['ENGINE'] == 'django.db.backends.sqlite3':
+        try:
+            return os.path.getmtime(f"{settings_dict['NAME']}{SYNC_MARKER_SUFFIX}")
+        except OSError:
+            return None
+    return time.time() - getattr(settings, 'READ_REPLICA_MAX_LAG', DEFAULT_MAX_LAG)
+
+
+def refresh_sqlite_replica(pages=-1):
+    """
+    Copies the primary SQLite database over the replica with the online backup API,
+    `pages` pages per step (-1: all at once), and returns the time the copy started.
+    Readers of the replica wait while the copy is written and then see the new data.
+    """
+    replica_name = str(connections.settings[REPLICA_ALIAS]['NAME'])
+    primary = connections[DEFAULT_DB_ALIAS]
+    primary.ensure_connection()
+    # Anything committed before now is in the copy (the backup restarts if the primary changes mid-way)
+    started = time.time()
+    target = sqlite3.connect(replica_name)
+    try:
+        primary.connection.backup(target, pages=pages)
+    finally:
+        target.close()
+    # Only now may sessions whose last write was before `started` read from the replica
+    marker = f'{replica_name}{SYNC_MARKER_SUFFIX}'
+    with open(marker, 'a'):
+        pass
+    os.utime(marker, (started, started))
+    return started
+
+
+def read_source():
+    """Label for where reads currently come from; part of shared cache keys."""
+    if not _use_replica.get():
+        return 'primary'
+    return f'replica@{replica_synced_at()}'
+
+
+def _is_fresh(synced_at, last_write):
+    return synced_at is not None and (last_write is None or last_write < synced_at)
+
+
+def _replica_is_fresh_for(request):
+    return _is_fresh(replica_synced_at(), request.session.get(LAST_WRITE_SESSION_KEY))
+
+
+async def _areplica_is_fresh_for(request):
+    return _is_fresh(replica_synced_at(), await request.session.aget(LAST_WRITE_SESSION_KEY))
+
+
+def reads_from_replica(view):
+    """
+    Runs a read-only view's queries on the replica, unless the replica isn't configured,
+    the request is not a GET, or the replica doesn't have this session's last write yet.
+    List it below @login_required/@permission_required so those checks use the primary.
+    Works on async views too.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if (not replica_configured() or request.method not in SAFE_METHODS
+                    or not await _areplica_is_fresh_for(request)):
+                return await view(request, *args, **kwargs)
+            # sync_to_async() copies the context, so the view's ORM calls see this too
+            token = _use_replica.set(True)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _use_replica.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (not replica_configured() or request.method not in SAFE_METHODS
+                or not _replica_is_fresh_for(request)):
+            return view(request, *args, **kwargs)
+        token = _use_replica.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    """
+    Sends reads of REPLICATED_APPS models to the replica inside @reads_from_replica views;
+    other reads (auth, sessions, ...) and all writes go to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and model._meta.app_label in REPLICATED_APPS:
+            return REPLICA_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both sides
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica's schema comes with its copy of the data
+        return db != REPLICA_ALIAS
+
+
+class ReplicaMiddleware:
+    """
+    Remembers when a session last wrote, for read-your-writes. List it after
+    AuthenticationMiddleware. Removes itself when no replica is configured.
+    """
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # The view's transactions have committed by now, so this is later than the write
+        user = getattr(request, 'user', None)
+        if request.method not in SAFE_METHODS and user is not None and user.is_authenticated:
+            request.session[LAST_WRITE_SESSION_KEY] = time.time()
+        return response
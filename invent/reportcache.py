@@ -0,0 +1,94 @@
+"""
+Shared cache for report results, invalidated by an "inventory generation" number.
+
+Report data is cached under a key that includes the current generation, so every
+clerk opening the same report shares one computation. Anything that writes
+inventory, request or ledger data calls bump_generation(), which moves everyone on
+to fresh keys once the write commits; the stale entries simply expire. Every write
+path logs its changes with changelog.record_changes() (the model signals in
+signals.py do it for saves and deletes), which bumps the generation for us.
+
+Results computed from the read replica are keyed by its snapshot as well, so they
+never stand in for the primary's. The a-prefixed functions are the same for async
+views, going through the cache's async API.
+"""
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .middleware import record_cache_lookup
+from .replica import read_source
+
+GENERATION_KEY = 'invent:generation'
+# Safety net for caches that are not shared between worker processes
+REPORT_CACHE_TIMEOUT = 300
+
+_MISSING = object()
+
+
+def _new_generation():
+    # Never restarts from a number used before, even if the key was evicted
+    return time.time_ns()
+
+
+def current_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, _new_generation(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+async def acurrent_generation():
+    generation = await cache.aget(GENERATION_KEY)
+    if generation is None:
+        await cache.aadd(GENERATION_KEY, _new_generation(), None)
+        generation = await cache.aget(GENERATION_KEY)
+    return generation
+
+
+def _increment_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Not set (or evicted); any new number will do
+        cache.add(GENERATION_KEY, _new_generation(), None)
+
+
+def bump_generation():
+    """Invalidates every cached report once the current transaction commits."""
+    # Bumping before the commit would let readers cache the old data under the new generation
+    transaction.on_commit(_increment_generation)
+
+
+def _report_key(generation, name, parts):
+    digest = hashlib.md5(json.dumps(parts, default=str).encode()).hexdigest()
+    return f'invent:report:{generation}:{read_source()}:{name}:{digest}'
+
+
+def cached_report(name, compute, *parts, timeout=REPORT_CACHE_TIMEOUT):
+    """
+    Returns compute()'s result for report `name` with parameters `parts`, computing it
+    only if this generation has not cached it yet. The result must be picklable.
+    """
+    key = _report_key(current_generation(), name, parts)
+    value = cache.get(key, _MISSING)
+    record_cache_lookup(hit=value is not _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+async def acached_report(name, compute, *parts, timeout=REPORT_CACHE_TIMEOUT):
+    """cached_report() for async views; `compute` is a coroutine function."""
+    key = _report_key(await acurrent_generation(), name, parts)
+    value = await cache.aget(key, _MISSING)
+    record_cache_lookup(hit=value is not _MISSING)
+    if value is _MISSING:
+        value = await compute()
+        await cache.aset(key, value, timeout)
+    return value
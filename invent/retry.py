@@ -0,0 +1,59 @@
+"""
+Retrying views whose writes failed on a transient database lock.
+
+SQLite allows one writer at a time. With the production database profile (see
+Inventory/settings.py) a writer waits up to the busy timeout for the lock, but under
+heavy contention it can still give up with "database is locked". retry_on_lock
+re-runs the view after a short, jittered exponential backoff.
+
+Only wrap views that do all their writes in one transaction, so a failed attempt has
+changed nothing. Views that catch exceptions to show an error message must re-raise
+transient lock errors (see is_transient_lock_error) for the retry to see them.
+"""
+import logging
+import random
+import time
+from functools import wraps
+
+from django.db import OperationalError, connection
+
+logger = logging.getLogger('invent.retry')
+
+DEFAULT_ATTEMPTS = 4
+# First retry waits about this long (seconds), then doubles each time up to MAX_DELAY
+BASE_DELAY = 0.05
+MAX_DELAY = 1.0
+
+
+def is_transient_lock_error(exc):
+    return isinstance(exc, OperationalError) and 'locked' in str(exc).lower()
+
+
+def backoff_delay(attempt, base_delay=BASE_DELAY):
+    """Seconds to wait after failed attempt number `attempt` (1-based), with +-50% jitter."""
+    return min(base_delay * 2 ** (attempt - 1), MAX_DELAY) * random.uniform(0.5, 1.5)
+
+
+def retry_on_lock(view=None, attempts=DEFAULT_ATTEMPTS, base_delay=BASE_DELAY):
+    """
+    Decorator: calls the view again when it raises a transient lock error, up to
+    `attempts` times in total. Usable bare (@retry_on_lock) or with arguments.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(1, attempts + 1):
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as e:
+                    # Inside an outer transaction the failed attempt can't be rolled back on its own
+                    if (attempt == attempts or not is_transient_lock_error(e)
+                            or connection.in_atomic_block):
+                        raise
+                    delay = backoff_delay(attempt, base_delay)
+                    logger.info("%s: %s; retrying in %.0fms (attempt %d of %d)",
+                                func.__name__, e, delay * 1000, attempt + 1, attempts)
+                    time.sleep(delay)
+        return wrapper
+
+    return decorator(view) if view is not None else decorator
@@ -0,0 +1,277 @@
+"""
+Daily rollups behind the trend table on the reports page.
+
+DailyStockRollup holds one row per item and day with the quantities received,
+issued, returned and adjusted; DailyRequestRollup one row per day and status with
+the number of requests that moved into that status. `manage.py rollup_reports` keeps
+both up to date incrementally: it reads the ledger from the id it stopped at last
+time, and drains the RequestStatusChange journal (written alongside the dashboard
+counters). trends() answers any date range from the rollups alone.
+
+Requests inserted without going through the counters (bulk seeding, rows that predate
+the journal) never reach the journal; rebuild_rollups() recovers their submissions and
+issues from the request rows themselves, but not their other status changes.
+"""
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (ArchivedItemRequest, ArchivedStockTransaction, DailyRequestRollup,
+                     DailyStockRollup, ItemRequest, RequestStatusChange, RollupState,
+                     StockTransaction)
+from .reportcache import bump_generation
+
+# Which DailyStockRollup column each transaction type adds to
+TRANSACTION_COLUMNS = {
+    'Receive': 'quantity_received',
+    'Issue': 'quantity_issued',
+    'Return': 'quantity_returned',
+    'Adjustment': 'quantity_adjusted',
+}
+STOCK_COLUMNS = list(TRANSACTION_COLUMNS.values())
+REQUEST_STATUSES = [status for status, _ in ItemRequest.STATUS_CHOICES]
+# Statuses rebuild_rollups() can date from the request rows (date_requested, date_issued)
+DERIVED_STATUSES = ['Pending', 'Issued']
+
+# RollupState names
+LEDGER_STATE = 'stock_transactions'
+JOURNAL_STATE = 'request_status_changes'
+
+DEFAULT_BATCH_SIZE = 20000
+DEFAULT_TREND_DAYS = 30
+# Longer ranges are shown per month instead of per day
+MAX_DAILY_RANGE = timedelta(days=92)
+
+
+def journal_status_changes(statuses):
+    """Records that requests just moved into each of `statuses` (one INSERT)."""
+    if statuses:
+        now = timezone.now()
+        RequestStatusChange.objects.bulk_create(
+            [RequestStatusChange(status=status, changed_at=now) for status in statuses])
+
+
+# --- Rolling up ---
+
+def _locked_state(name):
+    # Serializes concurrent runs; callers are inside transaction.atomic()
+    RollupState.objects.get_or_create(name=name)
+    return RollupState.objects.select_for_update().get(name=name)
+
+
+def _batch_upper_id(queryset, batch_size):
+    """The id that ends the next batch of at most `batch_size` rows, or None if there are none."""
+    upper = queryset.order_by('id').values_list('id', flat=True)[batch_size - 1:batch_size].first()
+    return upper or queryset.aggregate(upper=Max('id'))['upper']
+
+
+def _merge_stock(rows):
+    """Adds grouped ledger rows ({day, item_id, transaction_type, quantity, transactions}) to DailyStockRollup."""
+    totals = {}
+    for row in rows:
+        key = (row['day'], row['item_id'])
+        total = totals.setdefault(key, dict.fromkeys(STOCK_COLUMNS + ['transactions'], 0))
+        column = TRANSACTION_COLUMNS.get(row['transaction_type'])
+        if column:
+            total[column] += row['quantity']
+        total['transactions'] += row['transactions']
+    if not totals:
+        return
+
+    existing = {
+        (rollup.date, rollup.item_id): rollup for rollup in DailyStockRollup.objects.filter(
+            date__in={day for day, _ in totals}, item_id__in={item_id for _, item_id in totals})
+    }
+    to_create, to_update = [], []
+    for (day, item_id), total in totals.items():
+        rollup = existing.get((day, item_id))
+        if rollup is None:
+            to_create.append(DailyStockRollup(date=day, item_id=item_id, **total))
+            continue
+        for name, amount in total.items():
+            setattr(rollup, name, getattr(rollup, name) + amount)
+        to_update.append(rollup)
+    DailyStockRollup.objects.bulk_create(to_create)
+    DailyStockRollup.objects.bulk_update(to_update, STOCK_COLUMNS + ['transactions'])
+
+
+def _merge_requests(rows):
+    """Adds grouped journal rows ({day, status, count}) to DailyRequestRollup."""
+    counts = {(row['day'], row['status']): row['count'] for row in rows}
+    if not counts:
+        return
+    existing = {
+        (rollup.date, rollup.status): rollup for rollup in DailyRequestRollup.objects.filter(
+            date__in={day for day, _ in counts}, status__in={status for _, status in counts})
+    }
+    to_create, to_update = [], []
+    for (day, status), count in counts.items():
+        rollup = existing.get((day, status))
+        if rollup is None:
+            to_create.append(DailyRequestRollup(date=day, status=status, count=count))
+        else:
+            rollup.count += count
+            to_update.append(rollup)
+    DailyRequestRollup.objects.bulk_create(to_create)
+    DailyRequestRollup.objects.bulk_update(to_update, ['count'])
+
+
+def _grouped_stock(rows):
+    return list(rows.annotate(day=TruncDate('transaction_date')).order_by()
+                .values('day', 'item_id', 'transaction_type')
+                .annotate(quantity=Sum('quantity'), transactions=Count('id')))
+
+
+def roll_up_ledger(batch_size=DEFAULT_BATCH_SIZE):
+    """Folds ledger rows recorded since the last run into DailyStockRollup. Returns the number read."""
+    processed = 0
+    while True:
+        with transaction.atomic():
+            state = _locked_state(LEDGER_STATE)
+            new_rows = StockTransaction.objects.filter(id__gt=state.last_id)
+            upper = _batch_upper_id(new_rows, batch_size)
+            if upper is None:
+                # Up to date; the reports page shows this as the "as of" time
+                state.save(update_fields=['updated_at'])
+                return processed
+            rows = _grouped_stock(new_rows.filter(id__lte=upper))
+            _merge_stock(rows)
+            processed += sum(row['transactions'] for row in rows)
+            state.last_id = upper
+            state.save()
+
+
+def roll_up_status_changes(batch_size=DEFAULT_BATCH_SIZE):
+    """Moves the RequestStatusChange journal into DailyRequestRollup. Returns the number of entries."""
+    processed = 0
+    while True:
+        with transaction.atomic():
+            state = _locked_state(JOURNAL_STATE)
+            upper = _batch_upper_id(RequestStatusChange.objects.all(), batch_size)
+            if upper is None:
+                return processed
+            batch = RequestStatusChange.objects.filter(id__lte=upper)
+            _merge_requests(
+                batch.annotate(day=TruncDate('changed_at')).order_by()
+                .values('day', 'status').annotate(count=Count('id')))
+            processed += batch.delete()[0]
+            state.last_id = upper
+            state.save()
+
+
+def roll_up(batch_size=DEFAULT_BATCH_SIZE):
+    """Brings both rollups up to date. Returns (ledger rows, journal entries) processed."""
+    processed = roll_up_ledger(batch_size), roll_up_status_changes(batch_size)
+    if any(processed):
+        # The trends on the cached reports page changed
+        bump_generation()
+    return processed
+
+
+def rebuild_rollups(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Recomputes both rollups from scratch. The stock rollup is rebuilt from the whole
+    ledger, archive included. The request rollup counts submissions (by date_requested)
+    and issues (by date_issued) of every live and archived request, so requests that
+    never went through the journal are included. When requests were approved, rejected,
+    cancelled or returned is only known from the journal, which is emptied as it is
+    rolled up: those counts are lost, except for journal entries not rolled up yet,
+    which are kept and added back. Returns (ledger rows, request rollup rows).
+    """
+    with transaction.atomic():
+        DailyStockRollup.objects.all().delete()
+        DailyRequestRollup.objects.all().delete()
+        # Recounted from the request rows below
+        RequestStatusChange.objects.filter(status__in=DERIVED_STATUSES).delete()
+        RollupState.objects.filter(name=LEDGER_STATE).update(last_id=0)
+
+        counts = {}
+        for model in (ItemRequest, ArchivedItemRequest):
+            submitted = (model.objects.annotate(day=TruncDate('date_requested')).order_by()
+                         .values('day').annotate(count=Count('id')))
+            issued = (model.objects.filter(date_issued__isnull=False)
+                      .annotate(day=TruncDate('date_issued')).order_by()
+                      .values('day').annotate(count=Count('id')))
+            for status, rows in (('Pending', submitted), ('Issued', issued)):
+                for row in rows:
+                    counts[(row['day'], status)] = counts.get((row['day'], status), 0) + row['count']
+        DailyRequestRollup.objects.bulk_create(
+            [DailyRequestRollup(date=day, status=status, count=count) for (day, status), count in counts.items()],
+            batch_size=batch_size)
+
+        # Archived rows all have lower ids than the live ledger, which is rolled up below
+        archived = 0
+        last_id = 0
+        while True:
+            upper = _batch_upper_id(ArchivedStockTransaction.objects.filter(id__gt=last_id), batch_size)
+            if upper is None:
+                break
+            rows = _grouped_stock(ArchivedStockTransaction.objects.filter(id__gt=last_id, id__lte=upper))
+            _merge_stock(rows)
+            archived += sum(row['transactions'] for row in rows)
+            last_id = upper
+    transactions = roll_up_ledger(batch_size)
+    roll_up_status_changes(batch_size)
+    bump_generation()
+    return archived + transactions, DailyRequestRollup.objects.count()
+
+
+# --- Reading ---
+
+def trend_range(start, end, default_days=DEFAULT_TREND_DAYS):
+    """
+    Parses the reports page's start/end (ISO dates, either may be blank or invalid)
+    into a (start, end) pair of dates, defaulting to the last `default_days` days.
+    """
+    def parse(value):
+        try:
+            return date.fromisoformat(value) if value else None
+        except ValueError:
+            return None
+
+    end = parse(end) or timezone.localdate()
+    start = parse(start) or end - timedelta(days=default_days - 1)
+    return (end, start) if start > end else (start, end)
+
+
+def trends(start, end):
+    """
+    Totals per period between `start` and `end` (inclusive), read from the rollups only.
+    Periods are days, or months when the range is longer than MAX_DAILY_RANGE.
+    Returns (rows, monthly); each row has 'period', the four stock quantities and
+    'requests', the counts per status in REQUEST_STATUSES order. Periods without any
+    activity are left out.
+    """
+    monthly = end - start > MAX_DAILY_RANGE
+
+    # Grouped by plain date in SQL (months are folded in below): truncating dates is a
+    # Python function call per row on SQLite, while the date index already gives the order
+    stock = (DailyStockRollup.objects.filter(date__range=(start, end)).values('date')
+             .annotate(**{column: Sum(column) for column in STOCK_COLUMNS}).order_by())
+    requests = (DailyRequestRollup.objects.filter(date__range=(start, end))
+                .values('date', 'status').annotate(count=Sum('count')).order_by())
+
+    def period_row(day):
+        key = day.replace(day=1) if monthly else day
+        if key not in rows:
+            rows[key] = {'period': key, **dict.fromkeys(STOCK_COLUMNS, 0),
+                         'requests': [0] * len(REQUEST_STATUSES)}
+        return rows[key]
+
+    rows = {}
+    for totals in stock:
+        row = period_row(totals['date'])
+        for column in STOCK_COLUMNS:
+            row[column] += totals[column]
+    for totals in requests:
+        if totals['status'] in REQUEST_STATUSES:
+            period_row(totals['date'])['requests'][REQUEST_STATUSES.index(totals['status'])] += totals['count']
+    return [rows[key] for key in sorted(rows)], monthly
+
+
+def last_rolled_up():
+    """When the rollups were last brought up to date, or None if never."""
+    return RollupState.objects.filter(name=LEDGER_STATE).values_list('updated_at', flat=True).first()
@@ -0,0 +1,136 @@
+"""
+Full-text search for inventory items.
+
+On SQLite, an FTS5 index over name / serial number / category is kept in sync with
+invent_inventoryitem by triggers. It uses the trigram tokenizer, so any substring of
+three or more characters is an index lookup with bm25 ranking ("1234" finds
+"5CG1234XYZ", "BC-12" finds "ABC-123") instead of a leading-wildcard LIKE scan.
+Shorter terms, other databases and SQLite builds without FTS5 fall back to the old
+icontains search, which matches the same rows.
+
+The index is (re)installed after every migrate, because SQLite table rebuilds during
+migrations drop triggers. `manage.py rebuild_search_index` does the same on demand.
+"""
+from django.db import connections
+from django.db.models import BooleanField, F, Q
+from django.db.models.expressions import RawSQL
+
+from .models import InventoryItem
+
+FTS_TABLE = 'invent_inventoryitem_fts'
+SEARCH_FIELDS = ['name', 'serial_number', 'category']
+
+# The trigram tokenizer cannot match anything shorter than one trigram
+MIN_MATCH_LENGTH = 3
+
+# Per-connection-alias cache of whether the FTS index exists
+_fts_available = {}
+
+
+def _trigger_sql(table):
+    columns = ', '.join(SEARCH_FIELDS)
+    new_values = ', '.join(f'new.{field}' for field in SEARCH_FIELDS)
+    old_values = ', '.join(f'old.{field}' for field in SEARCH_FIELDS)
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {columns} ON {table} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});
+        END""",
+    ]
+
+
+def install_search_index(using='default', rebuild=False):
+    """
+    Creates the FTS5 table and its sync triggers if they are missing, and re-indexes
+    every item when they were (or when `rebuild` is set). Returns False if the
+    database cannot host the index.
+    """
+    connection = connections[using]
+    _fts_available.pop(using, None)
+    if connection.vendor != 'sqlite':
+        return False
+
+    table = InventoryItem._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s",
+            [f'{FTS_TABLE}%'])
+        existing = {row[0] for row in cursor.fetchall()}
+        expected = {FTS_TABLE, f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au'}
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        row = cursor.fetchone()
+        if row and 'trigram' not in row[0]:
+            # Built by an older version with the prefix-only tokenizer
+            cursor.execute(f"DROP TABLE {FTS_TABLE}")
+            existing.discard(FTS_TABLE)
+        if expected <= existing and not rebuild:
+            return True
+
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"{', '.join(SEARCH_FIELDS)}, content='{table}', content_rowid='id', "
+                f"tokenize='trigram')")
+        except Exception:
+            # SQLite compiled without FTS5
+            return False
+        for sql in _trigger_sql(table):
+            cursor.execute(sql)
+        # External-content tables re-read every row of the source table on 'rebuild'
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+def fts_available(using='default'):
+    if using not in _fts_available:
+        connection = connections[using]
+        _fts_available[using] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names(include_views=False)
+        )
+    return _fts_available[using]
+
+
+def build_match_query(text):
+    """
+    Turns free text into an FTS5 query matching it as one substring, the same rows
+    icontains would. Returns None if the text is too short for the trigram index.
+    Quoting the text keeps FTS5 operators typed by users from being interpreted.
+    """
+    if len(text) < MIN_MATCH_LENGTH:
+        return None
+    return '"{}"'.format(text.replace('"', '""'))
+
+
+def search_inventory(queryset, text, ranked=False):
+    """
+    Filters an InventoryItem queryset down to items matching `text`.
+    With `ranked=True` the result is ordered by relevance (best first), then name.
+    """
+    text = (text or '').strip()
+    if not text:
+        return queryset
+
+    match = build_match_query(text)
+    if not match or not fts_available(queryset.db):
+        return queryset.filter(
+            Q(name__icontains=text) |
+            Q(serial_number__icontains=text) |
+            Q(category__icontains=text)
+        )
+
+    if ranked:
+        # Join the index instead of filtering on it, so the one MATCH both selects the
+        # items and yields their rank. The join is INNER, which lets SQLite start from
+        # the MATCH rather than scanning the inventory.
+        return queryset.filter(search_entry__isnull=False).filter(
+            RawSQL(f"{FTS_TABLE} MATCH %s", (match,), output_field=BooleanField()),
+        ).annotate(search_rank=F('search_entry__rank')).order_by('search_rank', 'name')
+    return queryset.filter(id__in=RawSQL(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,)))
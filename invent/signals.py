@@ -0,0 +1,73 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import archive, changelog, counters, search
+from .models import (ArchivedItemRequest, ArchivedStockTransaction, InventoryItem, ItemRequest,
+                     StockTransaction)
+
+
+# Deletes are handled with signals rather than delete() overrides so that
+# queryset deletes and cascades (e.g. deleting an item with requests) are counted too.
+
+@receiver(post_delete, sender=InventoryItem)
+def item_deleted(sender, instance, **kwargs):
+    old = getattr(instance, '_counter_snapshot', None) or counters.snapshot(
+        instance, counters.ITEM_TRACKED_FIELDS)
+    if old:
+        counters.record_item_change(old, None)
+
+
+@receiver(post_delete, sender=ItemRequest)
+# Archived requests still count, so deleting an item or user (which cascades to them) must uncount them
+@receiver(post_delete, sender=ArchivedItemRequest)
+def item_request_deleted(sender, instance, **kwargs):
+    old = getattr(instance, '_counter_snapshot', None) or counters.snapshot(
+        instance, counters.REQUEST_TRACKED_FIELDS)
+    if old:
+        counters.record_request_change(old, None)
+    if sender is ArchivedItemRequest:
+        archive.uncount_archived_request(instance.item_id)
+
+
+# Logging a change also bumps the generation, so cached reports go stale with it
+
+@receiver(post_save, sender=InventoryItem)
+@receiver(post_save, sender=ItemRequest)
+@receiver(post_save, sender=StockTransaction)
+def log_saved(sender, instance, created, **kwargs):
+    changelog.record_change(instance, 'insert' if created else 'update')
+
+
+@receiver(post_delete, sender=InventoryItem)
+@receiver(post_delete, sender=ItemRequest)
+@receiver(post_delete, sender=StockTransaction)
+# Deleting an item cascades to its archived rows too
+@receiver(post_delete, sender=ArchivedItemRequest)
+@receiver(post_delete, sender=ArchivedStockTransaction)
+def log_deleted(sender, instance, **kwargs):
+    changelog.record_change(instance, 'delete')
+
+
+# on_delete=SET_NULL updates the referring rows without save(), so log those by hand
+
+@receiver(pre_delete, sender=ItemRequest)
+def request_deleting(sender, instance, **kwargs):
+    changelog.record_changes(
+        StockTransaction, instance.stock_transactions.values_list('pk', flat=True), 'update')
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    changelog.record_changes(
+        InventoryItem, InventoryItem.objects.filter(created_by=instance).values_list('pk', flat=True), 'update')
+    for model in (StockTransaction, ArchivedStockTransaction):
+        changelog.record_changes(
+            model, model.objects.filter(recorded_by=instance).values_list('pk', flat=True), 'update')
+
+
+@receiver(post_migrate)
+def ensure_search_index(sender, using='default', **kwargs):
+    # Table rebuilds during migrations drop the FTS sync triggers, so put them back
+    if sender.name == 'invent':
+        search.install_search_index(using=using)
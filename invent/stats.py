@@ -0,0 +1,64 @@
+from django.db.models import Count, F, Q, Sum
+
+from .models import ItemRequest
+
+# Maps each ItemRequest status to the key it is reported under
+STATUS_KEYS = {
+    'Pending': 'pending',
+    'Approved': 'approved',
+    'Issued': 'issued',
+    'Rejected': 'rejected',
+    'Cancelled': 'cancelled',
+    'Partially Returned': 'partially_returned',
+    'Fully Returned': 'fully_returned',
+}
+
+
+def request_status_aggregates():
+    """
+    Conditional aggregate expressions behind request_status_summary(), shared with
+    the dashboard counter rebuild so both agree on what each key means.
+    """
+    aggregates = {
+        key: Count('id', filter=Q(status=status)) for status, key in STATUS_KEYS.items()
+    }
+    return {
+        'total': Count('id'),
+        'returned_total': Sum('returned_quantity'),
+        'outstanding_issued': Count(
+            'id', filter=Q(status='Issued', quantity__gt=F('returned_quantity'))),
+        **aggregates,
+    }
+
+
+def request_status_summary(requestor=None):
+    """
+    Returns every per-status request count plus returned-quantity totals in one query.
+
+    The result is a dict with 'total', one key per status (see STATUS_KEYS),
+    'returned_total' (sum of ItemRequest.returned_quantity) and
+    'outstanding_issued' (Issued requests that still have items to return).
+    Pass `requestor` to scope everything to that user's requests.
+    """
+    queryset = ItemRequest.objects.all()
+    if requestor is not None:
+        queryset = queryset.filter(requestor=requestor)
+
+    summary = queryset.aggregate(**request_status_aggregates())
+    # Sum() is NULL on an empty table
+    summary['returned_total'] = summary['returned_total'] or 0
+    return summary
+
+
+def status_breakdown(summary):
+    """
+    Turns a request_status_summary() or read_counters() result into the
+    [{"status": ..., "count": ...}] rows the templates loop over, skipping empty
+    statuses and ordered by status name.
+    """
+    return [
+        {'status': status, 'count': summary[key]}
+        for status, key in sorted(STATUS_KEYS.items())
+        if summary[key]
+    ]
+
@@ -0,0 +1,304 @@
+"""
+Issuing stock without overselling.
+
+Stock is issued with a single conditional UPDATE
+(`... SET quantity_issued = quantity_issued + n WHERE id = ? AND quantity_available >= n`),
+so the availability check and the decrement happen atomically in the database. Of two
+clerks issuing the last units at the same time exactly one succeeds; the other gets
+InsufficientStock. Requests are claimed the same way (`WHERE status = 'Approved'`),
+so a request cannot be issued twice either.
+
+process_request_batch() applies one action to many requests at once with a fixed
+number of queries, whatever the batch size.
+"""
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .changelog import record_changes
+from .counters import record_request_changes, record_stock_issued
+from .models import InventoryItem, ItemRequest, StockTransaction
+from .notifications import queue_emails
+
+# Batch action -> (statuses it can be applied to, resulting status)
+BATCH_ACTIONS = {
+    'approve': (['Pending'], 'Approved'),
+    'reject': (['Pending', 'Approved'], 'Rejected'),
+    'issue': (['Approved'], 'Issued'),
+}
+MAX_BATCH_SIZE = 500
+
+
+class StockError(Exception):
+    pass
+
+
+class InsufficientStock(StockError):
+    def __init__(self, item_name, requested, available):
+        self.item_name = item_name
+        self.requested = requested
+        self.available = available
+        self.shortfall = requested - available
+        super().__init__(
+            f"Insufficient stock for '{item_name}'. Requested: {requested}, Available: {available}.")
+
+
+class RequestNotIssuable(StockError):
+    pass
+
+
+def issue_stock(item, quantity, recorded_by, issued_to=None, reason=None, item_request=None):
+    """
+    Issues `quantity` units of `item` (an InventoryItem or its id) and records the
+    'Issue' transaction. Raises InsufficientStock, changing nothing, if fewer units
+    are available at the moment of the update. Returns the StockTransaction.
+    """
+    if quantity < 1:
+        raise StockError("Quantity to issue must be at least 1.")
+    item_id = getattr(item, 'pk', item)
+
+    with transaction.atomic():
+        updated = InventoryItem.objects.filter(
+            pk=item_id, quantity_available__gte=quantity,
+        ).update(quantity_issued=F('quantity_issued') + quantity, updated_at=timezone.now())
+        if not updated:
+            current = InventoryItem.objects.filter(pk=item_id).values('name', 'quantity_available').first()
+            if current is None:
+                raise InventoryItem.DoesNotExist(f"Inventory item {item_id} does not exist.")
+            raise InsufficientStock(current['name'], quantity, current['quantity_available'])
+
+        # queryset.update() skips save(), so keep the dashboard counters and change log in step by hand
+        record_stock_issued(quantity)
+        record_changes(InventoryItem, [item_id], 'update')
+        if isinstance(item, InventoryItem):
+            # The in-memory copy is stale now; re-read the quantities on next access
+            for field in ('quantity_issued', 'quantity_available', 'updated_at'):
+                item.__dict__.pop(field, None)
+
+        return StockTransaction.objects.create(
+            item_id=item_id,
+            transaction_type='Issue',
+            quantity=quantity,  # Store positive quantity for Issue transactions
+            item_request=item_request,
+            issued_to=issued_to,
+            reason=reason,
+            recorded_by=recorded_by,
+        )
+
+
+def issue_request(item_request, recorded_by, reason=None):
+    """
+    Issues an Approved request: claims it, issues its stock and marks it Issued, all in
+    one transaction. Raises RequestNotIssuable if it is no longer Approved (or was
+    changed since it was loaded), and InsufficientStock if there is not enough stock;
+    either way nothing is written. Returns the StockTransaction.
+    """
+    if item_request.status != 'Approved':
+        raise RequestNotIssuable(
+            f"Cannot issue for request ID {item_request.id}. It must be 'Approved'. "
+            f"Current status: '{item_request.status}'.")
+
+    old = {
+        'requestor_id': item_request.requestor_id,
+        'status': 'Approved',
+        'quantity': item_request.quantity,
+        'returned_quantity': item_request.returned_quantity,
+    }
+    with transaction.atomic():
+        # Only one concurrent issuer can move the request out of Approved. Matching on the
+        # tracked fields too guarantees the stock we issue is what the row says.
+        claimed = ItemRequest.objects.filter(pk=item_request.pk, **old).update(status='Issued')
+        if not claimed:
+            raise RequestNotIssuable(
+                f"Request ID {item_request.id} was changed by someone else and was not issued.")
+
+        stock_transaction = issue_stock(
+            item_request.item_id, item_request.quantity, recorded_by,
+            issued_to=item_request.requestor.username,
+            reason=reason or f"Issued for request ID: {item_request.id} ({item_request.name})",
+            item_request=item_request,
+        )
+
+        # save() takes it from here: dashboard counters, date_issued and the notification
+        item_request._counter_snapshot = old
+        item_request._original_status = 'Approved'
+        item_request.status = 'Issued'
+        item_request.save()
+    return stock_transaction
+
+
+def _allocate_stock(requests):
+    """
+    Splits Issue candidates into those the current stock covers and those it does not,
+    first come (lowest request ID) first served, reading every item in one query.
+    """
+    item_ids = {r.item_id for r in requests}
+    available = dict(InventoryItem.objects.filter(pk__in=item_ids).values_list('pk', 'quantity_available'))
+    granted, refused = [], []
+    for item_request in sorted(requests, key=lambda r: r.pk):
+        if available.get(item_request.item_id, 0) >= item_request.quantity:
+            available[item_request.item_id] -= item_request.quantity
+            granted.append(item_request)
+        else:
+            refused.append((item_request, available.get(item_request.item_id, 0)))
+    return granted, refused
+
+
+def _issue_granted(granted, recorded_by, now):
+    """
+    Issues the stock for all granted requests with one guarded UPDATE and writes their
+    ledger rows with one INSERT. Raises StockError (rolling everything back) if stock
+    moved underneath us between the availability read and the update.
+    """
+    per_item = {}
+    for item_request in granted:
+        per_item[item_request.item_id] = per_item.get(item_request.item_id, 0) + item_request.quantity
+
+    guard = Q()
+    for item_id, quantity in per_item.items():
+        guard |= Q(pk=item_id, quantity_available__gte=quantity)
+    updated = InventoryItem.objects.filter(guard).update(
+        quantity_issued=F('quantity_issued') + Case(
+            *[When(pk=item_id, then=Value(quantity)) for item_id, quantity in per_item.items()],
+            default=Value(0),
+        ),
+        updated_at=now,
+    )
+    if updated != len(per_item):
+        raise StockError("Stock levels changed while the batch was being processed. Nothing was issued; please retry.")
+    record_stock_issued(sum(per_item.values()))
+    record_changes(InventoryItem, per_item, 'update')
+
+    created = StockTransaction.objects.bulk_create([
+        StockTransaction(
+            item_id=item_request.item_id,
+            transaction_type='Issue',
+            quantity=item_request.quantity,
+            item_request=item_request,
+            issued_to=item_request.requestor.username,
+            reason=f"Issued for request ID: {item_request.id} ({item_request.name})",
+            recorded_by=recorded_by,
+        )
+        for item_request in granted
+    ])
+    record_changes(StockTransaction, [row.pk for row in created], 'insert')
+
+
+def _move_requests(queryset, target, now):
+    fields = {'status': target}
+    if target == 'Issued':
+        fields['date_issued'] = Coalesce(F('date_issued'), Value(now))
+    return queryset.update(**fields)
+
+
+def _claim_requests(candidates, target, now):
+    """
+    Moves the candidates to `target` with one conditional UPDATE per status they were
+    read in (`WHERE id IN (...) AND status = <status read>`), so a request someone else
+    changed since the read is left alone. If an UPDATE matches fewer rows than expected,
+    it is rolled back and the group is claimed row by row to find out which were lost.
+    Returns (claimed, lost) lists.
+    """
+    groups = {}
+    for item_request in candidates:
+        groups.setdefault(item_request.status, []).append(item_request)
+
+    claimed, lost = [], []
+    for status, group in groups.items():
+        savepoint = transaction.savepoint()
+        updated = _move_requests(
+            ItemRequest.objects.filter(pk__in=[r.pk for r in group], status=status), target, now)
+        if updated == len(group):
+            transaction.savepoint_commit(savepoint)
+            claimed += group
+            continue
+        transaction.savepoint_rollback(savepoint)
+        for item_request in group:
+            if _move_requests(ItemRequest.objects.filter(pk=item_request.pk, status=status), target, now):
+                claimed.append(item_request)
+            else:
+                lost.append(item_request)
+    return claimed, lost
+
+
+def process_request_batch(request_ids, action, recorded_by):
+    """
+    Applies `action` ('approve', 'reject' or 'issue') to every request in `request_ids`
+    in one transaction. Requests that cannot take the action (wrong status, not enough
+    stock, unknown ID, changed by someone else meanwhile) are skipped and reported; the
+    rest are claimed with conditional UPDATEs (see _claim_requests()), their ledger rows
+    and notification emails inserted with bulk_create().
+
+    Returns one {'id', 'ok', 'status', 'message'} dict per requested ID, in input order.
+    """
+    if action not in BATCH_ACTIONS:
+        raise StockError(f"Unknown batch action '{action}'.")
+    allowed, target = BATCH_ACTIONS[action]
+    request_ids = list(dict.fromkeys(request_ids))  # De-duplicate, keep order
+    if len(request_ids) > MAX_BATCH_SIZE:
+        raise StockError(f"At most {MAX_BATCH_SIZE} requests can be processed at once.")
+
+    results = {}
+    now = timezone.now()
+    with transaction.atomic():
+        # select_for_update() is a no-op on SQLite; the status checks are repeated in
+        # the UPDATEs below, so a concurrent change is caught there either way
+        requests = {
+            r.pk: r for r in ItemRequest.objects.select_for_update()
+            .select_related('item', 'requestor').filter(pk__in=request_ids)
+        }
+        candidates = []
+        for request_id in request_ids:
+            item_request = requests.get(request_id)
+            if item_request is None:
+                results[request_id] = {'ok': False, 'status': None, 'message': "Request not found."}
+            elif item_request.status not in allowed:
+                results[request_id] = {
+                    'ok': False, 'status': item_request.status,
+                    'message': f"Request is '{item_request.status}' and cannot be {target.lower()}.",
+                }
+            else:
+                candidates.append(item_request)
+
+        if action == 'issue':
+            candidates, refused = _allocate_stock(candidates)
+            for item_request, available in refused:
+                results[item_request.pk] = {
+                    'ok': False, 'status': item_request.status,
+                    'message': str(InsufficientStock(item_request.item.name, item_request.quantity, available)),
+                }
+
+        candidates, lost = _claim_requests(candidates, target, now)
+        if lost:
+            current = dict(ItemRequest.objects.filter(pk__in=[r.pk for r in lost]).values_list('pk', 'status'))
+            for item_request in lost:
+                results[item_request.pk] = {
+                    'ok': False, 'status': current.get(item_request.pk),
+                    'message': f"Request was changed by someone else and was not {target.lower()}.",
+                }
+        if action == 'issue' and candidates:
+            _issue_granted(candidates, recorded_by, now)
+
+        changes = []
+        for item_request in candidates:
+            old = {'requestor_id': item_request.requestor_id, 'status': item_request.status,
+                   'quantity': item_request.quantity, 'returned_quantity': item_request.returned_quantity}
+            item_request.status = target
+            if target == 'Issued' and not item_request.date_issued:
+                item_request.date_issued = now
+            changes.append((old, dict(old, status=target)))
+            results[item_request.pk] = {'ok': True, 'status': target, 'message': f"Request {target.lower()}."}
+
+        # queryset.update() skips save(), so counters and notifications are handled here
+        record_request_changes(changes)
+        record_changes(ItemRequest, [item_request.pk for item_request in candidates], 'update')
+        queue_emails(
+            (*item_request.status_notification(), [item_request.requestor.email])
+            for item_request in candidates
+        )
+        for item_request, (old, new) in zip(candidates, changes):
+            item_request._original_status = item_request.status
+            item_request._counter_snapshot = new
+
+    return [{'id': request_id, **results[request_id]} for request_id in request_ids]
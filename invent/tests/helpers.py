@@ -0,0 +1,34 @@
+"""Small factories and assertions shared by the test modules."""
+from django.contrib.auth.models import Permission, User
+
+from invent.counters import compute_counters
+from invent.models import ArchivedItemRequest, DashboardCounter, InventoryItem, ItemRequest
+
+
+def make_clerk(username='clerk'):
+    clerk = User.objects.create_user(username, f'{username}@example.com', 'password', is_staff=True)
+    clerk.user_permissions.set(Permission.objects.filter(content_type__app_label='invent'))
+    return User.objects.get(pk=clerk.pk)
+
+
+def make_requestor(username='requestor'):
+    return User.objects.create_user(username, f'{username}@example.com', 'password')
+
+
+def make_item(clerk, name='Dell Optiplex 7010', quantity=10, **fields):
+    return InventoryItem.objects.create(name=name, quantity_total=quantity, created_by=clerk, **fields)
+
+
+def make_request(item, requestor, quantity=1, status='Pending'):
+    return ItemRequest.objects.create(
+        item=item, name=item.name, quantity=quantity, requestor=requestor, status=status)
+
+
+class CounterAssertions:
+    def assertCountersMatchSource(self):
+        """The incrementally maintained counters equal a full recount (archive included)."""
+        stored = {(requestor_id, name): value for requestor_id, name, value in
+                  DashboardCounter.objects.values_list('requestor_id', 'name', 'value') if value}
+        recounted = {(requestor_id, name): value for requestor_id, name, value in
+                     compute_counters(archived_request_model=ArchivedItemRequest) if value}
+        self.assertEqual(stored, recounted)
@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from invent.benchdata import bench_users, seed_dataset
+from invent.models import InventoryItem, ItemRequest
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset(users=5, items=30, requests=200, adjustments=20, seed=2)
+        cls.clerk, cls.requestor = bench_users()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.clerk)
+
+    def walk(self, url, **params):
+        """Follows the `next` links and returns every row of the listing."""
+        rows = []
+        response = self.client.get(url, params)
+        while True:
+            body = response.json()
+            rows += body['results']
+            if not body['next']:
+                return rows
+            response = self.client.get(body['next'])
+
+    def test_not_modified_costs_no_data_queries(self):
+        url = reverse('api_v1_items')
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q['sql'] for q in queries.captured_queries if 'invent_' in q['sql']])
+
+    def test_etag_changes_with_the_data(self):
+        url = reverse('api_v1_items')
+        etag = self.client.get(url)['ETag']
+        item = InventoryItem.objects.first()
+        item.name = 'Renamed'
+        # The generation is bumped once the change commits
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_cursor_pages_cover_every_row_once(self):
+        rows = self.walk(reverse('api_v1_items'), limit=7, fields='id')
+        self.assertEqual([row['id'] for row in rows],
+                         list(InventoryItem.objects.order_by('name', 'id').values_list('id', flat=True)))
+
+    def test_requestors_only_see_their_own_requests(self):
+        self.client.force_login(self.requestor)
+        rows = self.walk(reverse('api_v1_requests'), fields='id,requestor', limit=50)
+        self.assertEqual({row['requestor'] for row in rows}, {self.requestor.pk})
+        self.assertEqual(len(rows), ItemRequest.objects.filter(requestor=self.requestor).count())
+
+    def test_errors_are_json(self):
+        response = self.client.get(reverse('api_v1_items'), {'fields': 'id,nope'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('nope', response.json()['error'])
+        self.assertEqual(self.client.post(reverse('api_v1_items')).status_code, 405)
+
@@ -0,0 +1,117 @@
+from datetime import timedelta
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from invent.archive import archive_history, top_requested_items
+from invent.benchdata import bench_users, seed_dataset
+from invent.counters import read_counters
+from invent.ledger import reconcile
+from invent.models import ArchivedItemRequest, ArchivedStockTransaction, InventoryItem, ItemRequest
+
+from .helpers import CounterAssertions
+
+
+class ArchiveTests(CounterAssertions, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset(users=10, items=40, requests=600, adjustments=60, seed=3)
+        cls.clerk, _ = bench_users()
+        cls.moved = archive_history(timezone.now() - timedelta(days=365), batch_size=100)
+
+    def test_history_is_moved(self):
+        transactions, requests = self.moved
+        self.assertGreater(transactions, 0)
+        self.assertGreater(requests, 0)
+        self.assertEqual(ArchivedItemRequest.objects.count(), requests)
+        self.assertEqual(ArchivedStockTransaction.objects.count(), transactions)
+
+    def test_ledger_still_reconciles(self):
+        self.assertEqual(reconcile(full=True, checkpoint=False)['mismatches'], [])
+        self.assertEqual(reconcile()['mismatches'], [])
+
+    def test_counters_still_include_archived_requests(self):
+        self.assertEqual(read_counters()['total'],
+                         ItemRequest.objects.count() + ArchivedItemRequest.objects.count())
+        self.assertCountersMatchSource()
+
+    def test_deleting_items_and_users_uncounts_their_archived_requests(self):
+        item_id = ArchivedItemRequest.objects.values_list('item', flat=True).first()
+        InventoryItem.objects.get(pk=item_id).delete()
+        requestor_id = ArchivedItemRequest.objects.values_list('requestor', flat=True).first()
+        User.objects.get(pk=requestor_id).delete()
+
+        self.assertFalse(ArchivedItemRequest.objects.filter(item=item_id).exists())
+        self.assertFalse(ArchivedItemRequest.objects.filter(requestor=requestor_id).exists())
+        self.assertEqual(read_counters()['total'],
+                         ItemRequest.objects.count() + ArchivedItemRequest.objects.count())
+        self.assertCountersMatchSource()
+
+    def assertTopItemsCountArchivedRequests(self):
+        counts = {}
+        for model in (ItemRequest, ArchivedItemRequest):
+            for name in model.objects.values_list('item__name', flat=True):
+                counts[name] = counts.get(name, 0) + 1
+        with CaptureQueriesContext(connection) as queries:
+            top = top_requested_items(5)
+        self.assertEqual([row['request_count'] for row in top], sorted(counts.values(), reverse=True)[:5])
+        self.assertEqual({row['item__name']: row['request_count'] for row in top},
+                         {row['item__name']: counts[row['item__name']] for row in top})
+        # Only the archive horizon (an index lookup) reads the archive itself
+        archive_reads = [q['sql'] for q in queries.captured_queries if 'invent_archiveditemrequest' in q['sql']]
+        self.assertEqual(len(archive_reads), 1)
+        self.assertIn('MAX(', archive_reads[0])
+
+    def test_top_items_count_archived_requests(self):
+        self.assertTopItemsCountArchivedRequests()
+        requestor_id = ArchivedItemRequest.objects.values_list('requestor', flat=True).first()
+        User.objects.get(pk=requestor_id).delete()
+        self.assertTopItemsCountArchivedRequests()
+
+    def test_api_lists_archived_rows(self):
+        self.client.force_login(self.clerk)
+        response = self.client.get(reverse('api_v1_requests'), {'fields': 'id', 'limit': 1000})
+        self.assertEqual(len(response.json()['results']),
+                         ItemRequest.objects.count() + ArchivedItemRequest.objects.count())
+
+    def export_rows(self, **params):
+        self.client.force_login(self.clerk)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('export_total_requests'), params)
+            sheet = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True).active
+            rows = list(sheet.iter_rows(min_row=2, values_only=True))
+        archive_reads = [q['sql'] for q in queries.captured_queries if 'invent_archiveditemrequest' in q['sql']]
+        return rows, archive_reads
+
+    def test_exports_only_read_the_archive_when_the_range_reaches_it(self):
+        rows, archive_reads = self.export_rows()
+        self.assertEqual(len(rows), ItemRequest.objects.count() + ArchivedItemRequest.objects.count())
+        self.assertEqual(len(archive_reads), 2)
+
+        start = timezone.localdate() - timedelta(days=30)
+        rows, archive_reads = self.export_rows(start=start.isoformat())
+        self.assertEqual(len(rows), ItemRequest.objects.filter(date_requested__date__gte=start).count())
+        # Just the archive horizon
+        self.assertEqual(len(archive_reads), 1)
+        self.assertIn('MAX(', archive_reads[0])
+
+    def test_request_listing_pages_through_archived_rows(self):
+        self.client.force_login(self.clerk)
+        seen = []
+        url = reverse('total_requests')
+        params = {'status': 'Rejected'}
+        while True:
+            page = self.client.get(url, params).context['page_obj']
+            seen += [row.pk for row in page]
+            if not page.has_next:
+                break
+            params['cursor'] = page.next_cursor
+        self.assertEqual(sorted(seen), sorted(
+            list(ItemRequest.objects.filter(status='Rejected').values_list('pk', flat=True))
+            + list(ArchivedItemRequest.objects.filter(status='Rejected').values_list('pk', flat=True))))
@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from invent.benchdata import bench_users, seed_dataset
+from invent.rollups import rebuild_rollups
+
+REQUESTOR_DASHBOARD_KEYS = [
+    'requests', 'total_requests', 'approved_count', 'pending_count', 'issued_count',
+    'fully_returned_count', 'partially_returned_count', 'available_inventory',
+]
+STORE_CLERK_DASHBOARD_KEYS = [
+    'total_items', 'items_issued', 'items_returned', 'items',
+    'pending_requests_count', 'issued_but_not_fully_returned_count',
+]
+REPORTS_KEYS = [
+    'total_items', 'total_requests', 'pending_count', 'approved_count', 'issued_count',
+    'rejected_count', 'fully_returned_count', 'partially_returned_count',
+    'total_returned_quantity_all_items', 'top_requested_items', 'trend_start', 'trend_end',
+    'trend_rows', 'trend_monthly', 'trend_statuses', 'trends_updated_at',
+]
+
+
+class AsyncViewTests(TransactionTestCase):
+    """
+    The async dashboards and reports render the same context as their sync versions.
+    The async views read in worker threads with connections of their own, which only
+    see committed data, hence TransactionTestCase.
+    """
+
+    def setUp(self):
+        seed_dataset(users=5, items=40, requests=300, adjustments=30, seed=5)
+        rebuild_rollups()
+        self.clerk, self.requestor = bench_users()
+
+    def context_of(self, url_name, keys, params):
+        # Start from an empty cache so the cached reports are computed by each view
+        cache.clear()
+        response = self.client.get(reverse(url_name), params)
+        self.assertEqual(response.status_code, 200)
+        values = {}
+        for key in keys:
+            value = response.context[key]
+            values[key] = list(value) if isinstance(value, QuerySet) else value
+        return response.templates[0].name, values
+
+    def assertSameContext(self, user, sync_name, async_name, keys, **params):
+        self.client.force_login(user)
+        self.assertEqual(self.context_of(sync_name, keys, params),
+                         self.context_of(async_name, keys, params))
+
+    def test_requestor_dashboard(self):
+        self.assertSameContext(self.requestor, 'requestor_dashboard', 'requestor_dashboard_async',
+                               REQUESTOR_DASHBOARD_KEYS)
+
+    def test_store_clerk_dashboard(self):
+        self.assertSameContext(self.clerk, 'store_clerk_dashboard', 'store_clerk_dashboard_async',
+                               STORE_CLERK_DASHBOARD_KEYS)
+
+    def test_reports(self):
+        self.assertSameContext(self.clerk, 'reports', 'reports_async', REPORTS_KEYS,
+                               start='2020-01-01', end='2030-12-31')
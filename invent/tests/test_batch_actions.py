@@ -0,0 +1,97 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from invent import stock
+from invent.models import ItemRequest, OutboxEmail, StockTransaction
+from invent.stock import process_request_batch
+
+from .helpers import CounterAssertions, make_clerk, make_item, make_request, make_requestor
+
+
+class BatchRequestActionTests(CounterAssertions, TestCase):
+    def setUp(self):
+        self.clerk = make_clerk()
+        self.requestor = make_requestor()
+        self.item = make_item(self.clerk, quantity=3)
+        self.client.force_login(self.clerk)
+
+    def post(self, action, request_ids):
+        return self.client.post(reverse('batch_request_action'), {'action': action, 'request_ids': request_ids},
+                                HTTP_ACCEPT='application/json')
+
+    def test_results_per_request(self):
+        pending = make_request(self.item, self.requestor)
+        rejected = make_request(self.item, self.requestor, status='Rejected')
+        response = self.post('approve', [pending.pk, rejected.pk, 999999])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['succeeded'], 1)
+        self.assertEqual([(r['id'], r['ok']) for r in response.json()['results']],
+                         [(pending.pk, True), (rejected.pk, False), (999999, False)])
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, 'Approved')
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+        self.assertCountersMatchSource()
+
+    def test_issue_stops_at_the_available_stock(self):
+        requests = [make_request(self.item, self.requestor, quantity=2, status='Approved') for _ in range(2)]
+        results = self.post('issue', [r.pk for r in requests]).json()['results']
+
+        # First come, first served: 3 units cover the first request only
+        self.assertEqual([r['ok'] for r in results], [True, False])
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity_issued, 2)
+        self.assertCountersMatchSource()
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        # Creates the counter rows the batches below only update
+        self.post('approve', [make_request(self.item, self.requestor).pk])
+        counts = []
+        for size in (2, 20):
+            requests = [make_request(self.item, self.requestor) for _ in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                self.post('approve', [r.pk for r in requests])
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+
+    def process_with_concurrent_change(self, action, request_ids, changed, status):
+        """Runs the batch, with `changed` moved to `status` by someone else after it was read."""
+        claim = stock._claim_requests
+
+        def claim_after_change(candidates, target, now):
+            other_copy = ItemRequest.objects.get(pk=changed.pk)
+            other_copy.status = status
+            other_copy.save()
+            return claim(candidates, target, now)
+
+        with mock.patch('invent.stock._claim_requests', side_effect=claim_after_change):
+            return process_request_batch(request_ids, action, self.clerk)
+
+    def test_requests_changed_meanwhile_are_skipped(self):
+        requests = [make_request(self.item, self.requestor) for _ in range(3)]
+        results = self.process_with_concurrent_change(
+            'approve', [r.pk for r in requests], requests[1], 'Rejected')
+
+        self.assertEqual([(r['ok'], r['status']) for r in results],
+                         [(True, 'Approved'), (False, 'Rejected'), (True, 'Approved')])
+        self.assertEqual(list(ItemRequest.objects.order_by('pk').values_list('status', flat=True)),
+                         ['Approved', 'Rejected', 'Approved'])
+        self.assertCountersMatchSource()
+
+    def test_a_request_cancelled_meanwhile_is_not_issued(self):
+        requests = [make_request(self.item, self.requestor, status='Approved') for _ in range(2)]
+        results = self.process_with_concurrent_change(
+            'issue', [r.pk for r in requests], requests[0], 'Cancelled')
+
+        self.assertEqual([r['ok'] for r in results], [False, True])
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity_issued, 1)
+        self.assertEqual(list(StockTransaction.objects.values_list('item_request', 'quantity')),
+                         [(requests[1].pk, 1)])
+        self.assertCountersMatchSource()
@@ -0,0 +1,36 @@
+from django.test import TestCase
+
+from invent.counters import read_counters
+from invent.models import ItemRequest
+
+from .helpers import CounterAssertions, make_clerk, make_item, make_request, make_requestor
+
+
+class DashboardCounterTests(CounterAssertions, TestCase):
+    def setUp(self):
+        self.clerk = make_clerk()
+        self.requestor = make_requestor()
+        self.item = make_item(self.clerk)
+
+    def test_saves_and_deletes_keep_counters_in_step(self):
+        first = make_request(self.item, self.requestor, quantity=2)
+        second = make_request(self.item, self.requestor)
+        self.assertEqual(read_counters(self.requestor)['pending'], 2)
+
+        first.status = 'Approved'
+        first.save()
+        second.delete()
+        self.item.quantity_total = 25
+        self.item.save()
+
+        counters = read_counters()
+        self.assertEqual((counters['total'], counters['approved'], counters['pending']), (1, 1, 0))
+        self.assertEqual(counters['quantity_total'], 25)
+        self.assertCountersMatchSource()
+
+    def test_queryset_deletes_are_counted(self):
+        for _ in range(3):
+            make_request(self.item, self.requestor)
+        ItemRequest.objects.filter(requestor=self.requestor).delete()
+        self.assertEqual(read_counters()['total'], 0)
+        self.assertCountersMatchSource()
@@ -0,0 +1,44 @@
+from io import BytesIO
+
+from django.test import TestCase
+from django.urls import reverse
+from openpyxl import load_workbook
+
+from invent.benchdata import bench_users, seed_dataset
+from invent.exports import XLSX_CONTENT_TYPE
+from invent.models import InventoryItem, ItemRequest
+
+
+class XlsxExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset(users=5, items=60, requests=500, adjustments=20, seed=11)
+
+    def setUp(self):
+        self.client.force_login(bench_users()[0])
+
+    def download(self, url_name):
+        response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], XLSX_CONTENT_TYPE)
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True)
+        try:
+            return list(workbook.active.iter_rows(values_only=True))
+        finally:
+            workbook.close()
+
+    def test_inventory_export_has_every_item(self):
+        header, *rows = self.download('export_inventory_items')
+        self.assertEqual(header[:2], ('Item ID', 'Item Name'))
+        self.assertEqual([row[0] for row in rows],
+                         list(InventoryItem.objects.order_by('id').values_list('id', flat=True)))
+        item = InventoryItem.objects.get(pk=rows[0][0])
+        self.assertEqual(rows[0][1:3], (item.name, item.serial_number))
+        self.assertEqual(rows[0][9], item.quantity_remaining())
+
+    def test_request_export_has_every_request(self):
+        header, *rows = self.download('export_total_requests')
+        self.assertEqual(header[0], 'Requested By')
+        self.assertEqual(len(rows), ItemRequest.objects.count())
+        self.assertEqual(sorted(row[5] for row in rows),
+                         sorted(ItemRequest.objects.values_list('status', flat=True)))
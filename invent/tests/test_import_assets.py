@@ -0,0 +1,61 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from invent.models import InventoryItem
+
+from .helpers import make_clerk, make_item
+
+CSV_HEADER = "Asset Description,Serial Number,Asset Category-Minor,Condition\n"
+
+
+class ImportAssetsSyncTests(TestCase):
+    def setUp(self):
+        self.clerk = make_clerk()
+        make_item(self.clerk, name='HP LaserJet', serial_number='SN-1', category='Printer', condition='Good')
+        make_item(self.clerk, name='Dell Optiplex', serial_number='SN-2', category='CPU', condition='Good')
+
+    def write_csv(self, rows):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as csv_file:
+            csv_file.write(CSV_HEADER + ''.join(f"{row}\n" for row in rows))
+        self.addCleanup(os.remove, csv_file.name)
+        return csv_file.name
+
+    def sync(self, path, **options):
+        output = StringIO()
+        call_command('import_assets', path, mode='sync', created_by_username=self.clerk.username,
+                     stdout=output, **options)
+        return output.getvalue()
+
+    def csv_rows(self):
+        return self.write_csv([
+            "HP LaserJet,SN-1,Printer,Good",              # unchanged
+            "Dell Optiplex 7010,SN-2,CPU,Fair",           # renamed and condition changed
+            "Epson EcoTank,SN-3,Printer,Not a condition",  # new, condition defaults
+            "Epson again,SN-3,Printer,Good",              # duplicate serial, skipped
+            ",SN-4,Printer,Good",                         # no description, skipped
+        ])
+
+    def test_dry_run_reports_the_diff_without_writing(self):
+        output = self.sync(self.csv_rows(), dry_run=True, verbosity=2)
+
+        self.assertIn("Create 'Epson EcoTank' (S/N: SN-3)", output)
+        self.assertIn("Update S/N 'SN-2': name, condition", output)
+        self.assertIn("Dry run complete (no changes written). Rows: 5, created: 1, updated: 1, "
+                      "unchanged: 1, skipped: 2.", output)
+        self.assertFalse(InventoryItem.objects.filter(serial_number='SN-3').exists())
+        self.assertEqual(InventoryItem.objects.get(serial_number='SN-2').name, 'Dell Optiplex')
+
+    def test_sync_applies_the_diff(self):
+        output = self.sync(self.csv_rows(), batch_size=2)
+
+        self.assertIn("Rows: 5, created: 1, updated: 1, unchanged: 1, skipped: 2.", output)
+        updated = InventoryItem.objects.get(serial_number='SN-2')
+        self.assertEqual((updated.name, updated.condition), ('Dell Optiplex 7010', 'Fair'))
+        created = InventoryItem.objects.get(serial_number='SN-3')
+        self.assertEqual((created.name, created.condition, created.quantity_total), ('Epson EcoTank', 'Serviceable', 1))
+        # A second run finds nothing left to do
+        self.assertIn("created: 0, updated: 0, unchanged: 3", self.sync(self.csv_rows()))
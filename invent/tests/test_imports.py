@@ -0,0 +1,74 @@
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from openpyxl import Workbook
+
+from invent.imports import UPLOAD_COLUMNS, import_inventory_workbook
+from invent.models import InventoryItem
+
+from .helpers import make_clerk, make_item
+
+
+def workbook_bytes(rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(UPLOAD_COLUMNS)
+    for row in rows:
+        sheet.append(row)
+    output = BytesIO()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+class InventoryImportTests(TestCase):
+    def setUp(self):
+        self.clerk = make_clerk()
+        make_item(self.clerk, name='Existing printer', serial_number='EXIST-1')
+
+    def test_reports_every_rejected_row(self):
+        report = import_inventory_workbook(workbook_bytes([
+            ['HP LaserJet', 'SN-1', 'Printer', 'Good', 'In Stock', 5, 0, 0],
+            ['', 'SN-2', 'Printer', 'Good', 'In Stock', 1, 0, 0],
+            ['Dell Optiplex', 'SN-3', 'CPU', 'Sparkling', 'In Stock', 1, 0, 0],
+            ['Dell Optiplex', 'SN-4', 'CPU', 'Good', 'In Stock', 1, 2, 0],
+            ['Dell Optiplex', 'SN-5', 'CPU', 'Good', 'In Stock', 'lots', 0, 0],
+            ['Lenovo', '', 'CPU', '', '', 3, 0, 0],
+        ]), created_by=self.clerk)
+
+        self.assertEqual((report.created_count, report.skipped_count), (2, 4))
+        self.assertEqual([row for row, _, _ in report.errors], [3, 4, 5, 6])
+        self.assertIn("name is required", report.errors[0][2])
+        self.assertIn("Unknown condition 'Sparkling'", report.errors[1][2])
+        self.assertIn("cannot be greater than total", report.errors[2][2])
+        self.assertIn("whole number", report.errors[3][2])
+        lenovo = InventoryItem.objects.get(name='Lenovo')
+        self.assertEqual((lenovo.serial_number, lenovo.condition, lenovo.status), (None, 'Serviceable', 'In Stock'))
+
+    def test_rejects_duplicate_serials(self):
+        report = import_inventory_workbook(workbook_bytes([
+            ['Copier', 'EXIST-1', 'Printer', 'Good', 'In Stock', 1, 0, 0],
+            ['Scanner', 'SN-9', 'Scanner', 'Good', 'In Stock', 1, 0, 0],
+            ['Scanner again', 'SN-9', 'Scanner', 'Good', 'In Stock', 1, 0, 0],
+        ]), created_by=self.clerk)
+
+        self.assertEqual(report.created_count, 1)
+        self.assertEqual([(row, name) for row, name, _ in report.errors], [(2, 'Copier'), (4, 'Scanner again')])
+        self.assertIn("already exists", report.errors[0][2])
+        self.assertIn("more than once", report.errors[1][2])
+        self.assertEqual(InventoryItem.objects.filter(serial_number='SN-9').count(), 1)
+
+    def test_upload_page_shows_the_report(self):
+        self.client.force_login(self.clerk)
+        upload = SimpleUploadedFile('items.xlsx', workbook_bytes([
+            ['Copier', 'EXIST-1', 'Printer', 'Good', 'In Stock', 1, 0, 0],
+            ['Scanner', 'SN-9', 'Scanner', 'Good', 'In Stock', 1, 0, 0],
+        ]).read())
+        response = self.client.post(reverse('upload_inventory'), {'excel_file': upload})
+
+        self.assertEqual(response.status_code, 200)
+        report = response.context['import_report']
+        self.assertEqual((report.created_count, report.skipped_count), (1, 1))
+        self.assertContains(response, "already exists")
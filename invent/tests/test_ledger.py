@@ -0,0 +1,83 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+
+from invent.imports import import_inventory_workbook
+from invent.ledger import reconcile
+from invent.models import InventoryItem, StockOpeningBalance
+from invent.stock import issue_stock
+
+from .helpers import make_clerk, make_item
+from .test_imports import workbook_bytes
+
+
+class ReconcileTests(TestCase):
+    def setUp(self):
+        self.clerk = make_clerk()
+
+    def assertNoDrift(self):
+        for options in ({}, {'full': True}):
+            self.assertEqual(reconcile(checkpoint=False, **options)['mismatches'], [])
+
+    def test_items_created_in_the_stock_view_reconcile(self):
+        self.client.force_login(self.clerk)
+        self.client.post(reverse('manage_stock'), {
+            'name': 'HP ProBook', 'category': 'Laptop', 'condition': 'Good', 'status': 'In Stock',
+            'serial_number': 'PB-1', 'quantity_total': 12, 'quantity_issued': 2, 'quantity_returned': 1,
+        })
+        item = InventoryItem.objects.get(serial_number='PB-1')
+        self.assertEqual((item.quantity_total, item.quantity_issued), (12, 2))
+        issue_stock(item, 3, self.clerk)
+        self.assertNoDrift()
+
+    def test_imported_items_reconcile(self):
+        report = import_inventory_workbook(workbook_bytes([
+            ['Monitor', 'MON-1', 'Display', 'Good', 'In Stock', 8, 3, 1],
+            ['Keyboard', None, 'Accessories', None, None, 40, None, None],
+        ]), self.clerk)
+        self.assertEqual(report.created_count, 2)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as csv_file:
+            csv_file.write("Asset Description,Serial Number,Asset Category-Minor,Condition\n"
+                           "Scanner,SC-1,Printer,Good\nRouter,RT-1,Network,Good\n")
+        self.addCleanup(os.remove, csv_file.name)
+        for mode, serial in (('create', 'SC-1'), ('sync', 'RT-1')):
+            call_command('import_assets', csv_file.name, mode=mode, created_by_username='clerk', stdout=StringIO())
+            self.assertTrue(InventoryItem.objects.filter(serial_number=serial).exists())
+
+        self.assertEqual(InventoryItem.objects.count(), 4)
+        self.assertNoDrift()
+
+    def test_fix_corrects_drift_from_the_opening_balance(self):
+        item = make_item(self.clerk, quantity=10)
+        issue_stock(item, 4, self.clerk)
+        InventoryItem.objects.filter(pk=item.pk).update(quantity_issued=9)
+
+        summary = reconcile(fix=True)
+        self.assertEqual([(m['item_id'], m['fixed']) for m in summary['mismatches']], [(item.pk, True)])
+        item.refresh_from_db()
+        self.assertEqual((item.quantity_total, item.quantity_issued), (10, 4))
+        self.assertNoDrift()
+
+    def test_fix_leaves_items_without_any_history_alone(self):
+        item = make_item(self.clerk, quantity=10)
+        # As if it was created before opening balances were recorded
+        StockOpeningBalance.objects.filter(item=item).delete()
+
+        summary = reconcile(fix=True)
+        self.assertEqual(len(summary['mismatches']), 1)
+        self.assertFalse(summary['mismatches'][0]['fixed'])
+        self.assertEqual(summary['mismatches'][0]['reason'], "the item has no ledger history or checkpoint")
+        item.refresh_from_db()
+        self.assertEqual(item.quantity_total, 10)
+
+        with self.assertRaisesMessage(CommandError, "1 item(s) do not match the ledger."):
+            call_command('reconcile_stock', fix=True, stdout=StringIO())
+        # --baseline accepts the stored quantities instead
+        call_command('reconcile_stock', baseline=True, stdout=StringIO())
+        self.assertEqual(reconcile()['mismatches'], [])
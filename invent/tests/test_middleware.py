@@ -0,0 +1,43 @@
+import json
+import re
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .helpers import make_clerk, make_item
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        self.clerk = make_clerk()
+        make_item(self.clerk)
+        self.client.force_login(self.clerk)
+
+    def test_no_header_when_instrumentation_is_off(self):
+        response = self.client.get(reverse('inventory_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(PERF_INSTRUMENTATION=True)
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('inventory_list'))
+        # Metrics are comma separated, but a description may contain a comma too
+        metrics = {part.split(';')[0]: part for part in re.split(r', (?=\w+;)', response['Server-Timing'])}
+        self.assertEqual(set(metrics), {'total', 'sql', 'tpl', 'mail', 'cache'})
+        self.assertRegex(metrics['sql'], r'^sql;dur=[\d.]+;desc="[1-9]\d* queries"$')
+        self.assertRegex(metrics['mail'], r'^mail;dur=[\d.]+;desc="0 emails"$')
+        self.assertRegex(metrics['cache'], r'^cache;desc="\d+ hits, \d+ misses"$')
+
+    @override_settings(PERF_INSTRUMENTATION=True, PERF_SLOW_REQUEST_MS=0, PERF_EXPLAIN_SLOWEST=1)
+    def test_slow_requests_are_logged_with_their_slowest_query(self):
+        with self.assertLogs('invent.perf', 'WARNING') as logs:
+            self.client.get(reverse('inventory_list'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['event'], record['path'], record['status'], record['user']),
+                         ('slow_request', reverse('inventory_list'), 200, 'clerk'))
+        self.assertEqual(len(record['slowest_queries']), 1)
+
+    @override_settings(PERF_INSTRUMENTATION=True)
+    def test_fast_requests_are_not_logged(self):
+        with self.assertNoLogs('invent.perf', 'WARNING'):
+            self.client.get(reverse('inventory_list'))
@@ -0,0 +1,58 @@
+from datetime import timedelta
+from smtplib import SMTPException
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase
+from django.utils import timezone
+
+from invent.models import OutboxEmail
+from invent.notifications import BASE_BACKOFF, claim_due, deliver_outbox, queue_email
+
+
+class FailingEmailBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise SMTPException("Mail server said no")
+
+
+class OutboxTests(TestCase):
+    def test_sends_due_emails(self):
+        queue_email("Approved", "Your request was approved.", ['requestor@example.com'])
+        self.assertEqual(deliver_outbox(), (1, 0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(OutboxEmail.objects.get().status, 'Sent')
+
+    def test_failures_are_retried_with_backoff_then_given_up(self):
+        email = queue_email("Approved", "Your request was approved.", ['requestor@example.com'])
+        before = timezone.now()
+        self.assertEqual(deliver_outbox(max_attempts=2, connection=FailingEmailBackend()), (0, 1, 0))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('Pending', 1))
+        self.assertGreaterEqual(email.next_attempt_at, before + BASE_BACKOFF)
+        # Not due yet
+        self.assertEqual(deliver_outbox(max_attempts=2, connection=FailingEmailBackend()), (0, 0, 0))
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_outbox(max_attempts=2, connection=FailingEmailBackend()), (0, 0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('Failed', 2))
+
+    def test_overlapping_runs_claim_different_emails(self):
+        for i in range(5):
+            queue_email(f"Notice {i}", "Body", ['requestor@example.com'])
+        now = timezone.now()
+        first = {email.pk for email in claim_due(3, now)}
+        second = {email.pk for email in claim_due(3, now)}
+        self.assertEqual((len(first), len(second)), (3, 2))
+        self.assertFalse(first & second)
+        self.assertEqual(deliver_outbox(), (0, 0, 0))
+
+    def test_expired_claims_are_sent_by_a_later_run(self):
+        queue_email("Approved", "Your request was approved.", ['requestor@example.com'])
+        claim_due(10, timezone.now())
+        # The run that claimed it died; its claim runs out
+        OutboxEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(deliver_outbox(), (1, 0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from invent.models import ArchivedItemRequest, InventoryItem, ItemRequest
+from invent.pagination import keyset_paginate
+
+from .helpers import make_clerk, make_item, make_requestor
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        clerk = make_clerk()
+        # Only four distinct names, so most pages start and end inside a run of ties
+        for i in range(23):
+            make_item(clerk, name=f'Model {i % 4}')
+
+    def walk(self, queryset, ordering, per_page, **kwargs):
+        """Pages forward to the end, then back to the start; returns the ids seen each way."""
+        forward = []
+        page = keyset_paginate(queryset, ordering, per_page=per_page, count=None, **kwargs)
+        while True:
+            forward += [row.pk for row in page]
+            if not page.has_next:
+                break
+            page = keyset_paginate(queryset, ordering, cursor=page.next_cursor, per_page=per_page,
+                                   count=None, **kwargs)
+
+        backward = [row.pk for row in page]
+        while page.has_previous:
+            page = keyset_paginate(queryset, ordering, cursor=page.previous_cursor, per_page=per_page,
+                                   count=None, **kwargs)
+            backward = [row.pk for row in page] + backward
+        return forward, backward
+
+    def test_walking_forward_and_back_returns_each_row_once_despite_ties(self):
+        queryset = InventoryItem.objects.all()
+        expected = list(queryset.order_by('name', 'id').values_list('id', flat=True))
+        for per_page in (1, 4, 5, 50):
+            forward, backward = self.walk(queryset, ['name', 'id'], per_page)
+            self.assertEqual(forward, expected)
+            self.assertEqual(backward, expected)
+
+    def test_descending_order_with_merged_archive(self):
+        requestor = make_requestor()
+        item = InventoryItem.objects.first()
+        when = timezone.now() - timedelta(days=10)
+        for i in range(14):
+            # Pairs of rows share a timestamp, some of them split between the live and archive tables
+            date_requested = when + timedelta(hours=i // 2)
+            if i % 3:
+                live = ItemRequest.objects.create(item=item, name=item.name, requestor=requestor)
+                # date_requested is auto_now_add, so backdate it afterwards
+                ItemRequest.objects.filter(pk=live.pk).update(date_requested=date_requested)
+            else:
+                ArchivedItemRequest.objects.create(
+                    id=1000 + i, item=item, name=item.name, requestor=requestor,
+                    status='Fully Returned', date_requested=date_requested)
+
+        merge = [ArchivedItemRequest.objects.all()]
+        everything = sorted(
+            [(row.date_requested, row.pk) for row in ItemRequest.objects.all()]
+            + [(row.date_requested, row.pk) for row in ArchivedItemRequest.objects.all()],
+            reverse=True)
+        expected = [pk for _, pk in everything]
+        for per_page in (1, 3, 4):
+            forward, backward = self.walk(ItemRequest.objects.all(), ['-date_requested', '-id'],
+                                          per_page, merge=merge)
+            self.assertEqual(forward, expected)
+            self.assertEqual(backward, expected)
+
+    def test_invalid_cursor_falls_back_to_the_first_page(self):
+        first = keyset_paginate(InventoryItem.objects.all(), ['name', 'id'], per_page=5)
+        garbled = keyset_paginate(InventoryItem.objects.all(), ['name', 'id'], cursor='not-a-cursor',
+                                  per_page=5)
+        self.assertEqual(list(garbled), list(first))
+        self.assertFalse(garbled.has_previous)
+        self.assertEqual(garbled.total_count, 23)
@@ -0,0 +1,30 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from invent.benchdata import QUERY_BUDGETS, VIEW_PROBES, bench_users, seed_dataset
+
+
+class QueryBudgetTests(TestCase):
+    """Pins the number of queries of every probed page against a few thousand rows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset(users=20, items=200, requests=3000, adjustments=300, seed=1)
+
+    def setUp(self):
+        clerk, requestor = bench_users()
+        self.clients = {'clerk': self.client_class(), 'requestor': self.client_class()}
+        self.clients['clerk'].force_login(clerk)
+        self.clients['requestor'].force_login(requestor)
+
+    def test_pages_stay_within_their_query_budgets(self):
+        for url_name, kwargs, role, query_string in VIEW_PROBES:
+            url = reverse(url_name, kwargs=kwargs) + (f'?{query_string}' if query_string else '')
+            with self.subTest(url=url, role=role):
+                # Unmeasured first, so one-off per-process work isn't charged to the page
+                self.clients[role].get(url)
+                cache.clear()
+                with self.assertNumQueries(QUERY_BUDGETS[(url_name, query_string)]):
+                    response = self.clients[role].get(url)
+                self.assertEqual(response.status_code, 200)
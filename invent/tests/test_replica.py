@@ -0,0 +1,23 @@
+from django.contrib.auth.models import Permission, User
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sessions.models import Session
+from django.test import TestCase
+
+from invent.models import DashboardCounter, ItemRequest
+from invent.replica import REPLICA_ALIAS, ReplicaRouter, _use_replica
+
+
+class ReplicaRouterTests(TestCase):
+    def test_only_app_reads_go_to_the_replica(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(ItemRequest), 'default')
+        token = _use_replica.set(True)
+        try:
+            self.assertEqual(router.db_for_read(ItemRequest), REPLICA_ALIAS)
+            self.assertEqual(router.db_for_read(DashboardCounter), REPLICA_ALIAS)
+            for model in (User, Permission, ContentType, Session):
+                with self.subTest(model=model.__name__):
+                    self.assertEqual(router.db_for_read(model), 'default')
+            self.assertEqual(router.db_for_write(ItemRequest), 'default')
+        finally:
+            _use_replica.reset(token)
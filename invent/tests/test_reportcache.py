@@ -0,0 +1,61 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from invent.models import InventoryItem
+from invent.reportcache import cached_report, current_generation
+
+from .helpers import make_clerk, make_item
+
+
+class ReportCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.clerk = make_clerk()
+        self.item = make_item(self.clerk, name='HP LaserJet', serial_number='SN-1', category='Printer')
+        self.computed = 0
+
+    def report(self):
+        def compute():
+            self.computed += 1
+            return InventoryItem.objects.count()
+        return cached_report('items', compute, 'all')
+
+    def test_reports_are_computed_once_per_generation(self):
+        self.assertEqual((self.report(), self.report()), (1, 1))
+        self.assertEqual(self.computed, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_item(self.clerk, name='Dell Optiplex')
+        self.assertEqual(self.report(), 2)
+        self.assertEqual(self.computed, 2)
+
+    def test_the_generation_only_moves_on_commit(self):
+        generation = current_generation()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.item.name = 'Renamed'
+            self.item.save()
+        self.assertEqual(current_generation(), generation)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(current_generation(), generation)
+
+    def test_a_sync_import_invalidates_cached_reports(self):
+        self.report()
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as csv_file:
+            csv_file.write("Asset Description,Serial Number,Asset Category-Minor,Condition\n"
+                           "Renamed by import,SN-1,Printer,Serviceable\n")
+        self.addCleanup(os.remove, csv_file.name)
+
+        generation = current_generation()
+        # Only renames an existing item, through bulk_update()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_assets', csv_file.name, mode='sync',
+                         created_by_username=self.clerk.username, stdout=StringIO())
+        self.assertNotEqual(current_generation(), generation)
+        self.report()
+        self.assertEqual(self.computed, 2)
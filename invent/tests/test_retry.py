@@ -0,0 +1,55 @@
+from unittest import mock
+
+from django.db import OperationalError, transaction
+from django.test import TransactionTestCase
+
+from invent.retry import retry_on_lock
+
+
+class RetryOnLockTests(TransactionTestCase):
+    """TestCase would wrap every test in a transaction, which turns retrying off."""
+
+    def setUp(self):
+        patcher = mock.patch('invent.retry.time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def flaky(self, errors, attempts=4):
+        """A view that raises each of `errors` in turn, then returns 'done'."""
+        errors = list(errors)
+        calls = []
+
+        @retry_on_lock(attempts=attempts)
+        def view():
+            calls.append(1)
+            if errors:
+                raise errors.pop(0)
+            return 'done'
+        return view, calls
+
+    def test_retries_database_is_locked(self):
+        view, calls = self.flaky([OperationalError('database is locked')] * 2)
+        with self.assertLogs('invent.retry', 'INFO'):
+            self.assertEqual(view(), 'done')
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(self.sleep.call_count, 2)
+
+    def test_gives_up_after_the_last_attempt(self):
+        view, calls = self.flaky([OperationalError('database is locked')] * 5, attempts=3)
+        with self.assertRaisesMessage(OperationalError, 'database is locked'), self.assertLogs('invent.retry'):
+            view()
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors_are_not_retried(self):
+        view, calls = self.flaky([OperationalError('no such table: invent_widget')])
+        with self.assertRaises(OperationalError):
+            view()
+        self.assertEqual(len(calls), 1)
+        self.sleep.assert_not_called()
+
+    def test_not_retried_inside_an_atomic_block(self):
+        view, calls = self.flaky([OperationalError('database is locked')])
+        with self.assertRaises(OperationalError), transaction.atomic():
+            view()
+        self.assertEqual(len(calls), 1)
+        self.sleep.assert_not_called()
@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.test import TestCase
+from django.utils import timezone
+
+from invent.benchdata import seed_dataset
+from invent.models import DailyRequestRollup, ItemRequest, StockTransaction
+from invent.rollups import REQUEST_STATUSES, TRANSACTION_COLUMNS, rebuild_rollups, roll_up, trends
+from invent.stock import issue_request, issue_stock
+
+from .helpers import make_clerk, make_item, make_request, make_requestor
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.clerk = make_clerk()
+        self.requestor = make_requestor()
+        self.item = make_item(self.clerk, quantity=20)
+        self.today = timezone.localdate()
+
+    def request_counts(self):
+        return dict(DailyRequestRollup.objects.filter(date=self.today).values_list('status', 'count'))
+
+    def test_roll_up_only_reads_what_is_new(self):
+        pending = make_request(self.item, self.requestor, quantity=2)
+        pending.status = 'Approved'
+        pending.save()
+        issue_request(pending, self.clerk)
+        self.assertEqual(roll_up(), (1, 3))
+        self.assertEqual(roll_up(), (0, 0))
+
+        issue_stock(self.item, 4, self.clerk)
+        make_request(self.item, self.requestor)
+        self.assertEqual(roll_up(), (1, 1))
+
+        rows, _ = trends(self.today, self.today)
+        self.assertEqual(rows[0]['quantity_issued'], 6)
+        self.assertEqual(self.request_counts(), {'Pending': 2, 'Approved': 1, 'Issued': 1})
+
+    def test_rebuild_keeps_status_changes_not_rolled_up_yet(self):
+        first, second = make_request(self.item, self.requestor), make_request(self.item, self.requestor)
+        roll_up()
+        first.status = 'Rejected'
+        first.save()
+        second.status = 'Approved'
+        second.save()
+
+        rebuild_rollups()
+        # Submissions come from the request rows, so they are not counted twice
+        self.assertEqual(self.request_counts(), {'Pending': 2, 'Rejected': 1, 'Approved': 1})
+
+
+class TrendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset(users=5, items=30, requests=400, adjustments=60, days=200, seed=7)
+
+    def direct_totals(self, start, end):
+        """Per day: the ledger quantities per rollup column, and submissions/issues per status."""
+        totals = {}
+
+        def day(key):
+            return totals.setdefault(key, {'requests': [0] * len(REQUEST_STATUSES),
+                                           **dict.fromkeys(TRANSACTION_COLUMNS.values(), 0)})
+
+        ledger = (StockTransaction.objects.annotate(day=TruncDate('transaction_date'))
+                  .filter(day__range=(start, end)).order_by()
+                  .values('day', 'transaction_type').annotate(quantity=Sum('quantity')))
+        for row in ledger:
+            day(row['day'])[TRANSACTION_COLUMNS[row['transaction_type']]] += row['quantity']
+        for status, field in (('Pending', 'date_requested'), ('Issued', 'date_issued')):
+            counts = (ItemRequest.objects.annotate(day=TruncDate(field)).filter(day__range=(start, end))
+                      .order_by().values('day').annotate(count=Count('id')))
+            for row in counts:
+                day(row['day'])['requests'][REQUEST_STATUSES.index(status)] += row['count']
+        return [{'period': key, **totals[key]} for key in sorted(totals)]
+
+    def test_trends_match_a_direct_aggregate(self):
+        rebuild_rollups()
+        end = timezone.localdate()
+        for days in (7, 60):
+            start = end - timedelta(days=days - 1)
+            rows, monthly = trends(start, end)
+            self.assertFalse(monthly)
+            self.assertEqual(rows, self.direct_totals(start, end))
+
+    def test_long_ranges_are_totalled_per_month(self):
+        rebuild_rollups()
+        # Some synthetic issues are dated a few days ahead
+        end = timezone.localdate() + timedelta(days=5)
+        rows, monthly = trends(end - timedelta(days=210), end)
+        self.assertTrue(monthly)
+        self.assertTrue(all(row['period'].day == 1 for row in rows))
+        self.assertEqual(sum(row['quantity_issued'] for row in rows),
+                         StockTransaction.objects.filter(transaction_type='Issue').aggregate(
+                             total=Sum('quantity'))['total'])
@@ -0,0 +1,68 @@
+from django.test import TestCase
+
+from invent.models import InventoryItem
+from invent.search import fts_available, install_search_index, search_inventory
+
+from .helpers import make_clerk, make_item
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        clerk = make_clerk()
+        make_item(clerk, name='HP EliteBook 840', serial_number='5CG1234XYZ', category='Laptop')
+        make_item(clerk, name='Patch cable', serial_number='ABC-123', category='Accessories')
+        make_item(clerk, name='Dell Optiplex 7010', serial_number='MXL9876', category='Desktop')
+        make_item(clerk, name='Dell Latitude 5420', serial_number='7XQ4455', category='Laptop')
+
+    def search(self, text, **kwargs):
+        return sorted(search_inventory(InventoryItem.objects.all(), text, **kwargs)
+                      .values_list('name', flat=True))
+
+    def assertSameAsIcontains(self, text, expected):
+        for ranked in (False, True):
+            self.assertEqual(self.search(text, ranked=ranked), expected)
+
+    def test_uses_the_search_index(self):
+        self.assertTrue(fts_available())
+
+    def test_prefix_matches(self):
+        self.assertSameAsIcontains('5CG12', ['HP EliteBook 840'])
+        self.assertSameAsIcontains('dell', ['Dell Latitude 5420', 'Dell Optiplex 7010'])
+
+    def test_infix_matches(self):
+        self.assertSameAsIcontains('1234', ['HP EliteBook 840'])
+        self.assertSameAsIcontains('BC-12', ['Patch cable'])
+        self.assertSameAsIcontains('plex 70', ['Dell Optiplex 7010'])
+        self.assertSameAsIcontains('cable', ['Patch cable'])
+
+    def test_serial_number_matches(self):
+        self.assertSameAsIcontains('mxl9876', ['Dell Optiplex 7010'])
+        self.assertSameAsIcontains('4455', ['Dell Latitude 5420'])
+
+    def test_short_terms_fall_back_to_icontains(self):
+        self.assertSameAsIcontains('XQ', ['Dell Latitude 5420'])
+        self.assertSameAsIcontains('84', ['HP EliteBook 840'])
+
+    def test_operators_are_matched_literally(self):
+        self.assertSameAsIcontains('Dell OR Patch', [])
+        self.assertSameAsIcontains('"cable', [])
+
+    def test_ranked_search_is_ordered_by_rank(self):
+        ranks = [item.search_rank for item in
+                 search_inventory(InventoryItem.objects.all(), 'laptop', ranked=True)]
+        self.assertEqual(len(ranks), 2)
+        self.assertEqual(ranks, sorted(ranks))
+
+    def test_index_follows_updates_and_deletes(self):
+        item = InventoryItem.objects.get(serial_number='ABC-123')
+        item.serial_number = 'ZZZ-999'
+        item.save()
+        self.assertSameAsIcontains('BC-12', [])
+        self.assertSameAsIcontains('ZZ-99', ['Patch cable'])
+        item.delete()
+        self.assertSameAsIcontains('ZZ-99', [])
+
+    def test_rebuild_keeps_results(self):
+        self.assertTrue(install_search_index(rebuild=True))
+        self.assertSameAsIcontains('1234', ['HP EliteBook 840'])
@@ -0,0 +1,41 @@
+from django.test import TestCase
+
+from invent.models import ItemRequest, StockTransaction
+from invent.stock import InsufficientStock, RequestNotIssuable, issue_request, issue_stock
+
+from .helpers import CounterAssertions, make_clerk, make_item, make_request, make_requestor
+
+
+class IssueStockTests(CounterAssertions, TestCase):
+    def setUp(self):
+        self.clerk = make_clerk()
+        self.requestor = make_requestor()
+        self.item = make_item(self.clerk, quantity=5)
+
+    def test_issuing_more_than_is_available_changes_nothing(self):
+        with self.assertRaises(InsufficientStock) as raised:
+            issue_stock(self.item, 6, self.clerk)
+        self.assertEqual(raised.exception.shortfall, 1)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity_issued, 0)
+        self.assertFalse(StockTransaction.objects.exists())
+
+    def test_issuing_the_last_units(self):
+        issue_stock(self.item, 5, self.clerk)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity_available, 0)
+        self.assertCountersMatchSource()
+
+    def test_a_request_is_issued_once(self):
+        approved = make_request(self.item, self.requestor, quantity=2, status='Approved')
+        stale_copy = ItemRequest.objects.get(pk=approved.pk)
+        issue_request(approved, self.clerk)
+        with self.assertRaises(RequestNotIssuable):
+            issue_request(stale_copy, self.clerk)
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity_issued, 2)
+        self.assertEqual(StockTransaction.objects.filter(item_request=approved).count(), 1)
+        self.assertCountersMatchSource()
+
+
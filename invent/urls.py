@@ -1,4 +1,4 @@
-from . import views
+from . import api, views
 from django.urls import path
 
 urlpatterns = [
@@ -26,6 +26,7 @@ urlpatterns = [
 
     # NEW Functionalities (Issue and Adjust)
     path('issue-item/', views.issue_item, name='issue_item'),
+    path('issue-item/batch/', views.batch_request_action, name='batch_request_action'),
     path('adjust_stock/', views.adjust_stock, name='adjust_stock'),
     path('upload-inventory/', views.upload_inventory, name='upload_inventory'),
 
@@ -42,4 +43,16 @@ urlpatterns = [
     path('reports/total-requests/', views.total_requests, name='total_requests'),
     path('reports/export/total-requests/',
          views.export_total_requests, name='export_total_requests'),
+
+    # Async variants of the dashboards and reports, for ASGI deployments (see bench_asgi)
+    path('async/', views.requestor_dashboard_async, name='requestor_dashboard_async'),
+    path('async/store_clerk_dashboard/', views.store_clerk_dashboard_async,
+         name='store_clerk_dashboard_async'),
+    path('async/reports/', views.reports_view_async, name='reports_async'),
+
+    # Read-only JSON API (see api.py)
+    path('api/v1/items/', api.items, name='api_v1_items'),
+    path('api/v1/requests/', api.item_requests, name='api_v1_requests'),
+    path('api/v1/transactions/', api.stock_transactions, name='api_v1_transactions'),
+    path('api/v1/changes/', api.changes, name='api_v1_changes'),
 ]
\ No newline at end of file
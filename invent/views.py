@@ -1,5 +1,4 @@
 from django.db.models import Q
-from django.core.mail import send_mail
 from django.shortcuts import render, redirect, get_object_or_404
 # Removed UserCreationForm, assuming CustomCreationForm is used
 from django.contrib.auth.forms import AuthenticationForm
@@ -9,9 +8,14 @@ from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
 from django.db.models import Sum, F, Count, Q
 from django.db import transaction
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_POST
 from django.utils import timezone
+import asyncio
 import json
+from datetime import date, datetime, time, timedelta
+from functools import partial
+from asgiref.sync import sync_to_async
 from django.utils.safestring import mark_safe
 
 # Correct Model and Form Imports
@@ -22,14 +26,24 @@ from .forms import IssueItemForm
 from .forms import AdjustStockForm
 # Import the new forms for return logic
 from .forms import ReturnItemForm, SelectRequestForReturnForm  # NEW
+from .archive import archived_requests, top_requested_items
+from .asyncreads import fetch_all, gather_reads, read_in_thread
+from .exports import xlsx_streaming_response, EXPORT_CHUNK_SIZE
+from .imports import import_inventory_workbook
+from .stats import STATUS_KEYS, status_breakdown
+from .counters import read_counters
+from .notifications import queue_email
+from .pagination import keyset_paginate, count_cache_key
+from .reportcache import acached_report, cached_report
+from .replica import reads_from_replica
+from .retry import is_transient_lock_error, retry_on_lock
+from .rollups import REQUEST_STATUSES, last_rolled_up, trend_range, trends
+from .search import search_inventory
+from .stock import (BATCH_ACTIONS, InsufficientStock, StockError, issue_request, issue_stock,
+                    process_request_batch)
 
-import openpyxl
-from openpyxl import Workbook
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
 from django.contrib.auth.models import Group
 from django.contrib import messages
-from django.core.paginator import Paginator
 
 
 def register(request):
@@ -74,56 +88,66 @@ def logout_view(request):
 @login_required
 def requestor_dashboard(request):
     user_requests = ItemRequest.objects.filter(
-        requestor=request.user).order_by('-date_requested')
+        requestor=request.user).select_related('item').order_by('-date_requested')
 
     # Fetch available inventory items for the requestor
-    # Only show items with a quantity remaining > 0
-    available_inventory = [item for item in InventoryItem.objects.all().order_by(
-        'name') if item.quantity_remaining() > 0]
-
-    total_requests = user_requests.count()
-    approved_count = user_requests.filter(status='Approved').count()
-    pending_count = user_requests.filter(status='Pending').count()
-    # ADDED: Count issued and returned requests for requestor dashboard
-    issued_count = user_requests.filter(status='Issued').count()
-    fully_returned_count = user_requests.filter(
-        status='Fully Returned').count()
-    partially_returned_count = user_requests.filter(
-        status='Partially Returned').count()
+    # Only show items with a quantity remaining > 0 (filtered in the database, evaluated lazily)
+    available_inventory = InventoryItem.objects.available().order_by('name')
+
+    # All status counts come from this user's pre-computed dashboard counters
+    summary = read_counters(requestor=request.user)
 
     return render(request, 'invent/requestor_dashboard.html', {
         'requests': user_requests,
-        'total_requests': total_requests,
-        'approved_count': approved_count,
-        'pending_count': pending_count,
-        'issued_count': issued_count,  # NEW
-        'fully_returned_count': fully_returned_count,  # NEW
-        'partially_returned_count': partially_returned_count,  # NEW
+        'total_requests': summary['total'],
+        'approved_count': summary['approved'],
+        'pending_count': summary['pending'],
+        'issued_count': summary['issued'],  # NEW
+        'fully_returned_count': summary['fully_returned'],  # NEW
+        'partially_returned_count': summary['partially_returned'],  # NEW
         # Pass available inventory (though not directly used by default dashboard content, good to have)
         'available_inventory': available_inventory,
     })
 
 
 @login_required
+async def requestor_dashboard_async(request):
+    """requestor_dashboard as an async view: the request list and the counters are read at the same time."""
+    # Hand the templates the same User object, so it isn't loaded a second time
+    request.user = user = await request.auser()
+    user_requests, summary = await asyncio.gather(
+        fetch_all(ItemRequest.objects.filter(requestor=user).select_related('item').order_by('-date_requested')),
+        read_in_thread(read_counters, user),
+    )
+
+    return await sync_to_async(render)(request, 'invent/requestor_dashboard.html', {
+        'requests': user_requests,
+        'total_requests': summary['total'],
+        'approved_count': summary['approved'],
+        'pending_count': summary['pending'],
+        'issued_count': summary['issued'],
+        'fully_returned_count': summary['fully_returned'],
+        'partially_returned_count': summary['partially_returned'],
+        'available_inventory': InventoryItem.objects.available().order_by('name'),
+    })
+
+
+@login_required
+@retry_on_lock
 def request_item(request):
     item_id_from_get = request.GET.get('item')
 
-    available_inventory_queryset = InventoryItem.objects.all().order_by('name')
-    available_inventory_list = [
-        item for item in available_inventory_queryset if item.quantity_remaining() > 0]
-
-    available_item_ids = [item.id for item in available_inventory_list]
-    filtered_inventory_queryset = InventoryItem.objects.filter(
-        id__in=available_item_ids).order_by('name')
+    # Exhausted stock is filtered out by the database using the indexed quantity_available column
+    filtered_inventory_queryset = InventoryItem.objects.available().order_by('name')
 
     # JS-safe JSON data for showing item quantity/condition
     available_inventory_json = mark_safe(json.dumps([
         {
-            "id": item.id,
-            "quantity_remaining": item.quantity_remaining(),
-            "condition": item.condition or "N/A"
+            "id": item['id'],
+            "quantity_remaining": item['quantity_available'],
+            "condition": item['condition'] or "N/A"
         }
-        for item in available_inventory_list
+        for item in filtered_inventory_queryset.values('id', 'quantity_available', 'condition')
     ]))
 
     if request.method == 'POST':
@@ -134,21 +158,20 @@ def request_item(request):
             item_request = form.save(commit=False)
             item_request.requestor = request.user
             item_request.name = item_request.item.name
-            item_request.save()
-
-            # Send email notification to the requestor
-            send_mail(
-                subject='Item Request Confirmation',
-                message=(
-                    f"Dear {request.user.first_name or request.user.username},\n\n"
-                    f"Your request for item \"{item_request.item.name}\" has been successfully submitted.\n"
-                    f"We will notify you once it is reviewed or issued.\n\n"
-                    f"Thank you,\nInventory Management Team"
-                ),
-                from_email=None,  # Uses DEFAULT_FROM_EMAIL
-                recipient_list=[request.user.email],
-                fail_silently=False,
-            )
+            with transaction.atomic():
+                item_request.save()
+
+                # Queue email notification to the requestor in the same transaction (delivered by send_outbox)
+                queue_email(
+                    subject='Item Request Confirmation',
+                    message=(
+                        f"Dear {request.user.first_name or request.user.username},\n\n"
+                        f"Your request for item \"{item_request.item.name}\" has been successfully submitted.\n"
+                        f"We will notify you once it is reviewed or issued.\n\n"
+                        f"Thank you,\nInventory Management Team"
+                    ),
+                    recipient_list=[request.user.email],
+                )
 
             messages.success(request, "Item request submitted successfully!")
             return redirect('requestor_dashboard')
@@ -157,27 +180,24 @@ def request_item(request):
     else:
         initial_data = {}
         if item_id_from_get and item_id_from_get.isdigit():
-            try:
-                item = InventoryItem.objects.get(id=int(item_id_from_get))
-                if item.id in available_item_ids:
-                    initial_data['item'] = item.id
-            except InventoryItem.DoesNotExist:
-                pass
+            if filtered_inventory_queryset.filter(id=int(item_id_from_get)).exists():
+                initial_data['item'] = int(item_id_from_get)
 
         form = ItemRequestForm(initial=initial_data)
         form.fields['item'].queryset = filtered_inventory_queryset
 
     return render(request, 'invent/request_item.html', {
         'form': form,
-        'available_inventory': available_inventory_list,
+        'available_inventory': filtered_inventory_queryset,
         'available_inventory_json': available_inventory_json,
     })
 
 
 @login_required
+@retry_on_lock
 def cancel_request(request, request_id):
     item_request = get_object_or_404(
-        ItemRequest, id=request_id, requestor=request.user)
+        ItemRequest.objects.select_related('item'), id=request_id, requestor=request.user)
 
     # Allow cancellation for Pending, Approved, and even Issued if you decide to revert stock on cancellation
     # For now, keeping your original logic to only allow Pending cancellation
@@ -206,38 +226,43 @@ def cancel_request(request, request_id):
 @login_required
 @permission_required('invent.view_inventoryitem', raise_exception=True)
 def store_clerk_dashboard(request):
-    inventory_items = InventoryItem.objects.all()
+    # Quantity sums and request counts are read from the maintained counters table
+    summary = read_counters()
 
-    total_inventory_items = inventory_items.aggregate(
-        total_sum=Sum('quantity_total'))['total_sum'] or 0
-    items_issued = inventory_items.aggregate(total_issued=Sum('quantity_issued'))[
-        'total_issued'] or 0
-    items_returned = inventory_items.aggregate(
-        total_returned=Sum('quantity_returned'))['total_returned'] or 0
+    items_for_dashboard = InventoryItem.objects.order_by('-created_at')[:5]
 
-    items_for_dashboard = inventory_items.order_by('-created_at')[:5]
+    context = {
+        'total_items': summary['quantity_total'],
+        'items_issued': summary['quantity_issued'],
+        'items_returned': summary['quantity_returned'],
+        'items': items_for_dashboard,
+        'pending_requests_count': summary['pending'],
+        # Count of Issued Requests that are not fully returned yet (eligible for return)
+        'issued_but_not_fully_returned_count': summary['outstanding_issued'],
+    }
+    return render(request, 'invent/store_clerk_dashboard.html', context)
 
-    pending_requests_count = ItemRequest.objects.filter(
-        status='Pending').count()
 
-    # Count of Issued Requests that are not fully returned yet (eligible for return)
-    issued_but_not_fully_returned_count = ItemRequest.objects.filter(
-        status='Issued'
-    ).exclude(
-        # Exclude if original quantity <= returned quantity
-        quantity__lte=F('returned_quantity')
-    ).count()
+@login_required
+@permission_required('invent.view_inventoryitem', raise_exception=True)
+async def store_clerk_dashboard_async(request):
+    """store_clerk_dashboard as an async view: the counters and the newest items are read at the same time."""
+    # permission_required already loaded the user and its permissions; reuse them in the templates
+    request.user = await request.auser()
+    summary, items_for_dashboard = await asyncio.gather(
+        read_in_thread(read_counters),
+        fetch_all(InventoryItem.objects.order_by('-created_at')[:5]),
+    )
 
     context = {
-        'total_items': total_inventory_items,
-        'items_issued': items_issued,
-        'items_returned': items_returned,
+        'total_items': summary['quantity_total'],
+        'items_issued': summary['quantity_issued'],
+        'items_returned': summary['quantity_returned'],
         'items': items_for_dashboard,
-        'pending_requests_count': pending_requests_count,
-        # NEW for dashboard
-        'issued_but_not_fully_returned_count': issued_but_not_fully_returned_count,
+        'pending_requests_count': summary['pending'],
+        'issued_but_not_fully_returned_count': summary['outstanding_issued'],
     }
-    return render(request, 'invent/store_clerk_dashboard.html', context)
+    return await sync_to_async(render)(request, 'invent/store_clerk_dashboard.html', context)
 
 # invent/views.py
 
@@ -248,19 +273,15 @@ def inventory_list_view(request):
     Displays a list of all inventory items with search and pagination.
     """
     query = request.GET.get('q', '')
-    items = InventoryItem.objects.all().order_by('name')
-
-    if query:
-        items = items.filter(
-            Q(name__icontains=query) |
-            Q(serial_number__icontains=query) |
-            Q(category__icontains=query) 
-        )                                    
-
-    # Add pagination
-    paginator = Paginator(items, 50)  # Show 50 items per page
-    page_number = request.GET.get('page')
-    page_obj  = paginator.get_page(page_number) 
+    # Full-text index lookup (prefix matching on name, serial number and category)
+    items = search_inventory(InventoryItem.objects.all(), query)
+
+    # Keyset pagination on (name, id): every page costs the same, however deep.
+    # The total is cached briefly so it isn't recounted on each page.
+    page_obj = keyset_paginate(
+        items, ['name', 'id'], cursor=request.GET.get('cursor'), per_page=50,  # Show 50 items per page
+        count='cached', count_cache_key=count_cache_key('inventory_list', query),
+    )
 
     context = {
         'page_obj': page_obj,  # Now passing the paginated object as 'page_obj'
@@ -270,6 +291,7 @@ def inventory_list_view(request):
 
 @login_required
 @permission_required('invent.view_inventoryitem', raise_exception=True)
+@retry_on_lock
 def manage_stock(request):
     form = InventoryItemForm()
 
@@ -290,11 +312,8 @@ def manage_stock(request):
     items = InventoryItem.objects.all().order_by('name')
 
     if query:
-        items = items.filter(
-            Q(name__icontains=query) |
-            Q(serial_number__icontains=query) |
-            Q(category__icontains=query)
-        )
+        # Full-text index lookup, best matches first
+        items = search_inventory(items, query, ranked=True)
 
     context = {
         'form': form,
@@ -306,6 +325,7 @@ def manage_stock(request):
 
 @login_required
 @permission_required('invent.change_inventoryitem', raise_exception=True)
+@retry_on_lock
 def edit_item(request, item_id):
     item = get_object_or_404(InventoryItem, id=item_id)
     if request.method == 'POST':
@@ -332,9 +352,12 @@ def edit_item(request, item_id):
 
 @login_required
 @permission_required('invent.can_issue_item', raise_exception=True)
+@retry_on_lock
 def issue_item(request):
     # Fetch all requests for display in the "All Requests" tab
-    all_requests = ItemRequest.objects.all().order_by('-date_requested')
+    # Rows show the item and requestor, so join them instead of one query per row
+    all_requests = ItemRequest.objects.select_related(
+        'item', 'requestor').order_by('-date_requested')
 
     # Filter for requests that are Pending or Approved to show in the primary tab
     pending_and_approved_requests = all_requests.filter(
@@ -378,46 +401,21 @@ def issue_item(request):
                                 request, f"Request ID {request_id} is '{item_request.status}' and cannot be rejected.")
 
                     elif action == 'issue_from_request':
-                        # *** CRITICAL CHANGE HERE: Ensure status is 'Approved' to issue ***
-                        if item_request.status != 'Approved':
-                            messages.error(
-                                request, f"Cannot issue for request ID {request_id}. It must be 'Approved'. Current status: '{item_request.status}'.")
+                        # Claims the request and issues its stock with conditional UPDATEs,
+                        # so concurrent clerks can never oversell or issue a request twice
+                        try:
+                            issue_request(item_request, request.user)
+                        except StockError as e:
+                            messages.error(request, str(e))
                             return redirect('issue_item')
-
-                        item_to_issue_obj = item_request.item
-
-                        if item_to_issue_obj.quantity_remaining() < item_request.quantity:
-                            messages.error(
-                                request, f"Insufficient stock for '{item_to_issue_obj.name}'. Requested: {item_request.quantity}, Available: {item_to_issue_obj.quantity_remaining()}.")
-                            return redirect('issue_item')
-
-                        # Deduct quantity_available and update quantity_issued
-                        item_to_issue_obj.quantity_issued = F(
-                            'quantity_issued') + item_request.quantity
-                        item_to_issue_obj.save(
-                            update_fields=['quantity_issued'])
-
-                        StockTransaction.objects.create(
-                            item=item_to_issue_obj,
-                            transaction_type='Issue',
-                            # Store positive quantity for Issue transactions for consistency in StockTransaction
-                            quantity=item_request.quantity,
-                            # and reflect change in InventoryItem quantities by F() expressions.
-                            item_request=item_request,  # LINK THE TRANSACTION TO THE REQUEST
-                            issued_to=item_request.requestor.username,
-                            reason=f"Issued for request ID: {item_request.id} ({item_request.item.name})",
-                            recorded_by=request.user
-                        )
-                        item_request.status = 'Issued'
-                        # item_request.processed_by = request.user
-                        # item_request.processed_at = timezone.now()
-                        item_request.save()  # This save will now set date_issued and send email
                         messages.success(
                             request, f'Request ID {item_request.id} ({item_request.item.name}) issued and marked as Issued.')
                     else:
                         messages.error(request, "Invalid request action.")
 
             except Exception as e:
+                if is_transient_lock_error(e):
+                    raise  # retry_on_lock runs the view again
                 messages.error(request, f"Error processing request: {e}")
 
             return redirect('issue_item')
@@ -431,39 +429,30 @@ def issue_item(request):
             issued_to = form.cleaned_data['issued_to']
 
             try:
-                with transaction.atomic():
-                    if item_to_issue.quantity_remaining() < quantity:
-                        messages.error(
-                            request, f"Not enough stock for {item_to_issue.name}. Available: {item_to_issue.quantity_remaining()}.")
-                        # No redirect here, so form errors can be displayed
-                        # This means you need to pass the context again
-                        context = {
-                            'form': form,  # Pass the form with errors back
-                            'all_requests': all_requests,
-                            'pending_and_approved_requests': pending_and_approved_requests,
-                            'approved_requests': all_requests.filter(status='Approved'),
-                            'issued_requests': all_requests.filter(status='Issued'),
-                            'rejected_requests': all_requests.filter(status='Rejected'),
-                            'pending_requests': all_requests.filter(status='Pending'),
-                        }
-                        return render(request, 'invent/issue_item.html', context)
-
-                    item_to_issue.quantity_issued = F(
-                        'quantity_issued') + quantity
-                    item_to_issue.save(update_fields=['quantity_issued'])
-
-                    StockTransaction.objects.create(
-                        item=item_to_issue,
-                        transaction_type='Issue',
-                        quantity=quantity,  # Store positive quantity for Issue transactions
-                        issued_to=issued_to,
-                        reason=f"Direct issue to {issued_to}. ",
-                        recorded_by=request.user
-                    )
+                # Checks availability and issues in a single conditional UPDATE
+                issue_stock(item_to_issue, quantity, request.user, issued_to=issued_to,
+                            reason=f"Direct issue to {issued_to}. ")
                 messages.success(
                     request, f'{quantity} x {item_to_issue.name} successfully issued to {issued_to}.')
                 return redirect('issue_item')
+            except InsufficientStock as e:
+                messages.error(
+                    request, f"Not enough stock for {item_to_issue.name}. Available: {e.available}.")
+                # No redirect here, so form errors can be displayed
+                # This means you need to pass the context again
+                context = {
+                    'form': form,  # Pass the form with errors back
+                    'all_requests': all_requests,
+                    'pending_and_approved_requests': pending_and_approved_requests,
+                    'approved_requests': all_requests.filter(status='Approved'),
+                    'issued_requests': all_requests.filter(status='Issued'),
+                    'rejected_requests': all_requests.filter(status='Rejected'),
+                    'pending_requests': all_requests.filter(status='Pending'),
+                }
+                return render(request, 'invent/issue_item.html', context)
             except Exception as e:
+                if is_transient_lock_error(e):
+                    raise  # retry_on_lock runs the view again
                 messages.error(request, f"Error issuing item: {e}")
         else:
             messages.error(
@@ -495,45 +484,75 @@ def issue_item(request):
 
 
 @login_required
+@permission_required('invent.can_issue_item', raise_exception=True)
+@require_POST
+@retry_on_lock
+def batch_request_action(request):
+    """
+    Approves, rejects or issues many requests at once (POST `action` plus one or more
+    `request_ids`). Stock for the whole batch is checked in one query and everything is
+    written in one transaction. Clients asking for JSON get the per-request results back;
+    the clerk page gets a summary message instead.
+    """
+    action = request.POST.get('action')
+    wants_json = 'application/json' in request.headers.get('Accept', '')
+    try:
+        request_ids = [int(value) for value in request.POST.getlist('request_ids')]
+        if not request_ids:
+            raise StockError("Select at least one request.")
+        results = process_request_batch(request_ids, action, request.user)
+    except (ValueError, StockError) as e:
+        error = str(e) if isinstance(e, StockError) else "Request IDs must be numbers."
+        if wants_json:
+            return JsonResponse({'action': action, 'error': error}, status=400)
+        messages.error(request, error)
+        return redirect('issue_item')
+
+    succeeded = [r for r in results if r['ok']]
+    failed = [r for r in results if not r['ok']]
+    if wants_json:
+        return JsonResponse({
+            'action': action,
+            'succeeded': len(succeeded),
+            'failed': len(failed),
+            'results': results,
+        })
+
+    if succeeded:
+        messages.success(request, f"{len(succeeded)} request(s) {BATCH_ACTIONS[action][1].lower()}.")
+    for result in failed:
+        messages.warning(request, f"Request ID {result['id']}: {result['message']}")
+    return redirect('issue_item')
+
+
+@login_required
+@reads_from_replica
 def request_summary(request):
     # Filter all requests to only those made by the logged-in requestor
     user_requests = ItemRequest.objects.filter(requestor=request.user)
 
-    total_requests = user_requests.count()
-    pending_requests = user_requests.filter(status='Pending').count()
-    approved_requests = user_requests.filter(status='Approved').count()
-    issued_requests = user_requests.filter(status='Issued').count()
-    rejected_requests = user_requests.filter(status='Rejected').count()
-    # NEW: Add counts for returned statuses
-    partially_returned_requests = user_requests.filter(
-        status='Partially Returned').count()
-    fully_returned_requests = user_requests.filter(
-        status='Fully Returned').count()
-    # Sum of all returned quantities across all requests by this user
-    total_returned_quantity_by_user = user_requests.aggregate(
-        Sum('returned_quantity'))['returned_quantity__sum'] or 0
-
-    requests_by_status = user_requests.values(
-        'status').annotate(count=Count('id')).order_by('status')
+    # Every count and the returned-quantity sum come from this user's dashboard counters
+    summary = read_counters(requestor=request.user)
 
     requests_by_item = user_requests.values('item__name').annotate(
         count=Sum('quantity')).order_by('-count')[:10]
 
     # No need to show top requestors to the current requestor (omit or just show current user’s total)
     # Alternatively, show how many times *they* requested:
-    requests_by_requestor = user_requests.values(
-        'requestor__username').annotate(count=Count('id'))
+    requests_by_requestor = [
+        {'requestor__username': request.user.username, 'count': summary['total']}]
 
     context = {
-        'total_requests': total_requests,
-        'pending_requests': pending_requests,
-        'approved_requests': approved_requests,
-        'issued_requests': issued_requests,
-        'rejected_requests': rejected_requests,
-        'partially_returned_requests': partially_returned_requests,  # NEW
-        'fully_returned_requests': fully_returned_requests,       # NEW
-        'total_returned_quantity_by_user': total_returned_quantity_by_user,  # NEW
-        'requests_by_status': requests_by_status,
+        'total_requests': summary['total'],
+        'pending_requests': summary['pending'],
+        'approved_requests': summary['approved'],
+        'issued_requests': summary['issued'],
+        'rejected_requests': summary['rejected'],
+        'partially_returned_requests': summary['partially_returned'],  # NEW
+        'fully_returned_requests': summary['fully_returned'],       # NEW
+        # Sum of all returned quantities across all requests by this user
+        'total_returned_quantity_by_user': summary['returned_total'],  # NEW
+        'requests_by_status': status_breakdown(summary),
         'requests_by_item': requests_by_item,
         'requests_by_requestor': requests_by_requestor,
     }
@@ -542,6 +561,7 @@ def request_summary(request):
 
 @login_required
 @permission_required('invent.change_inventoryitem', raise_exception=True)
+@retry_on_lock
 def adjust_stock(request):
     if request.method == 'POST':
         form = AdjustStockForm(request.POST)
@@ -571,6 +591,8 @@ def adjust_stock(request):
                     request, f'Stock for {item.name} adjusted by {adjustment_quantity}. New total: {item.quantity_total}.')
                 return redirect('adjust_stock')
             except Exception as e:
+                if is_transient_lock_error(e):
+                    raise  # retry_on_lock runs the view again
                 messages.error(request, f"Error adjusting stock: {e}")
         else:
             messages.error(
@@ -580,7 +602,8 @@ def adjust_stock(request):
 
     # Filter for 'Adjustment' transactions for this display, as 'Issue' and 'Return' will be handled elsewhere
     recent_transactions = StockTransaction.objects.filter(
-        transaction_type='Adjustment').order_by('-transaction_date')[:10]
+        transaction_type='Adjustment').select_related(
+        'item', 'recorded_by').order_by('-transaction_date')[:10]
 
     context = {
         'form': form,
@@ -605,29 +628,68 @@ def reports(request):
 @login_required
 # Assuming clerks need to see reports
 @permission_required('invent.view_inventoryitem', raise_exception=True)
+@reads_from_replica
 def reports_view(request):
-    context = {
-        'total_items': InventoryItem.objects.aggregate(total=Sum('quantity_total'))['total'] or 0,
-        'total_requests': ItemRequest.objects.count(),
-        'pending_count': ItemRequest.objects.filter(status='Pending').count(),
-        'approved_count': ItemRequest.objects.filter(status='Approved').count(),
-        'issued_count': ItemRequest.objects.filter(status='Issued').count(),
-        'rejected_count': ItemRequest.objects.filter(status='Rejected').count(),
+    # Trends come from the daily rollups, so any date range is cheap
+    trend_start, trend_end = trend_range(request.GET.get('start'), request.GET.get('end'))
+
+    def compute():
+        summary = read_counters()
+        trend_rows, trend_monthly = trends(trend_start, trend_end)
+        return reports_context(summary, top_requested_items(2), trend_start, trend_end,
+                               trend_rows, trend_monthly)
+
+    # The same for every clerk until the next inventory or request change
+    context = cached_report('reports', compute, trend_start, trend_end)
+    context['trends_updated_at'] = last_rolled_up()
+    return render(request, 'invent/reports.html', context)
+
+
+@login_required
+@permission_required('invent.view_inventoryitem', raise_exception=True)
+@reads_from_replica
+async def reports_view_async(request):
+    """reports_view as an async view: on a cache miss the counters, trends and top items are read at the same time."""
+    request.user = await request.auser()
+    trend_start, trend_end = trend_range(request.GET.get('start'), request.GET.get('end'))
+
+    async def compute():
+        summary, (trend_rows, trend_monthly), top_items = await gather_reads(
+            read_counters, partial(trends, trend_start, trend_end), partial(top_requested_items, 2))
+        return reports_context(summary, top_items, trend_start, trend_end, trend_rows, trend_monthly)
+
+    context, trends_updated_at = await asyncio.gather(
+        acached_report('reports', compute, trend_start, trend_end),
+        read_in_thread(last_rolled_up),
+    )
+    context['trends_updated_at'] = trends_updated_at
+    return await sync_to_async(render)(request, 'invent/reports.html', context)
+
+
+def reports_context(summary, top_items, trend_start, trend_end, trend_rows, trend_monthly):
+    """The cached part of the reports page's context."""
+    return {
+        'total_items': summary['quantity_total'],
+        'total_requests': summary['total'],
+        'pending_count': summary['pending'],
+        'approved_count': summary['approved'],
+        'issued_count': summary['issued'],
+        'rejected_count': summary['rejected'],
         # MODIFIED: Calculate returned_count from ItemRequest statues
-        'fully_returned_count': ItemRequest.objects.filter(status='Fully Returned').count(),
-        'partially_returned_count': ItemRequest.objects.filter(status='Partially Returned').count(),
+        'fully_returned_count': summary['fully_returned'],
+        'partially_returned_count': summary['partially_returned'],
         # Sum of actual quantities returned via transactions or the ItemRequest.returned_quantity field
-        'total_returned_quantity_all_items': ItemRequest.objects.aggregate(total_returned=Sum('returned_quantity'))['total_returned'] or 0,
+        'total_returned_quantity_all_items': summary['returned_total'],
 
+        # Top 2 requested items (archived requests included)
+        'top_requested_items': top_items,
 
-        # Top 2 requested items
-        'top_requested_items': (
-            ItemRequest.objects.values('item__name')
-            .annotate(request_count=Count('id'))
-            .order_by('-request_count')[:2]
-        )
+        'trend_start': trend_start,
+        'trend_end': trend_end,
+        'trend_rows': trend_rows,
+        'trend_monthly': trend_monthly,
+        'trend_statuses': REQUEST_STATUSES,
     }
-    return render(request, 'invent/reports.html', context)
 
 
 @login_required
@@ -641,81 +703,59 @@ def upload_inventory(request):
             messages.error(request, "Only .xlsx files are supported.")
             return redirect('upload_inventory')
 
-        # Save file temporarily
-        file_name = default_storage.save(
-            excel_file.name, ContentFile(excel_file.read()))
-        file_path = default_storage.path(file_name)
-
         try:
-            wb = openpyxl.load_workbook(file_path)
-            sheet = wb.active
-
-            success_count = 0
-            skipped_count = 0
-
-            for row in sheet.iter_rows(min_row=2, values_only=True):  # Skip header row
-                # Ensure the number of columns matches your excel structure
-                # This needs to be consistent with the actual columns in your Excel file.
-                # Assuming the order is: name, serial, category, condition, status, total, issued, returned
-                name, serial, category, condition, status, total, issued, returned = row
-
-                # Skip if required fields are missing
-                if not name:
-                    skipped_count += 1
-                    continue
-
-                try:
-                    InventoryItem.objects.create(
-                        name=name.strip(),
-                        serial_number=(serial or "").strip(),
-                        category=(category or "").strip(),
-                        condition=condition or "Serviceable",
-                        status=status or "In Stock",
-                        quantity_total=int(total or 0),
-                        quantity_issued=int(issued or 0),
-                        # Ensure this maps correctly
-                        quantity_returned=int(returned or 0),
-                        created_by=request.user
-                    )
-                    success_count += 1
-                except Exception as e:
-                    messages.error(
-                        request, f"Error processing row for item '{name}': {e}")
-                    skipped_count += 1  # Skip row if conversion or save fails
-
-            # Feedback message
-            messages.success(
-                request,
-                f"{success_count} item(s) uploaded successfully. {skipped_count} row(s) skipped due to errors or missing data."
-            )
-            return redirect('upload_inventory')
-
+            # The uploaded file is read straight from the upload handler in read-only mode
+            report = import_inventory_workbook(excel_file, created_by=request.user)
         except Exception as e:
             messages.error(request, f"Failed to process Excel file: {e}")
             return redirect('upload_inventory')
-        finally:
-            # Clean up the temporary file
-            if default_storage.exists(file_name):
-                default_storage.delete(file_name)
+
+        # Feedback message
+        messages.success(
+            request,
+            f"{report.created_count} item(s) uploaded successfully. {report.skipped_count} row(s) skipped due to errors or missing data."
+        )
+        # Render the per-row error report instead of redirecting so it can be shown alongside the summary
+        return render(request, 'invent/upload_inventory.html', {'import_report': report})
 
     return render(request, 'invent/upload_inventory.html')
 
 # <-- Reports Section ---
 
 
+@reads_from_replica
 def total_requests(request):
     status_filter = request.GET.get('status')
-    # Filter ItemRequest by relevant statuses for the "All Requests" report
-    # and exclude partially/fully returned if you only want truly active ones.
-    # For a total request list, usually all are included unless specified.
-    requests = ItemRequest.objects.all()
+    cursor = request.GET.get('cursor')
+
+    def compute():
+        # Filter ItemRequest by relevant statuses for the "All Requests" report
+        # and exclude partially/fully returned if you only want truly active ones.
+        # For a total request list, usually all are included unless specified.
+        requests = ItemRequest.objects.select_related('requestor', 'item')
+        if status_filter:
+            requests = requests.filter(status=status_filter)
+
+        # The exact total is already maintained in the dashboard counters
+        counters = read_counters()
+        if not status_filter:
+            total = counters['total']
+        elif status_filter in STATUS_KEYS:
+            total = counters[STATUS_KEYS[status_filter]]
+        else:
+            total = 0
+
+        # Archived requests keep their ids, so they interleave with the live ones by the same keys
+        archived = archived_requests(status=status_filter)
+        merge = [archived.select_related('requestor', 'item')] if archived is not None else []
 
-    if status_filter:
-        requests = requests.filter(status=status_filter)
+        # Keyset pagination on (date_requested, id), newest first
+        return keyset_paginate(
+            requests, ['-date_requested', '-id'], cursor=cursor, per_page=10, count=total, merge=merge,
+        )
 
-    paginator = Paginator(requests.order_by('-date_requested'), 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pages are shared between clerks until the next request change
+    page_obj = cached_report('total_requests', compute, status_filter, cursor)
 
     context = {
         'page_obj': page_obj,
@@ -726,63 +766,70 @@ def total_requests(request):
 # Export
 
 
-def export_total_requests(request):
-    import openpyxl
-    from openpyxl.utils import get_column_letter
-    from django.http import HttpResponse
+def _date_range_params(request):
+    """The ?start= and ?end= dates as an aware [start, end) datetime range; either may be None."""
+    bounds = []
+    for name, days in (('start', 0), ('end', 1)):
+        try:
+            day = date.fromisoformat(request.GET.get(name, ''))
+        except ValueError:
+            bounds.append(None)
+            continue
+        bounds.append(timezone.make_aware(datetime.combine(day + timedelta(days=days), time.min)))
+    return bounds
 
-    status_filter = request.GET.get('status')
-    queryset = ItemRequest.objects.all()
 
-    if status_filter:
-        queryset = queryset.filter(status=status_filter)
+@reads_from_replica
+def export_total_requests(request):
+    status_filter = request.GET.get('status')
+    # Optional ?start=YYYY-MM-DD&end=YYYY-MM-DD (inclusive) on the request date
+    start, end = _date_range_params(request)
 
-    # Create workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Item Requests"
+    def narrow(queryset):
+        queryset = queryset.select_related('requestor', 'item').only(
+            'quantity', 'returned_quantity', 'date_requested', 'status',
+            'requestor__username', 'item__name',
+        )
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+        if start:
+            queryset = queryset.filter(date_requested__gte=start)
+        if end:
+            queryset = queryset.filter(date_requested__lt=end)
+        return queryset
+
+    querysets = [narrow(ItemRequest.objects.all())]
+    # The archive is only read when the range reaches back to archived requests
+    archived = archived_requests(status=status_filter, start=start)
+    if archived is not None:
+        querysets.append(narrow(archived))
 
     # Define headers
     headers = ['Requested By', 'Item', 'Quantity Requested',
                'Quantity Returned', 'Date Requested', 'Status']  # MODIFIED headers
-    ws.append(headers)
 
-    # Add data rows
-    for item_req in queryset:  # Changed 'item' to 'item_req' for clarity
-        ws.append([
+    # Rows are generated lazily from a chunked iterator so the whole table is never in memory
+    rows = (
+        [
             item_req.requestor.username,
             item_req.item.name,
             item_req.quantity,
             item_req.returned_quantity,  # NEW column
             item_req.date_requested.strftime('%Y-%m-%d'),
             item_req.status
-        ])
-
-    # Adjust column widths (optional)
-    for i, col in enumerate(headers, 1):
-        ws.column_dimensions[get_column_letter(i)].width = 20
-
-    # Set up HTTP response
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        ]
+        for queryset in querysets
+        for item_req in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
     )
-    response['Content-Disposition'] = 'attachment; filename=total_requests.xlsx'
-    wb.save(response)
-    return response
 
+    return xlsx_streaming_response(
+        'total_requests.xlsx', "Item Requests", headers, rows, column_width=20)
 
-def export_inventory_items(request):
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename=inventory_items.xlsx'
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Inventory Items"
 
+@reads_from_replica
+def export_inventory_items(request):
     # Header row
-    ws.append([
+    headers = [
         'Item ID',
         'Item Name',
         'Serial Number',
@@ -794,11 +841,11 @@ def export_inventory_items(request):
         # Clarified this is the aggregate field on InventoryItem
         'Returned Qty (Aggregate)',
         'Available Qty (Calculated)',  # Clarified this is calculated
-    ])
+    ]
 
     # Data rows
-    for item in InventoryItem.objects.all():
-        ws.append([
+    rows = (
+        [
             item.id,
             item.name,
             item.serial_number if item.serial_number else '',  # Corrected access
@@ -811,10 +858,12 @@ def export_inventory_items(request):
             item.quantity_returned,
             item.quantity_remaining(),  # Using your existing method which is (total - issued)
             # If you want it to be (total - issued + returned_to_total), adjust quantity_total logic
-        ])
+        ]
+        for item in InventoryItem.objects.order_by('id').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
 
-    wb.save(response)
-    return response
+    return xlsx_streaming_response(
+        'inventory_items.xlsx', "Inventory Items", headers, rows)
 
 
 # --- NEW RETURN LOGIC VIEWS ---
@@ -842,11 +891,12 @@ def list_issued_requests_for_return(request):
 @login_required
 # Assuming clerks handle returns
 @permission_required('invent.can_issue_item', raise_exception=True)
+@retry_on_lock
 def process_return_for_request(request, request_id):
     # Retrieve the ItemRequest, ensuring it's an 'Issued' request and not fully returned
     item_request = get_object_or_404(
         ItemRequest.objects.filter(status='Issued').exclude(
-            quantity__lte=F('returned_quantity')),
+            quantity__lte=F('returned_quantity')).select_related('item', 'requestor'),
         id=request_id
     )
 
@@ -912,6 +962,8 @@ def process_return_for_request(request, request_id):
                     return redirect('list_issued_requests_for_return')
 
             except Exception as e:
+                if is_transient_lock_error(e):
+                    raise  # retry_on_lock runs the view again
                 messages.error(
                     request, f"An error occurred while processing the return: {e}")
     else: